@@ -1,26 +1,35 @@
+"""
+Manager and Analyst agents.
+
+Importing this module is cheap: the agents (and smolagents, the tools, the LLM clients and the Postgres
+helpers they pull in) are built the first time `manager_agent` or `analyst_agent` is accessed, e.g. by
+`from agents import manager_agent`.  Model providers are imported only when selected, so the Hugging Face
+stacks (transformers / torch) are never loaded for OpenAI models, and the Shopify Dev-MCP subprocess only
+starts when a docs / schema tool is first called.  See scripts/profile_startup.py for the startup budget.
+"""
+
 import os
-import json
-import yaml
-from smolagents import CodeAgent, ToolCallingAgent, OpenAIServerModel, InferenceClientModel, ActionStep
-from tools.shopify_mcp import search_shopify_docs, introspect_shopify_schema
-from tools import run_shopify_query
-from utils import build_prompt_with_memory, analyst_validation, analyst_callback, intercept_manager_final_answer
-from models.huggingface import HFTextGenModel
-from memory_utils import store_message, get_recent_history
-from llm.huggingface_model import HFModel
-from prompts.manager_prompt_template import manager_prompt_template
-from memory_utils import store_agent_step
 import traceback
 
+# "provider:model_id", e.g. openai:gpt-4.1, hf_inference:deepseek-ai/DeepSeek-R1-0528 or hf_local:<model id>
+AGENT_MODEL = os.environ.get("AGENT_MODEL", "openai:gpt-4.1")
+
+_agents = {}
+
 
 def set_agents_session_id(session_id: str):
     """Set the session ID for both manager and analyst agents"""
+    manager_agent = get_agent("manager_agent")
+    analyst_agent = get_agent("analyst_agent")
     manager_agent.session_id = session_id
     analyst_agent.session_id = session_id
 
 
 # Logging function to use as a step callback
 def log_step(step, agent):
+    from memory_utils import store_agent_step, set_agent_step_summary
+    from step_summarizer import get_step_summarizer
+
     print(f"\n=== Step {step.step_number} ===")
 
     # Extract details safely
@@ -41,7 +50,7 @@ def log_step(step, agent):
         print("❌ Error:", error)
 
     # Store step in Postgres (with correct key names)
-    store_agent_step(
+    step_id = store_agent_step(
         session_id="test",
         agent_name=agent.name,
         step_data={
@@ -54,106 +63,149 @@ def log_step(step, agent):
         }
     )
 
+    # Summarize in the background (batched with other pending steps) so the agent loop doesn't wait
+    get_step_summarizer().submit(
+        {
+            "input_text": str(input_text) if input_text else "",
+            "output_text": str(output_text) if output_text else "",
+            "tool_calls": [str(tc) for tc in tool_calls] if tool_calls else [],
+            "observations": str(observations) if observations else "",
+            "error": str(error) if error else "",
+        },
+        callback=lambda summary: set_agent_step_summary(step_id, summary)
+    )
+
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable not set.")
 
+
+def get_model(model: str = AGENT_MODEL):
+    """
+    Build the LLM for the agents, importing the provider's client only when it is selected.
+
+    Args:
+        model (str): "provider:model_id" - provider is openai, hf_inference (HF Inference API) or hf_local
+            (a local transformers model with prefix KV caching and batching, see llm/local_model.py).
+    """
+    provider, _, model_id = model.partition(":")
+    if provider == "openai":
+        from smolagents import OpenAIServerModel
+        return OpenAIServerModel(model_id=model_id, api_key=OPENAI_API_KEY)
+    if provider == "hf_inference":
+        from smolagents import InferenceClientModel
+        return InferenceClientModel(model_id=model_id, token=os.environ["HUGGING_FACE_TOKEN"])
+    if provider == "hf_local":
+        from llm.local_model import LocalModel
+        return LocalModel(model_id=model_id)
+    raise ValueError(f"Unknown model provider '{provider}' in AGENT_MODEL={model!r}")
+
+
 # ----------------------------------------
 # Initialize Agents
 # ----------------------------------------
 
+def _build_agents() -> None:
+    from smolagents import CodeAgent
+    from tools.shopify_mcp import search_shopify_docs, introspect_shopify_schema
+    from tools import run_shopify_query, paginate_shopify_query, shopify_orders, shopify_products, shopify_customers, \
+        shopify_inventory, shopify_refunds, get_daily_metrics, get_top_skus, get_returning_customer_rate, \
+        query_datasets, page_dataset, parallel_map, lookup_products, lookup_skus, lookup_customers, compute_metrics
+    from utils import analyst_callback
+    from context_budget import compact_step_memory
+
+    # Custom class for self-validating Analyst agents
+    class AnalystAgent(CodeAgent):
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            # self.final_answer_checks = [analyst_validation(self.model)]
+
+    # Custom class for self-validating Manager agents
+    class ManagerAgent(CodeAgent):
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            # self.final_answer_checks = [manager_validation(self.model)]
+
+    # One model client shared by both agents
+    model = get_model()
+
+    # Analyst Agent
+    # ----------------------------------------
+
+    # Read in system prompt text from prompts/analyst_system_prompt.txt
+    with open("prompts/analyst_system_prompt.txt", "r") as f:
+        analyst_system_prompt = f.read()
+
+    # Instantiate analyst agent
+    analyst_agent = AnalystAgent(
+        name='Analyst',
+        model=model,
+        description=analyst_system_prompt,
+        # additional_authorized_imports=[
+        #     "pandas",
+        #     "numpy",
+        #     "datetime",
+        #     "os",
+        #     "sys",
+        #     "json"
+        # ],
+        tools=[run_shopify_query, paginate_shopify_query, shopify_orders, shopify_products, shopify_customers,
+               shopify_inventory, shopify_refunds, lookup_products, lookup_skus, lookup_customers,
+               search_shopify_docs, introspect_shopify_schema,
+               get_daily_metrics, get_top_skus, get_returning_customer_rate, compute_metrics, query_datasets,
+               page_dataset, parallel_map],
+        step_callbacks=[log_step, analyst_callback, compact_step_memory],
+        provide_run_summary=True  # provide summary of work done
+    )
+    # Add default session_id attribute
+    analyst_agent.session_id = "test"
+
+    # Manager Agent
+    # ----------------------------------------
+
+    # Read in system prompt text from prompts/manager_system_prompt.txt
+    with open("prompts/manager_system_prompt.txt", "r") as f:
+        manager_system_prompt = f.read()
+
+    # Instantiate manager agent
+    manager_agent = ManagerAgent(
+        name='Manager',
+        model=model,
+        description=manager_system_prompt,
+        # prompt_templates=manager_prompt_template,
+
+        # additional_authorized_imports=[
+        #     "pandas",
+        #     "numpy",
+        #     "datetime",
+        #     "os",
+        #     "sys",
+        #     "json"
+        # ],
+        tools=[],
+        managed_agents=[analyst_agent],
+        step_callbacks=[log_step, compact_step_memory]
+
+        # final_answer_checks=True  # validates final answers from managed agents
+    )
+    # Add default session_id attribute
+    manager_agent.session_id = "test"
 
-# Custom class for self-validating Analyst agents
-class AnalystAgent(CodeAgent):
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # self.final_answer_checks = [analyst_validation(self.model)]
+    _agents.update(manager_agent=manager_agent, analyst_agent=analyst_agent)
 
 
-# Analyst Agent
-# ----------------------------------------
+def get_agent(name: str):
+    """Return 'manager_agent' or 'analyst_agent', building both on first use."""
+    if not _agents:
+        _build_agents()
+    return _agents[name]
 
-# Read in system prompt text from prompts/researcher_system_prompt.txt
-with open("prompts/analyst_system_prompt.txt", "r") as f:
-    ANALYST_SYSTEM_PROMPT = f.read()
-
-# Set model (use HF if testing)
-MODEL = OpenAIServerModel(model_id="gpt-4.1",
-                          api_key=os.environ["OPENAI_API_KEY"])
-
-# Instantiate analyst agent
-analyst_agent = AnalystAgent(
-    name='Analyst',
-    model=MODEL,
-    description=ANALYST_SYSTEM_PROMPT,
-    # additional_authorized_imports=[
-    #     "pandas",
-    #     "numpy",
-    #     "datetime",
-    #     "os",
-    #     "sys",
-    #     "json"
-    # ],
-    tools=[run_shopify_query, search_shopify_docs, introspect_shopify_schema],
-    step_callbacks=[log_step, analyst_callback],
-    provide_run_summary=True  # provide summary of work done
-)
-# Add default session_id attribute
-analyst_agent.session_id = "test"
-
-# Manager Agent
-# ----------------------------------------
 
-# Read in system prompt text from prompts/researcher_system_prompt.txt
-with open("prompts/manager_system_prompt.txt", "r") as f:
-    MANAGER_SYSTEM_PROMPT = f.read()
-
-# Set model
-# -------
-
-MODEL = OpenAIServerModel(
-    model_id="gpt-4.1",  # OpenAI model
-    api_key=os.environ["OPENAI_API_KEY"])
-
-# MODEL = HFModel(model_id="deepseek-ai/DeepSeek-R1-0528")    # HuggingFace model
-
-# MODEL = InferenceClientModel(
-#     model_id="deepseek-ai/DeepSeek-R1-0528",
-#     # provider="together",
-#     token=os.environ["HUGGING_FACE_TOKEN"]
-# )
-
-
-# Custom class for self-validating Manager agents
-class ManagerAgent(CodeAgent):
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # self.final_answer_checks = [manager_validation(self.model)]
-
-
-# Instantiate manager agent
-manager_agent = ManagerAgent(
-    name='Manager',
-    model=MODEL,
-    description=MANAGER_SYSTEM_PROMPT,
-    # prompt_templates=manager_prompt_template,
-
-    # additional_authorized_imports=[
-    #     "pandas",
-    #     "numpy",
-    #     "datetime",
-    #     "os",
-    #     "sys",
-    #     "json"
-    # ],
-    tools=[],
-    managed_agents=[analyst_agent],
-    step_callbacks=[log_step]
-
-    # final_answer_checks=True  # validates final answers from managed agents
-)
-# Add default session_id attribute
-manager_agent.session_id = "test"
+def __getattr__(name: str):
+    # Lazy module attributes: `from agents import manager_agent` builds the agents on first access
+    if name in ("manager_agent", "analyst_agent"):
+        return get_agent(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,226 @@
+"""
+Token budgets for agent prompts (used by main.py, streamlit_app.py, oauth_slack.py and the agents' step callbacks).
+
+Each run's opening prompt carries only a budgeted slice of the chat history: the most recent turns verbatim
+(truncated), older turns as one-line summaries (batched and memoized, see step_summarizer.py).  During a run,
+tool observations fed back to the model are truncated, and once the conversation the model would see next
+exceeds the per-call ceiling the oldest steps are compacted first.  Limits live in config.yaml (`context:`).
+"""
+
+import os
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+DEFAULT_CONTEXT_CONFIG = {
+    "max_prompt_tokens": 24_000,       # ceiling for the prompt of any single LLM call in a run
+    "history_tokens": 2_000,           # chat history budget in a run's opening prompt
+    "history_limit": 30,               # messages read from conversation_history
+    "recent_turns": 4,                 # most recent messages kept verbatim
+    "max_message_tokens": 400,         # ... each truncated to this
+    "summarize_over_tokens": 60,       # older messages longer than this are replaced by a summary
+    "summary_timeout_seconds": 20,     # ... unless the summaries take longer than this (then they are truncated)
+    "max_observation_tokens": 1_500,   # per tool observation / managed agent report
+    "compacted_output_tokens": 200,    # model output kept for steps compacted under the ceiling
+}
+
+COMPACTED_PREFIX = "[observation compacted:"
+ENCODING_NAME = "o200k_base"  # tokenizer of the gpt-4.1 / gpt-4o family
+CHARS_PER_TOKEN = 4           # estimate used when the tokenizer can't be loaded
+
+_encoding = None
+_encoding_failed = False
+
+
+def load_context_config() -> Dict[str, Any]:
+    """Return the `context:` section of config.yaml, with defaults for anything unset."""
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
+    try:
+        with open(config_path, "r") as f:
+            config = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        config = {}
+    return {**DEFAULT_CONTEXT_CONFIG, **(config.get("context") or {})}
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(ENCODING_NAME)
+        except Exception as e:
+            # e.g. the BPE file can't be downloaded on first use - fall back to a character estimate
+            _encoding_failed = True
+            print(f"⚠️ Tokenizer unavailable, estimating tokens from characters: {e}")
+    return _encoding
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Number of tokens in text for the agents' model (estimated from length if the tokenizer is unavailable)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: Optional[str], max_tokens: int) -> Optional[str]:
+    """Keep the start and end of text within max_tokens, marking how much was cut from the middle."""
+    if not text or count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = _get_encoding()
+    head_tokens = max_tokens * 2 // 3
+    tail_tokens = max_tokens - head_tokens
+    if encoding is None:
+        head = text[:head_tokens * CHARS_PER_TOKEN]
+        tail = text[-tail_tokens * CHARS_PER_TOKEN:] if tail_tokens else ""
+        cut = count_tokens(text) - max_tokens
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        head = encoding.decode(tokens[:head_tokens])
+        tail = encoding.decode(tokens[-tail_tokens:]) if tail_tokens else ""
+        cut = len(tokens) - max_tokens
+    return f"{head}\n... [{cut} tokens truncated] ...\n{tail}"
+
+
+# ----------------------------------------
+# Chat history
+# ----------------------------------------
+
+def _message_step(message: Dict[str, str]) -> Dict[str, str]:
+    if message["role"] == "user":
+        return {"input_text": message["content"] or ""}
+    return {"output_text": message["content"] or ""}
+
+
+def summarize_messages(messages: List[Dict[str, str]], config: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    One-line summaries of chat messages, memoized by content (see step_summarizer.py) and requested together
+    so they share LLM calls.  Short messages are kept as is, and if the summaries don't arrive within
+    summary_timeout_seconds the long messages are truncated instead, so building a prompt never hangs.
+    """
+    from step_summarizer import get_step_summarizer
+
+    config = config or load_context_config()
+    summaries = [message["content"] or "" for message in messages]
+    long_messages = [i for i, summary in enumerate(summaries) if count_tokens(summary) > config["summarize_over_tokens"]]
+    if long_messages:
+        try:
+            results = get_step_summarizer().summarize_many([_message_step(messages[i]) for i in long_messages],
+                                                           timeout=config["summary_timeout_seconds"])
+        except FutureTimeoutError:
+            print(f"⚠️ Chat history summaries timed out after {config['summary_timeout_seconds']}s, truncating instead")
+            results = [truncate_tokens(summaries[i], config["summarize_over_tokens"]) for i in long_messages]
+        for i, summary in zip(long_messages, results):
+            summaries[i] = summary
+    return summaries
+
+
+def summarize_message(message: Dict[str, str], config: Optional[Dict[str, Any]] = None) -> str:
+    """One-line summary of a chat message.  Short messages are kept as is."""
+    return summarize_messages([message], config)[0]
+
+
+def format_history(history: List[Dict[str, str]], config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Render chat history within the history token budget: the most recent turns verbatim (truncated), older
+    turns summarized, dropping the oldest once the budget is used up.
+    """
+    config = config or load_context_config()
+    recent_start = max(len(history) - config["recent_turns"], 0)
+    older_summaries = summarize_messages(history[:recent_start], config)
+
+    lines: List[str] = []
+    used = 0
+    for i in range(len(history) - 1, -1, -1):  # newest first, so the oldest are the ones dropped
+        message = history[i]
+        if i >= recent_start:
+            line = f"{message['role']}: {truncate_tokens(message['content'], config['max_message_tokens'])}"
+        else:
+            summary = older_summaries[i]
+            label = message["role"] if summary == message["content"] else f"{message['role']} (summary)"
+            line = f"{label}: {summary}"
+        tokens = count_tokens(line)
+        if used + tokens > config["history_tokens"]:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(reversed(lines))
+
+
+def build_prompt(session_id: str, user_input: str, config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Build a run's opening prompt: budgeted chat history for the session plus the user's input.
+
+    Args:
+        session_id: Conversation to read history from (the current message may already be stored).
+        user_input: The user's new message.
+        config: Context config (defaults to load_context_config()).
+    """
+    from memory_utils import get_recent_history
+
+    config = config or load_context_config()
+    history = get_recent_history(session_id=session_id, limit=config["history_limit"])
+    if history and history[-1]["role"] == "user" and history[-1]["content"] == user_input:
+        history = history[:-1]
+
+    prompt = f"Recent chat history:\n{format_history(history, config)}\n\nUser Input:\n{user_input}\n"
+    print(f"🧮 Prompt: {count_tokens(prompt)} tokens ({len(history)} history messages)")
+    return prompt
+
+
+# ----------------------------------------
+# In-run compaction (agent step callback)
+# ----------------------------------------
+
+def _step_tokens(step) -> int:
+    return sum(
+        count_tokens(part.get("text") if isinstance(part, dict) else str(part))
+        for message in step.to_messages()
+        for part in (message.content if isinstance(message.content, list) else [message.content])
+    )
+
+
+def compact_step_memory(step, agent) -> None:
+    """
+    Step callback: truncate the step's observations, then if the next prompt (system prompt + memory) would
+    exceed max_prompt_tokens, compact the oldest steps - observations replaced by a stub, model output
+    truncated - until it fits.  Register it after log_step so the full step is still logged.
+    """
+    from smolagents import ActionStep
+
+    config = load_context_config()
+    if isinstance(step, ActionStep) and step.observations:
+        step.observations = truncate_tokens(step.observations, config["max_observation_tokens"])
+
+    steps = agent.memory.steps + ([step] if step not in agent.memory.steps else [])
+    sizes = [_step_tokens(s) for s in steps]
+    total = count_tokens(agent.memory.system_prompt.system_prompt) + sum(sizes)
+    if total <= config["max_prompt_tokens"]:
+        return
+
+    compacted = 0
+    for i, old_step in enumerate(steps[:-1]):
+        if total <= config["max_prompt_tokens"]:
+            break
+        if not isinstance(old_step, ActionStep):
+            continue
+        if old_step.observations and not old_step.observations.startswith(COMPACTED_PREFIX):
+            old_step.observations = f"{COMPACTED_PREFIX} {count_tokens(old_step.observations)} tokens]"
+        old_step.model_output = truncate_tokens(old_step.model_output, config["compacted_output_tokens"])
+        new_size = _step_tokens(old_step)
+        if new_size < sizes[i]:
+            total -= sizes[i] - new_size
+            sizes[i] = new_size
+            compacted += 1
+
+    if not compacted:
+        print(f"⚠️ {agent.name}: prompt is ~{total} tokens, over {config['max_prompt_tokens']}, "
+              f"and no earlier steps are left to compact")
+        return
+    print(f"⚠️ {agent.name}: compacted {compacted} earlier steps to stay under {config['max_prompt_tokens']} "
+          f"prompt tokens (now ~{total})")
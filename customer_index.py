@@ -0,0 +1,201 @@
+"""
+Persistent customer first-order index, maintained incrementally from synced orders.
+
+Maps both `customer_email` and the Shopify customer id to the customer's first order date and lifetime
+order count, so classifying an order as new vs returning is an O(1) dictionary lookup instead of a
+scan of all prior orders.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from memory_utils import get_db_connection
+
+
+def _order_keys(order: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Return the (key_type, key_value) identifiers for an order's customer."""
+    keys = []
+    if order.get("customer_id"):
+        keys.append(("id", order["customer_id"]))
+    email = order.get("customer_email") or order.get("email")
+    if email:
+        keys.append(("email", email))
+    return keys
+
+
+class CustomerIndex:
+    def __init__(self):
+        # (key_type, key_value) -> {"first_order_date": str, "lifetime_orders": int}
+        self._cache: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+
+    def update(self, orders: List[Dict[str, Any]], start_date: Optional[str] = None,
+               end_date: Optional[str] = None) -> int:
+        """
+        Add synced orders to the index.  Orders already indexed are ignored, so re-syncing a date range
+        never double-counts lifetime orders.
+
+        Args:
+            orders: Validated order records (ShopifyOrder schema).
+            start_date: First day (YYYY-MM-DD) covered by the sync, recorded as index coverage.
+            end_date: Last day (YYYY-MM-DD) covered by the sync, recorded as index coverage.
+
+        Returns:
+            Number of newly indexed orders.
+        """
+        conn = get_db_connection()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    new_ids = set()
+                    if orders:
+                        inserted = execute_values(cur, """
+                            INSERT INTO customer_index_orders (order_id, created_at_date)
+                            VALUES %s
+                            ON CONFLICT (order_id) DO NOTHING
+                            RETURNING order_id
+                        """, [(o["id"], o["created_at_date"]) for o in orders], fetch=True)
+                        new_ids = {row[0] for row in inserted}
+
+                    # Aggregate the new orders per customer identifier
+                    updates: Dict[Tuple[str, str], List[Any]] = {}
+                    for order in orders:
+                        if order["id"] not in new_ids:
+                            continue
+                        for key in _order_keys(order):
+                            entry = updates.setdefault(key, [order["created_at_date"], order["created_at_date"], 0])
+                            entry[0] = min(entry[0], order["created_at_date"])
+                            entry[1] = max(entry[1], order["created_at_date"])
+                            entry[2] += 1
+
+                    if updates:
+                        execute_values(cur, """
+                            INSERT INTO customer_index (key_type, key_value, first_order_date, last_order_date, lifetime_orders)
+                            VALUES %s
+                            ON CONFLICT (key_type, key_value) DO UPDATE SET
+                                first_order_date = LEAST(customer_index.first_order_date, EXCLUDED.first_order_date),
+                                last_order_date = GREATEST(customer_index.last_order_date, EXCLUDED.last_order_date),
+                                lifetime_orders = customer_index.lifetime_orders + EXCLUDED.lifetime_orders
+                        """, [(*key, *values) for key, values in updates.items()])
+
+                    if start_date and end_date:
+                        self._record_coverage(cur, start_date, end_date)
+        finally:
+            conn.close()
+
+        for key in updates:
+            self._cache.pop(key, None)
+        return len(new_ids)
+
+    def record_coverage(self, start_date: str, end_date: str) -> None:
+        """Mark start_date..end_date as fully indexed (call once a sync of that range has completed)."""
+        conn = get_db_connection()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    self._record_coverage(cur, start_date, end_date)
+        finally:
+            conn.close()
+
+    def _record_coverage(self, cur, start_date: str, end_date: str) -> None:
+        """Extend the contiguous date range the index is known to be complete for."""
+        cur.execute("SELECT covered_from::text, covered_to::text FROM customer_index_coverage WHERE id = 1 FOR UPDATE")
+        row = cur.fetchone()
+        if row:
+            covered_from, covered_to = row
+            day_after = (date.fromisoformat(covered_to) + timedelta(days=1)).isoformat()
+            day_before = (date.fromisoformat(covered_from) - timedelta(days=1)).isoformat()
+            # Only merge ranges that overlap or touch, otherwise coverage would hide a gap
+            if start_date > day_after or end_date < day_before:
+                if (date.fromisoformat(end_date) - date.fromisoformat(start_date)) <= \
+                        (date.fromisoformat(covered_to) - date.fromisoformat(covered_from)):
+                    return
+                covered_from, covered_to = start_date, end_date
+            else:
+                covered_from, covered_to = min(covered_from, start_date), max(covered_to, end_date)
+        else:
+            covered_from, covered_to = start_date, end_date
+
+        cur.execute("""
+            INSERT INTO customer_index_coverage (id, covered_from, covered_to) VALUES (1, %s, %s)
+            ON CONFLICT (id) DO UPDATE SET covered_from = EXCLUDED.covered_from, covered_to = EXCLUDED.covered_to
+        """, (covered_from, covered_to))
+
+    def coverage(self) -> Optional[Tuple[str, str]]:
+        """Return the (covered_from, covered_to) date range the index is complete for, if any."""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT covered_from::text, covered_to::text FROM customer_index_coverage WHERE id = 1")
+                return cur.fetchone()
+        finally:
+            conn.close()
+
+    def covers(self, start_date: str, end_date: str) -> bool:
+        """True if every order between start_date and end_date has been indexed."""
+        covered = self.coverage()
+        return bool(covered) and covered[0] <= start_date and covered[1] >= end_date
+
+    def load(self, orders: Iterable[Dict[str, Any]]) -> None:
+        """Bulk-fetch index entries for the customers of the given orders into the local cache."""
+        missing = {key for order in orders for key in _order_keys(order) if key not in self._cache}
+        if not missing:
+            return
+
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                for key_type in ("id", "email"):
+                    values = [value for kt, value in missing if kt == key_type]
+                    if not values:
+                        continue
+                    cur.execute("""
+                        SELECT key_value, first_order_date::text, lifetime_orders
+                        FROM customer_index
+                        WHERE key_type = %s AND key_value = ANY(%s)
+                    """, (key_type, values))
+                    for key_value, first_order_date, lifetime_orders in cur.fetchall():
+                        self._cache[(key_type, key_value)] = {
+                            "first_order_date": first_order_date,
+                            "lifetime_orders": lifetime_orders,
+                        }
+        finally:
+            conn.close()
+
+        # Remember misses too, so repeated lookups stay O(1)
+        for key in missing:
+            self._cache.setdefault(key, None)
+
+    def lookup(self, customer_email: Optional[str] = None, customer_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """O(1) lookup of a customer's first order date and lifetime order count (call `load` first)."""
+        if customer_id and self._cache.get(("id", customer_id)):
+            return self._cache[("id", customer_id)]
+        if customer_email:
+            return self._cache.get(("email", customer_email))
+        return None
+
+    def classify(self, order: Dict[str, Any], period_start: Optional[str] = None) -> str:
+        """
+        Classify an order's customer as 'new' or 'returning' ('unknown' if not indexed).
+
+        With period_start, a customer is returning if they first ordered before the period; otherwise
+        if they first ordered before this order's date.
+        """
+        entry = self.lookup(order.get("customer_email") or order.get("email"), order.get("customer_id"))
+        if not entry:
+            return "unknown"
+        cutoff = period_start or order["created_at_date"]
+        return "returning" if entry["first_order_date"] < cutoff else "new"
+
+
+# --- Singleton Interface ---
+_customer_index = None
+
+def get_customer_index() -> CustomerIndex:
+    global _customer_index
+
+    # If the index doesn't exist, create it
+    if _customer_index is None:
+        _customer_index = CustomerIndex()
+    return _customer_index
@@ -20,6 +20,7 @@ fix_torch_compatibility()
 
 # Import the actual agent from agents.py
 from agents import manager_agent
+from intent_router import answer_fast_path
 
 def load_eval_questions(file_path: str):
     with open(file_path, "r") as f:
@@ -92,8 +93,10 @@ def evaluate_agent(eval_questions, threshold=0.85):
         print(colored(f"\n[Q{idx+1}] {question}", "cyan"))
 
         try:
-            # Use the manager agent from agent.py
-            agent_response = manager_agent.run(question)
+            # Use the fast path if the question matches a metric template, otherwise the manager agent
+            agent_response = answer_fast_path(question)
+            if agent_response is None:
+                agent_response = manager_agent.run(question)
             
             # Store the response for tracking
             score = similarity(agent_response, ground_truth)
@@ -0,0 +1,160 @@
+"""
+Deterministic fast path for common metric questions.
+
+Questions that match one of the parameterized templates in METRIC_TEMPLATES are answered
+directly from `sync_orders` + the `Metrics` class (one Shopify fetch, no LLM calls) - or without any fetch
+when the days asked about are covered by the webhook-fed order store (see shopify_webhooks.py).
+Anything that doesn't match returns None so the caller can fall back to the Manager agent.
+"""
+
+import calendar
+import os
+import re
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from tools.dataset_catalog import read_dataset, read_table
+from tools.get_orders import sync_orders
+from tools.metrics import metrics
+from customer_index import get_customer_index
+from shopify_webhooks import LINE_ITEM_STORE, ORDER_STORE, store_covers
+
+# Earliest date pulled when a metric needs the store's order history (e.g. returning customers)
+HISTORY_START_DATE = os.environ.get("SHOPIFY_HISTORY_START_DATE", "2020-01-01")
+
+DATE = r"(?P<date>\d{4}-\d{2}-\d{2})"
+MONTH = r"(?P<month>january|february|march|april|may|june|july|august|september|october|november|december)\s+(?P<year>\d{4})"
+MONTH_NAMES = {name.lower(): idx for idx, name in enumerate(calendar.month_name) if name}
+
+
+def _month_bounds(params: Dict[str, str]) -> tuple:
+    """Return (first_day, last_day) ISO strings for a matched month/year."""
+    year = int(params["year"])
+    month = MONTH_NAMES[params["month"].lower()]
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, 1).isoformat(), date(year, month, last_day).isoformat()
+
+
+def _sync(start_date: str, end_date: str) -> Dict[str, object]:
+    """
+    Orders for the date range: read from the webhook-fed order store when it covers the range, otherwise synced
+    into dedicated fast-path datasets, so the agent's working datasets aren't overwritten.  Reads should pass
+    the returned `filters`, as the store holds other days too.
+    """
+    if store_covers(start_date, end_date):
+        filters = [("created_at_date", ">=", start_date), ("created_at_date", "<=", end_date)]
+        return {
+            "orders": read_table(ORDER_STORE, columns=["id"], filters=filters).num_rows,
+            "line_items": read_table(LINE_ITEM_STORE, columns=["order_id"], filters=filters).num_rows,
+            "quarantined": 0,
+            "order_dataset": ORDER_STORE,
+            "line_item_dataset": LINE_ITEM_STORE,
+            "filters": filters,
+        }
+    return sync_orders(start_date, end_date, "fast_path_order_data", "fast_path_line_item_data")
+
+
+def _caveat(sync: Dict[str, object]) -> str:
+    if sync["quarantined"]:
+        return f" Note: {sync['quarantined']} orders failed validation and were excluded."
+    return ""
+
+
+def orders_on_date(params: Dict[str, str]) -> str:
+    sync = _sync(params["date"], params["date"])
+    if not sync["orders"]:
+        return f"0 orders were placed on {params['date']}." + _caveat(sync)
+    count = metrics.unique_count(read_dataset(sync["order_dataset"], columns=["id"], filters=sync.get("filters")), "id")
+    return f"{count} orders were placed on {params['date']}." + _caveat(sync)
+
+
+def top_product_on_date(params: Dict[str, str]) -> str:
+    sync = _sync(params["date"], params["date"])
+    if not sync["line_items"]:
+        return f"No products were sold on {params['date']}." + _caveat(sync)
+    line_items = read_dataset(sync["line_item_dataset"], columns=["name", "quantity"], filters=sync.get("filters"))
+    units = metrics.group_sum(line_items, "name", "quantity")
+    product = units.idxmax()
+    return f"{product} sold the most on {params['date']} ({int(units[product])} units)." + _caveat(sync)
+
+
+def returning_customer_rate_for_month(params: Dict[str, str]) -> str:
+    month_start, month_end = _month_bounds(params)
+    day_before = (date.fromisoformat(month_start) - timedelta(days=1)).isoformat()
+
+    # Only the month itself is needed once the customer index covers prior history, otherwise a
+    # single fetch of history + the month backfills the index first
+    if get_customer_index().covers(HISTORY_START_DATE, day_before):
+        sync = _sync(month_start, month_end)
+    else:
+        sync = _sync(HISTORY_START_DATE, month_end)
+
+    # Only the month's partitions are read, even when history was synced
+    df = read_dataset(sync["order_dataset"],
+                      columns=["id", "created_at_date", "email", "customer_id", "customer_email"],
+                      filters=[("created_at_date", ">=", month_start), ("created_at_date", "<=", month_end)])
+    if df.empty:
+        return f"No orders were placed in {params['month'].title()} {params['year']}." + _caveat(sync)
+
+    result = metrics.new_vs_returning(df, period_start=month_start)
+    if result["returning_customer_rate"] is None:
+        return f"No identifiable customers ordered in {params['month'].title()} {params['year']}."
+
+    return (f"The returning customer rate for {params['month'].title()} {params['year']} was "
+            f"{result['returning_customer_rate']:.2f}% ({result['returning_customers']} of "
+            f"{result['customers']} customers had ordered before)." + _caveat(sync))
+
+
+# Catalog of parameterized metric templates, checked in order
+METRIC_TEMPLATES: List[Dict[str, object]] = [
+    {
+        "name": "orders_on_date",
+        "pattern": re.compile(rf"how many orders (?:were )?(?:placed |made )?on {DATE}", re.IGNORECASE),
+        "handler": orders_on_date,
+    },
+    {
+        "name": "top_product_on_date",
+        "pattern": re.compile(rf"what (?:product|item) sold the most on {DATE}", re.IGNORECASE),
+        "handler": top_product_on_date,
+    },
+    {
+        "name": "returning_customer_rate_for_month",
+        "pattern": re.compile(rf"returning customer rate for (?:all of |the month of )?{MONTH}", re.IGNORECASE),
+        "handler": returning_customer_rate_for_month,
+    },
+]
+
+
+def match_metric_template(question: str) -> Optional[tuple]:
+    """Return (template, params) for the first template matching the question, or None."""
+    for template in METRIC_TEMPLATES:
+        match = template["pattern"].search(question)
+        if match:
+            return template, match.groupdict()
+    return None
+
+
+def answer_fast_path(question: str) -> Optional[str]:
+    """
+    Answer a question deterministically if it matches a known metric template.
+
+    Args:
+        question (str): The raw user question (without chat history).
+
+    Returns:
+        The answer string, or None if the question should be routed to the Manager agent.
+    """
+    matched = match_metric_template(question)
+    if matched is None:
+        return None
+
+    template, params = matched
+    try:
+        answer = template["handler"](params)
+    except Exception as e:
+        # Never fail the user's question on the fast path - let the agent handle it instead
+        print(f"⚠️ Fast path '{template['name']}' failed, falling back to agent: {e}")
+        return None
+
+    print(f"⚡ Answered via fast path '{template['name']}'")
+    return answer
@@ -0,0 +1,338 @@
+"""
+CPU-friendly local LLM backend for the agents (smolagents model interface).
+
+Agent prompts start with the same long system prompt (instructions + tool descriptions) on every step, so the
+model's KV state for that prefix is computed once and reused: each request only runs the forward pass over
+the new conversation tokens.  Requests arriving at the same time (e.g. from several Slack threads) are
+batched into one `generate` call, sharing the cached prefix, and tokens can be streamed as they are produced.
+
+Usage:
+    model = LocalModel("HuggingFaceTB/SmolLM2-360M-Instruct", max_new_tokens=512)
+    model.generate([{"role": "user", "content": [{"type": "text", "text": "Hi"}]}])
+
+or AGENT_MODEL=hf_local:<model id or path> for the agents (see agents.get_model).
+"""
+
+import copy
+import queue
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+from smolagents.models import (ChatMessage, ChatMessageStreamDelta, MessageRole, Model, TokenUsage,
+                               remove_content_after_stop_sequences)
+
+
+@dataclass
+class _Request:
+    """One queued generation request.  Text deltas are put on `output` as they are decoded, then None."""
+    input_ids: List[int]
+    prefix_length: int
+    max_new_tokens: int
+    stop_sequences: Tuple[str, ...]
+    output: "queue.Queue" = field(default_factory=queue.Queue)
+    token_ids: List[int] = field(default_factory=list)
+
+    @property
+    def batch_key(self) -> Tuple[Any, ...]:
+        # Requests are batched together only when they share a cached prefix and generation settings
+        return tuple(self.input_ids[:self.prefix_length]), self.max_new_tokens, self.stop_sequences
+
+
+class _BatchStreamer:
+    """
+    Streamer for a batched `generate` call: routes each row's new tokens to its request and pushes the newly
+    decoded text (incomplete multi-byte characters are held back until the next token).
+    """
+
+    def __init__(self, requests: List[_Request], tokenizer, eos_token_ids: set):
+        self.requests = requests
+        self.tokenizer = tokenizer
+        self.eos_token_ids = eos_token_ids
+        self.finished = [False] * len(requests)
+        self.sent = [""] * len(requests)
+        self.prompt_seen = False
+
+    def put(self, value) -> None:
+        if not self.prompt_seen:  # the first call is the prompt
+            self.prompt_seen = True
+            return
+        for row, token_id in enumerate(value.view(len(self.requests), -1)[:, -1].tolist()):
+            if self.finished[row]:
+                continue
+            if token_id in self.eos_token_ids:
+                self.finished[row] = True
+                continue
+            self.requests[row].token_ids.append(token_id)
+            self._flush(row, final=False)
+
+    def _flush(self, row: int, final: bool) -> None:
+        request = self.requests[row]
+        text = self.tokenizer.decode(request.token_ids, skip_special_tokens=True)
+        if (final or not text.endswith("�")) and len(text) > len(self.sent[row]):
+            request.output.put(text[len(self.sent[row]):])
+            self.sent[row] = text
+
+    def end(self) -> None:
+        for row in range(len(self.requests)):
+            self._flush(row, final=True)
+
+
+class LocalModel(Model):
+    """
+    Local Hugging Face causal LM implementing the smolagents Model interface (generate / generate_stream),
+    with a reusable KV cache for the static system-prompt prefix and micro-batching of concurrent requests.
+
+    Parameters:
+        model_id: Hugging Face model id or local path.
+        device: torch device (defaults to cuda if available, else cpu).
+        torch_dtype: Model dtype, e.g. "bfloat16" (defaults to the checkpoint's).
+        max_new_tokens: Default generation limit (override per call with max_new_tokens=...).
+        temperature: 0 for greedy decoding, otherwise sampling temperature.
+        max_batch_size: Most requests run in one batched generate call.  Defaults to 4 when torch has several
+            threads, else 1 - on a single core a batch costs as much as running its requests one by one.
+        batch_wait_ms: How long the scheduler waits for more requests to join a batch.
+        prefix_cache_size: Number of distinct prefixes (e.g. Manager and Analyst system prompts) kept cached.
+        trust_remote_code: Passed to from_pretrained.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        device: Optional[str] = None,
+        torch_dtype: Optional[str] = None,
+        max_new_tokens: int = 512,
+        temperature: float = 0.0,
+        max_batch_size: Optional[int] = None,
+        batch_wait_ms: float = 20,
+        prefix_cache_size: int = 4,
+        trust_remote_code: bool = False,
+        **kwargs
+    ):
+        try:
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError("LocalModel needs torch and transformers: pip install torch transformers")
+
+        self.torch = torch
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id, trust_remote_code=trust_remote_code)
+        self.model = AutoModelForCausalLM.from_pretrained(
+            model_id, dtype=torch_dtype or "auto", trust_remote_code=trust_remote_code
+        ).to(self.device).eval()
+        if self.tokenizer.pad_token_id is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.max_batch_size = max_batch_size or (4 if torch.get_num_threads() > 1 else 1)
+        self.batch_wait_ms = batch_wait_ms
+        self.prefix_cache_size = prefix_cache_size
+
+        eos = self.model.generation_config.eos_token_id
+        self.eos_token_ids = set(eos if isinstance(eos, list) else [eos]) | {self.tokenizer.eos_token_id}
+        self.eos_token_ids.discard(None)
+
+        # prefix token ids -> KV cache after running the prefix (only touched by the scheduler thread)
+        self._prefix_cache: "OrderedDict[Tuple[int, ...], Any]" = OrderedDict()
+        self.prefix_hits = 0
+        self.prefix_misses = 0
+        self._requests: "queue.Queue[_Request]" = queue.Queue()
+        self._scheduler: Optional[threading.Thread] = None
+        self._scheduler_lock = threading.Lock()
+
+        super().__init__(flatten_messages_as_text=True, model_id=model_id, **kwargs)
+
+    # ----------------------------------------
+    # Prompt preparation
+    # ----------------------------------------
+
+    def _tokenize(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]],
+                  add_generation_prompt: bool) -> List[int]:
+        text = self.tokenizer.apply_chat_template(messages, tools=tools, tokenize=False,
+                                                  add_generation_prompt=add_generation_prompt)
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def _prepare_request(self, messages, stop_sequences, tools_to_call_from, **kwargs) -> _Request:
+        completion_kwargs = self._prepare_completion_kwargs(
+            messages=messages, stop_sequences=stop_sequences, tools_to_call_from=tools_to_call_from,
+            tool_choice=None, **kwargs
+        )
+        messages = completion_kwargs.pop("messages")
+        tools = completion_kwargs.pop("tools", None)
+        input_ids = self._tokenize(messages, tools, add_generation_prompt=True)
+
+        # The static prefix is the leading system message(s); it is cached up to where its tokens still
+        # match the full prompt, leaving at least one token for generate to run
+        prefix_length = 0
+        system_messages = []
+        for message in messages:
+            if message["role"] != MessageRole.SYSTEM:
+                break
+            system_messages.append(message)
+        if system_messages:
+            prefix_ids = self._tokenize(system_messages, tools, add_generation_prompt=False)
+            limit = min(len(prefix_ids), len(input_ids) - 1)
+            while prefix_length < limit and prefix_ids[prefix_length] == input_ids[prefix_length]:
+                prefix_length += 1
+
+        return _Request(
+            input_ids=input_ids,
+            prefix_length=prefix_length,
+            max_new_tokens=int(kwargs.get("max_new_tokens") or kwargs.get("max_tokens") or self.max_new_tokens),
+            stop_sequences=tuple(stop_sequences or ()),
+        )
+
+    # ----------------------------------------
+    # Scheduler: collects concurrent requests into batches
+    # ----------------------------------------
+
+    def _submit(self, request: _Request) -> _Request:
+        with self._scheduler_lock:
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(target=self._run_scheduler, daemon=True)
+                self._scheduler.start()
+        self._requests.put(request)
+        return request
+
+    def _run_scheduler(self) -> None:
+        pending: List[_Request] = []
+        while True:
+            if not pending:
+                pending.append(self._requests.get())
+
+            # Give concurrent requests a moment to arrive, then run the largest compatible batch
+            deadline = time.monotonic() + self.batch_wait_ms / 1000
+            while len(pending) < self.max_batch_size * 4:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(self._requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            key = pending[0].batch_key
+            batch = [r for r in pending if r.batch_key == key][:self.max_batch_size]
+            pending = [r for r in pending if r not in batch]
+            try:
+                self._generate_batch(batch)
+            except Exception as e:
+                for request in batch:
+                    request.output.put(e)
+            for request in batch:
+                request.output.put(None)
+
+    # ----------------------------------------
+    # Generation
+    # ----------------------------------------
+
+    def _prefix_state(self, prefix_ids: Tuple[int, ...]):
+        """KV cache for a prefix, computed on first use and kept in a small LRU."""
+        if prefix_ids in self._prefix_cache:
+            self._prefix_cache.move_to_end(prefix_ids)
+            self.prefix_hits += 1
+            return self._prefix_cache[prefix_ids]
+
+        from transformers import DynamicCache
+
+        self.prefix_misses += 1
+        cache = DynamicCache(config=self.model.config)
+        with self.torch.no_grad():
+            self.model(input_ids=self.torch.tensor([prefix_ids], device=self.device),
+                       past_key_values=cache, use_cache=True)
+        self._prefix_cache[prefix_ids] = cache
+        while len(self._prefix_cache) > self.prefix_cache_size:
+            self._prefix_cache.popitem(last=False)
+        return cache
+
+    def _generate_batch(self, batch: List[_Request]) -> None:
+        """
+        Run one generate call for requests sharing a prefix.  Rows are laid out as
+        [prefix][padding][request tokens] so the cached prefix can be reused for every row; position ids are
+        derived from the attention mask, so the padding does not shift positions.
+        """
+        torch = self.torch
+        prefix_length = batch[0].prefix_length
+        suffixes = [r.input_ids[prefix_length:] for r in batch]
+        width = max(len(s) for s in suffixes)
+        pad = self.tokenizer.pad_token_id
+
+        input_ids, attention_mask = [], []
+        for request, suffix in zip(batch, suffixes):
+            padding = width - len(suffix)
+            input_ids.append(request.input_ids[:prefix_length] + [pad] * padding + suffix)
+            attention_mask.append([1] * prefix_length + [0] * padding + [1] * len(suffix))
+
+        generation_kwargs: Dict[str, Any] = {
+            "input_ids": torch.tensor(input_ids, device=self.device),
+            "attention_mask": torch.tensor(attention_mask, device=self.device),
+            "max_new_tokens": batch[0].max_new_tokens,
+            "do_sample": self.temperature > 0,
+            "pad_token_id": pad,
+            "streamer": _BatchStreamer(batch, self.tokenizer, self.eos_token_ids),
+        }
+        if self.temperature > 0:
+            generation_kwargs["temperature"] = self.temperature
+        if prefix_length:
+            # generate extends the cache it is given, so each batch works on a copy of the cached prefix
+            cache = copy.deepcopy(self._prefix_state(tuple(batch[0].input_ids[:prefix_length])))
+            if len(batch) > 1:
+                cache.batch_repeat_interleave(len(batch))
+            generation_kwargs["past_key_values"] = cache
+        if batch[0].stop_sequences:
+            generation_kwargs["stop_strings"] = list(batch[0].stop_sequences)
+            generation_kwargs["tokenizer"] = self.tokenizer
+
+        with torch.no_grad():
+            self.model.generate(**generation_kwargs)
+
+    def _deltas(self, request: _Request) -> Generator[str, None, None]:
+        while True:
+            item = request.output.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def generate(
+        self,
+        messages: List[ChatMessage | dict],
+        stop_sequences: Optional[List[str]] = None,
+        response_format: Optional[Dict[str, str]] = None,
+        tools_to_call_from: Optional[list] = None,
+        **kwargs
+    ) -> ChatMessage:
+        if response_format is not None:
+            raise ValueError("LocalModel does not support structured outputs.")
+        request = self._submit(self._prepare_request(messages, stop_sequences, tools_to_call_from, **kwargs))
+        text = "".join(self._deltas(request))
+        if stop_sequences:
+            text = remove_content_after_stop_sequences(text, stop_sequences)
+        return ChatMessage(
+            role=MessageRole.ASSISTANT,
+            content=text,
+            raw={"out": text, "prefix_tokens_cached": request.prefix_length},
+            token_usage=TokenUsage(input_tokens=len(request.input_ids), output_tokens=len(request.token_ids)),
+        )
+
+    def generate_stream(
+        self,
+        messages: List[ChatMessage | dict],
+        stop_sequences: Optional[List[str]] = None,
+        response_format: Optional[Dict[str, str]] = None,
+        tools_to_call_from: Optional[list] = None,
+        **kwargs
+    ) -> Generator[ChatMessageStreamDelta, None, None]:
+        if response_format is not None:
+            raise ValueError("LocalModel does not support structured outputs.")
+        request = self._submit(self._prepare_request(messages, stop_sequences, tools_to_call_from, **kwargs))
+        input_tokens = len(request.input_ids)
+        for text in self._deltas(request):
+            yield ChatMessageStreamDelta(content=text, tool_calls=None,
+                                         token_usage=TokenUsage(input_tokens=input_tokens, output_tokens=1))
+            input_tokens = 0  # only counted on the first delta
@@ -1,7 +1,9 @@
 
 import os
 from agents import manager_agent, set_agents_session_id
-from memory_utils import store_message, get_recent_history
+from memory_utils import store_message
+from intent_router import answer_fast_path
+from context_budget import build_prompt
 
 # Ensure OpenAI API key is set
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
@@ -22,15 +24,16 @@ def chat_loop():
 
         store_message(session_id=console_session_id, agent_name='user', role='user', message=user_input)
 
-        # Retrieve recent history
-        recent_chat_history = get_recent_history(session_id=console_session_id, limit=10)
-        recent_chat_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in recent_chat_history])
-        prompt = f"""Recent chat history:\n{recent_chat_text}\n\nUser Input:\n{user_input}\n"""
+        # Recent history within the prompt token budget
+        prompt = build_prompt(session_id=console_session_id, user_input=user_input)
 
         print("\n━━━━━━━━━━━━━━━━━━━━━━━ AGENT RUN START ━━━━━━━━━━━━━━━━━━━━━━━")
 
-        # Use .run() to allow step_callbacks to handle logging
-        reply = manager_agent.run(prompt)
+        # Try the deterministic fast path first, then fall back to the agent
+        reply = answer_fast_path(user_input)
+        if reply is None:
+            # Use .run() to allow step_callbacks to handle logging
+            reply = manager_agent.run(prompt)
 
         print("\n📘 Final Answer:")
         print(reply)
@@ -28,6 +28,8 @@ class ShopifyMCPClient:
                 text=True,
                 bufsize=1
             )
+        # One request in flight at a time - tools may be called from several threads (see parallel_map)
+        self._lock = threading.Lock()
         self._log_stderr()
         self._initialize()
 
@@ -42,6 +44,10 @@ class ShopifyMCPClient:
 
     def _rpc(self, payload: dict) -> dict:
         """Send JSON-RPC message and wait for response."""
+        with self._lock:
+            return self._rpc_locked(payload)
+
+    def _rpc_locked(self, payload: dict) -> dict:
         if self.process.poll() is not None:
             raise RuntimeError("dev-mcp process has exited")
 
@@ -85,11 +91,12 @@ class ShopifyMCPClient:
             raise RuntimeError(f"Dev-MCP initialization failed: {response['error']}")
 
         # Optional: send initialized notification
-        self.process.stdin.write(json.dumps({
-            "jsonrpc": "2.0",
-            "method": "initialized"
-        }) + "\n")
-        self.process.stdin.flush()
+        with self._lock:
+            self.process.stdin.write(json.dumps({
+                "jsonrpc": "2.0",
+                "method": "initialized"
+            }) + "\n")
+            self.process.stdin.flush()
 
     def call_tool(self, tool: str, input_dict: dict) -> dict:
         """Call a registered tool via JSON-RPC."""
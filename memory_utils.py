@@ -1,4 +1,5 @@
 from tools.memory_setup import get_agent_memory
+from tools.dataset_catalog import read_dataset
 import pandas as pd
 import psycopg2
 import os
@@ -17,8 +18,30 @@ def get_db_connection():
     return conn
 
 
+def get_read_connection():
+    """
+    Returns a read-only psycopg2 connection for agent queries.  Uses a replica / read-only role when
+    PG_READ_HOST, PG_READ_USER and PG_READ_PASSWORD are set, otherwise the main database.
+    """
+    conn = psycopg2.connect(host=os.environ.get("PG_READ_HOST", os.environ.get("PGHOST", "localhost")),
+                            database=os.environ.get("PGDATABASE", "replitdb"),
+                            user=os.environ.get("PG_READ_USER", os.environ.get("PGUSER", "user")),
+                            password=os.environ.get("PG_READ_PASSWORD", os.environ.get("PGPASSWORD", "password")))
+    conn.set_session(readonly=True)
+    return conn
+
+
 def get_dataframe_from_memory(key: str) -> pd.DataFrame:
     memory = get_agent_memory()
+
+    # Datasets written to the dataset store (e.g. by get_orders) are registered by path
+    path = memory.recall(f"{key}_path")
+    if path and os.path.exists(path):
+        df = read_dataset(key)
+        if df.empty:
+            raise ValueError(f"Dataset '{key}' is empty.")
+        return df
+
     data = memory.recall(key)
     if not data:
         raise ValueError(f"Memory key '{key}' not found.")
@@ -75,8 +98,8 @@ def get_recent_history(session_id: str, limit=20) -> list[dict]:
             return [{"role": r, "content": m} for r, m in reversed(cur.fetchall())]
 
 
-def store_agent_step(session_id: str, agent_name: str, step_data: dict):
-    """Store details of a smolagengts ActionStep in postgres"""
+def store_agent_step(session_id: str, agent_name: str, step_data: dict) -> int:
+    """Store details of a smolagengts ActionStep in postgres, returning the row id"""
 
     # Connect to the database
     conn = get_db_connection()
@@ -95,6 +118,7 @@ def store_agent_step(session_id: str, agent_name: str, step_data: dict):
                         observations,
                         error
                     ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
                 """, (
                     session_id,
                     agent_name,
@@ -105,6 +129,18 @@ def store_agent_step(session_id: str, agent_name: str, step_data: dict):
                     json.dumps(step_data.get("observations")),
                     json.dumps(step_data.get("error"))
                 ))
+                return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def set_agent_step_summary(step_id: int, summary: str):
+    """Attach a summary (see step_summarizer.py) to a stored agent step"""
+    conn = get_db_connection()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE agent_steps SET summary = %s WHERE id = %s", (summary, step_id))
     finally:
         conn.close()
 
@@ -116,14 +152,14 @@ def get_agent_steps_by_session(session_id: str, limit=50) -> list[dict]:
         with conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT agent_name, step_number, input, output, tool_calls, observations, error, created_at
+                    SELECT agent_name, step_number, input, output, tool_calls, observations, error, summary, created_at
                     FROM agent_steps
                     WHERE session_id = %s
                     ORDER BY created_at DESC
                     LIMIT %s
                 """, (session_id, limit))
 
-                columns = ['agent_name', 'step_number', 'input', 'output', 'tool_calls', 'observations', 'error', 'created_at']
+                columns = ['agent_name', 'step_number', 'input', 'output', 'tool_calls', 'observations', 'error', 'summary', 'created_at']
                 return [dict(zip(columns, row)) for row in cur.fetchall()]
     finally:
         conn.close()
\ No newline at end of file
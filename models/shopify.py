@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from typing import List, Optional
 
 
@@ -6,10 +6,16 @@ class ShopifyLineItem(BaseModel):
     """Pydantic model defining the schema of each line item nested in a Shopify order object (which contains one record per order, and a list of line items)"""
     order_id: Optional[str] = Field(..., description="Shopify global ID for the order")
     order_name: Optional[str] = Field(..., description="Order name as shown in Shopify")
-    sku: str = Field(None, description="Stock Keeping Unit identifier")
+    sku: Optional[str] = Field(None, description="Stock Keeping Unit identifier")
     name: str = Field(..., description="Name of the product purchased")
     quantity: int = Field(..., description="Quantity of the item ordered")
-    amount: float = Field(None, description="Total amount in USD$ for this line item")
+    amount: Optional[float] = Field(None, description="Total amount in USD$ for this line item")
+    created_at_date: Optional[str] = Field(
+        None, description="Date (YYYY-MM-DD) the order was created, denormalized from the order")
+    customer_email: Optional[str] = Field(
+        None, description="Customer email for the order (customer object email, falling back to the order email)")
+    order_total: Optional[float] = Field(
+        None, description="Current total amount in USD$ for the whole order, denormalized from the order")
 
 
 class ShopifyOrder(BaseModel):
@@ -26,6 +32,8 @@ class ShopifyOrder(BaseModel):
         ..., description="Date (ISO timestamp converted to YYYY-MM-DD format) of the last update to the order")
     email: Optional[str] = Field(
         None, description="Customer's email address on file")
+    customer_id: Optional[str] = Field(
+        None, description="Shopify global ID for the customer, if available")
     customer_email: Optional[str] = Field(
         None, description="Email address from the customer object, if available")
     original_total: float = Field(
@@ -34,3 +42,8 @@ class ShopifyOrder(BaseModel):
         ..., description="Current total amount in USD$ for the order, including discounts & taxes")
     line_items: List[ShopifyLineItem] = Field(
         ..., description="List of line items included in the order")
+
+
+# Batch validators - validate a whole page of records in a single call
+ShopifyOrderList = TypeAdapter(List[ShopifyOrder])
+ShopifyLineItemList = TypeAdapter(List[ShopifyLineItem])
@@ -9,8 +9,11 @@ from slack_sdk.oauth import AuthorizeUrlGenerator
 from slack_sdk.oauth.installation_store import FileInstallationStore
 from slack_sdk.oauth.state_store import FileOAuthStateStore
 
-from agent import manager_agent
-from memory_utils import store_message, get_recent_history
+from agents import manager_agent
+from memory_utils import store_message
+from intent_router import answer_fast_path
+from context_budget import build_prompt
+from shopify_webhooks import WEBHOOK_TOPICS, get_webhook_ingestor, verify_webhook
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Flask app & basic config
@@ -140,24 +143,41 @@ def slack_events():
         session_id = f"slack_{team_id}_{channel}_{user}"
         store_message(session_id, agent_name="user", role="user", message=text)
 
-        # Build prompt with recent history
-        recent = get_recent_history(session_id, limit=10)
-        history_txt = "\n".join(f"{m['role']}: {m['content']}" for m in recent)
-        prompt = (
-            "Recent chat history:\n"
-            f"{history_txt}\n\n"
-            "User input:\n"
-            f"{text}"
-        )
+        # Build prompt with recent history (within the prompt token budget)
+        prompt = build_prompt(session_id, text)
 
-        # Run agent & reply
-        reply = manager_agent.run(prompt)
+        # Run agent (unless the fast path can answer) & reply
+        reply = answer_fast_path(text)
+        if reply is None:
+            reply = manager_agent.run(prompt)
         slack_client.chat_postMessage(channel=channel, text=reply)
         store_message(session_id, agent_name="assistant", role="assistant", message=reply)
 
     return "", 200
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Shopify webhooks (orders/create, orders/updated → local order store)
+# ──────────────────────────────────────────────────────────────────────────────
+@app.route("/shopify/webhooks", methods=["POST"])
+def shopify_webhooks():
+    # HMAC over the raw body, before parsing anything
+    if not verify_webhook(request.get_data(), request.headers.get("X-Shopify-Hmac-Sha256")):
+        return "Invalid signature", 401
+
+    topic = request.headers.get("X-Shopify-Topic", "")
+    if topic not in WEBHOOK_TOPICS:
+        return "", 200  # acknowledged, not ingested
+
+    payload = request.get_json(force=True, silent=True)
+    if not isinstance(payload, dict):
+        return "Invalid payload", 400
+
+    # Only spooled and queued here - Shopify expects a response within 5 seconds
+    get_webhook_ingestor().enqueue(topic, payload, request.headers.get("X-Shopify-Webhook-Id"))
+    return "", 200
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Boot
 # ──────────────────────────────────────────────────────────────────────────────
@@ -172,6 +192,8 @@ def _validate_env() -> None:
     if missing:
         print(f"❌ Missing env vars: {', '.join(missing)}", file=sys.stderr)
         sys.exit(1)
+    if not os.getenv("SHOPIFY_WEBHOOK_SECRET"):
+        print("⚠️ SHOPIFY_WEBHOOK_SECRET is not set - Shopify webhooks will be rejected", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -181,6 +203,9 @@ if __name__ == "__main__":
     os.makedirs("./slack_installations", exist_ok=True)
     os.makedirs("./slack_states", exist_ok=True)
 
+    # Re-queue order webhooks a previous process accepted but hadn't stored yet
+    get_webhook_ingestor()
+
     port = int(os.getenv("PORT", 5000))
     print("🚀  Starting Flask on port", port)
     app.run(host="0.0.0.0", port=port, debug=False, use_reloader=False, threaded=True)
\ No newline at end of file
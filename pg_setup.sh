@@ -12,6 +12,8 @@ DB_HOST="${PGHOST}"
 DB_PORT="${PGPORT}"
 AGENT_USER="agent_user"
 AGENT_PW="${AGENT_USER_PW}"               
+READER_USER="agent_reader"
+READER_PW="${AGENT_READER_PW}"
 
 if [ -z "$AGENT_PW" ] || [ -z "$DB_USER" ]; then
   echo "❌ Error: Missing required environment variables: AGENT_USER_PW or DB_USER"
@@ -43,4 +45,29 @@ ALTER DEFAULT PRIVILEGES IN SCHEMA agent_memory
 
 EOF
 
+# Optional read-only role for agent-issued queries (set PG_READ_USER / PG_READ_PASSWORD to use it, see sql_guard.py)
+if [ -n "$READER_PW" ]; then
+  echo "⚙️ Setting up read-only role ${READER_USER}..."
+
+  psql "sslmode=require host=$DB_HOST port=$DB_PORT user=$DB_USER dbname=$DB_NAME" <<EOF
+
+DO \$\$
+BEGIN
+  IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = '${READER_USER}') THEN
+    CREATE ROLE ${READER_USER} LOGIN PASSWORD '${READER_PW}';
+  END IF;
+END
+\$\$;
+
+ALTER ROLE ${READER_USER} SET default_transaction_read_only = on;
+ALTER ROLE ${READER_USER} SET statement_timeout = '30s';
+GRANT USAGE ON SCHEMA agent_memory TO ${READER_USER};
+GRANT SELECT ON ALL TABLES IN SCHEMA agent_memory TO ${READER_USER};
+
+ALTER DEFAULT PRIVILEGES FOR ROLE ${AGENT_USER} IN SCHEMA agent_memory
+  GRANT SELECT ON TABLES TO ${READER_USER};
+
+EOF
+fi
+
 echo "✅ Done: Agent role and schema set up in Neon DB."
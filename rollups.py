@@ -0,0 +1,181 @@
+"""
+Daily metric rollups materialized in Postgres.
+
+Every order sync (see `tools.get_orders.sync_orders`) and every batch of order webhooks (see shopify_webhooks.py)
+re-aggregates the days it covered into:
+  - daily_order_metrics:   orders, revenue, units, customers (new vs returning) and AOV per day
+  - daily_sku_metrics:     units and revenue per SKU / product per day
+  - daily_customer_orders: orders and revenue per customer_email per day
+
+New vs returning comes from the customer first-order index (see customer_index.py).
+Month-level questions can then read ~30 rows instead of thousands of raw orders.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from psycopg2.extras import execute_values
+
+from memory_utils import get_db_connection
+from customer_index import get_customer_index
+
+
+def _date_range(start_date: str, end_date: str) -> List[str]:
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+class DailyRollupAccumulator:
+    """
+    Accumulates per-day aggregates batch by batch, so a streaming sync only holds the (small) rollups in
+    memory rather than every order.  Call `write` once the whole date range has been consumed.
+    """
+
+    def __init__(self):
+        self.order_days = defaultdict(lambda: {"orders": 0, "revenue": 0.0, "units": 0})
+        self.sku_days = defaultdict(lambda: [0, 0.0])        # (day, sku, name) -> [units, revenue]
+        self.customer_days = defaultdict(lambda: [0, 0.0])   # (day, customer_email) -> [orders, revenue]
+
+    def add(self, orders: List[Dict[str, Any]], line_items: List[Dict[str, Any]]) -> None:
+        """Add a batch of orders and the line items belonging to them."""
+        order_dates = {}
+        for order in orders:
+            day = order["created_at_date"]
+            order_dates[order["id"]] = day
+            self.order_days[day]["orders"] += 1
+            self.order_days[day]["revenue"] += order["current_total"] or 0.0
+
+            # Prefer the customer object's email, falling back to the order email
+            customer = order.get("customer_email") or order.get("email")
+            if customer:
+                self.customer_days[(day, customer)][0] += 1
+                self.customer_days[(day, customer)][1] += order["current_total"] or 0.0
+
+        for li in line_items:
+            day = li.get("created_at_date") or order_dates.get(li["order_id"])
+            if day is None:
+                continue
+            self.order_days[day]["units"] += li["quantity"]
+            entry = self.sku_days[(day, li.get("sku") or "", li["name"])]
+            entry[0] += li["quantity"]
+            entry[1] += li.get("amount") or 0.0
+
+    def write(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> int:
+        """
+        Replace the rollups for every accumulated day.  With start_date..end_date, exactly the days in that range
+        are written (zeros when there were no orders) - orders dated outside it (e.g. shop vs UTC timezone edges)
+        are ignored, since replacing those days with partial data would corrupt them.
+
+        Returns:
+            Number of days written to daily_order_metrics.
+        """
+        if start_date and end_date:
+            days = _date_range(start_date, end_date)
+            in_range = set(days)
+            for aggregates in (self.order_days, self.sku_days, self.customer_days):
+                for key in [k for k in aggregates if (k if isinstance(k, str) else k[0]) not in in_range]:
+                    del aggregates[key]
+        else:
+            days = sorted(self.order_days)
+        if not days:
+            return 0
+
+        # First order date per customer, from the customer index
+        index = get_customer_index()
+        customers = {customer for _, customer in self.customer_days}
+        index.load({"customer_email": customer} for customer in customers)
+        first_order_dates = {}
+        for customer in customers:
+            entry = index.lookup(customer_email=customer)
+            if entry:
+                first_order_dates[customer] = entry["first_order_date"]
+
+        customer_counts = defaultdict(lambda: [0, 0, 0])  # day -> [customers, new, returning]
+        for day, customer in self.customer_days:
+            first_order_date = first_order_dates.get(customer)
+            customer_counts[day][0] += 1
+            if first_order_date == day:
+                customer_counts[day][1] += 1
+            elif first_order_date and first_order_date < day:
+                customer_counts[day][2] += 1
+
+        order_rows = []
+        for day in days:
+            stats = self.order_days.get(day, {"orders": 0, "revenue": 0.0, "units": 0})
+            order_rows.append((
+                day,
+                stats["orders"],
+                stats["revenue"],
+                stats["units"],
+                *customer_counts.get(day, [0, 0, 0]),
+                stats["revenue"] / stats["orders"] if stats["orders"] else None,
+            ))
+
+        conn = get_db_connection()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    # Replace the rollups for the synced days
+                    for table in ("daily_order_metrics", "daily_sku_metrics", "daily_customer_orders"):
+                        cur.execute(f"DELETE FROM {table} WHERE order_date = ANY(%s::date[])", (days,))
+
+                    if self.customer_days:
+                        execute_values(cur, """
+                            INSERT INTO daily_customer_orders (order_date, customer_email, orders, revenue)
+                            VALUES %s
+                        """, [(*key, *values) for key, values in self.customer_days.items()])
+
+                    if self.sku_days:
+                        execute_values(cur, """
+                            INSERT INTO daily_sku_metrics (order_date, sku, product_name, units, revenue)
+                            VALUES %s
+                        """, [(*key, *values) for key, values in self.sku_days.items()])
+
+                    execute_values(cur, """
+                        INSERT INTO daily_order_metrics (
+                            order_date, orders, revenue, units, customers, new_customers, returning_customers, aov
+                        ) VALUES %s
+                    """, order_rows)
+        finally:
+            conn.close()
+
+        print(f"Refreshed daily rollups for {len(days)} days ({days[0]} → {days[-1]})")
+        return len(days)
+
+
+def refresh_daily_rollups(
+    orders: List[Dict[str, Any]],
+    line_items: List[Dict[str, Any]],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> int:
+    """
+    Recompute and upsert the daily rollups for every day covered by a set of orders.
+
+    Args:
+        orders: Validated order records (ShopifyOrder schema).
+        line_items: Validated line item records (ShopifyLineItem schema).
+        start_date: First day (YYYY-MM-DD) covered. Days without orders are written as zeros.
+        end_date: Last day (YYYY-MM-DD) covered.
+
+    Returns:
+        Number of days written to daily_order_metrics.
+    """
+    accumulator = DailyRollupAccumulator()
+    accumulator.add(orders, line_items)
+    return accumulator.write(start_date, end_date)
+
+
+def query_rollup(sql: str, params: tuple) -> List[Dict[str, Any]]:
+    """Run a read-only query against the rollup tables and return rows as dictionaries."""
+    conn = get_db_connection()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                columns = [desc[0] for desc in cur.description]
+                return [dict(zip(columns, row)) for row in cur.fetchall()]
+    finally:
+        conn.close()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Check and benchmark llm/local_model.LocalModel on CPU.
+
+Runs agent-shaped prompts (the Analyst's CodeAgent system prompt with its tool descriptions + a short user turn)
+with greedy decoding and checks that prefix-cached, batched and streamed generation all produce exactly the
+same text as a plain `generate` over the full prompt, then prints the timings.  Any small causal LM with a chat template works, e.g.
+HuggingFaceTB/SmolLM2-135M-Instruct or a local path.  Run from the repo root.
+
+Usage:
+    python scripts/bench_local_model.py <model id or path> [num_requests] [max_new_tokens]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from smolagents import CodeAgent
+from llm.local_model import LocalModel
+from tools import run_shopify_query, get_daily_metrics, get_top_skus, get_returning_customer_rate, query_datasets
+from tools.shopify_mcp import search_shopify_docs, introspect_shopify_schema
+
+QUESTIONS = [
+    "How many orders were placed yesterday?",
+    "What was the top selling SKU last week?",
+    "What is the returning customer rate for March?",
+    "Show revenue by day for the last 7 days.",
+    "Which product had the highest average order value?",
+    "How many new customers did we get this month?",
+]
+
+
+def messages_for(system_prompt: str, question: str) -> list:
+    return [
+        {"role": "system", "content": [{"type": "text", "text": system_prompt}]},
+        {"role": "user", "content": [{"type": "text", "text": question}]},
+    ]
+
+
+def plain_generate(model: LocalModel, messages: list, max_new_tokens: int) -> str:
+    """Reference: one uncached generate call over the full prompt."""
+    request = model._prepare_request(messages, None, None)
+    inputs = model.torch.tensor([request.input_ids], device=model.device)
+    with model.torch.no_grad():
+        out = model.model.generate(inputs, attention_mask=model.torch.ones_like(inputs),
+                                   max_new_tokens=max_new_tokens, do_sample=False,
+                                   pad_token_id=model.tokenizer.pad_token_id)
+    return model.tokenizer.decode(out[0, inputs.shape[1]:], skip_special_tokens=True)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(model_id: str, num_requests: int = 4, max_new_tokens: int = 32) -> None:
+    model = LocalModel(model_id, max_new_tokens=max_new_tokens, max_batch_size=num_requests, batch_wait_ms=50)
+    analyst = CodeAgent(
+        name="Analyst", model=model,
+        tools=[run_shopify_query, search_shopify_docs, introspect_shopify_schema,
+               get_daily_metrics, get_top_skus, get_returning_customer_rate, query_datasets]
+    )
+    system_prompt = analyst.system_prompt
+    requests = [messages_for(system_prompt, QUESTIONS[i % len(QUESTIONS)]) for i in range(num_requests)]
+    prompt_tokens = len(model._prepare_request(requests[0], None, None).input_ids)
+    print(f"Model {model_id} on {model.device}: {num_requests} requests, ~{prompt_tokens} prompt tokens, "
+          f"{max_new_tokens} new tokens each")
+
+    expected, plain_s = timed(lambda: [plain_generate(model, m, max_new_tokens) for m in requests])
+    model.generate(requests[0])  # warm the prefix cache
+    cached, cached_s = timed(lambda: [model.generate(m).content for m in requests])
+    with ThreadPoolExecutor(num_requests) as pool:
+        batched, batched_s = timed(lambda: [r.content for r in pool.map(model.generate, requests)])
+    streamed = "".join(delta.content for delta in model.generate_stream(requests[0]))
+
+    assert cached == expected, "prefix-cached output differs from plain generate"
+    assert batched == expected, "batched output differs from plain generate"
+    assert streamed == expected[0], "streamed output differs from plain generate"
+
+    print(f"plain generate:        {plain_s:6.2f}s")
+    print(f"prefix cache:          {cached_s:6.2f}s  ({plain_s / cached_s:.2f}x)")
+    print(f"prefix cache + batch:  {batched_s:6.2f}s  ({plain_s / batched_s:.2f}x)")
+    print(f"identical output ✅  (prefix cache hits {model.prefix_hits}, misses {model.prefix_misses})")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    main(sys.argv[1], *(int(a) for a in sys.argv[2:]))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-record vs batch formatting + validation of Shopify orders.
+
+Generates synthetic raw orders (GraphQL node shape), runs the legacy per-record path
+(format_shopify_order + ShopifyOrder / ShopifyLineItem + model_dump) and the batch path
+(validate_order_page → format_and_validate_shopify_orders), checks both produce identical output and prints
+the speedup.  Run from the repo root with the app's environment (importing tools needs OPENAI_API_KEY).
+
+Usage:
+    python scripts/bench_order_validation.py [num_orders]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tools.get_orders import validate_order_page
+from models.shopify import ShopifyOrder, ShopifyLineItem
+from utils import format_shopify_order
+
+PRODUCTS = [
+    ("Kitchen Sink Cookie - Large Bag", "KSC-L"),
+    ("Kitchen Sink Cookie - Small Bag", "KSC-S"),
+    ("Chocolate Chip Cookie - Large Bag", "CCC-L"),
+    ("Oatmeal Raisin Cookie - Small Bag", None),
+]
+
+
+def synthetic_orders(n: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    orders = []
+    for i in range(n):
+        created = start + timedelta(seconds=rng.randint(0, 180 * 86400))
+        line_items = []
+        for _ in range(rng.randint(1, 4)):
+            name, sku = rng.choice(PRODUCTS)
+            line_items.append({"node": {
+                "name": name,
+                "quantity": rng.randint(1, 5),
+                "sku": sku,
+                "originalTotalSet": {"shopMoney": {"amount": f"{rng.uniform(5, 60):.2f}"}},
+            }})
+        total = f"{rng.uniform(10, 200):.2f}"
+        email = f"customer{rng.randint(0, n // 3)}@example.com"
+        orders.append({
+            "id": f"gid://shopify/Order/{i}",
+            "name": f"#{1000 + i}",
+            "createdAt": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "updatedAt": (created + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "email": email,
+            "customer": {"id": f"gid://shopify/Customer/{email}", "email": email},
+            "currentTotalPriceSet": {"shopMoney": {"amount": total}},
+            "originalTotalPriceSet": {"shopMoney": {"amount": total}},
+            "lineItems": {"edges": line_items},
+        })
+    return orders
+
+
+def per_record(raw_orders: list) -> tuple:
+    """The original get_orders validation loop."""
+    validated_orders, validated_line_items = [], []
+    for raw in raw_orders:
+        formatted_order = format_shopify_order(raw)
+        line_items = formatted_order.pop("line_items", [])
+        order = ShopifyOrder(**{**formatted_order, "line_items": []})
+        validated_orders.append({**formatted_order, "line_items": line_items})
+        for li in line_items:
+            clean_line_item = ShopifyLineItem(**{
+                "sku": li.get("sku"),
+                "name": li.get("name"),
+                "quantity": li.get("quantity"),
+                "amount": li.get("amount"),
+                "order_id": order.id,
+                "order_name": order.name,
+                "created_at_date": order.created_at_date,
+                "customer_email": order.customer_email or order.email,
+                "order_total": order.current_total,
+            })
+            validated_line_items.append(clean_line_item.model_dump())
+    return validated_orders, validated_line_items
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(num_orders: int = 100_000, page_size: int = 250) -> None:
+    raw_orders = synthetic_orders(num_orders)
+    pages = [raw_orders[i:i + page_size] for i in range(0, num_orders, page_size)]
+    print(f"Benchmarking {num_orders:,} synthetic orders in pages of {page_size}")
+
+    (legacy_orders, legacy_items), legacy_s = timed(per_record, raw_orders)
+
+    def batch(pages):
+        orders, items = [], []
+        for page in pages:
+            page_orders, page_items, quarantined = validate_order_page(page)
+            assert not quarantined, quarantined[:1]
+            orders.extend(page_orders)
+            items.extend(page_items)
+        return orders, items
+
+    (batch_orders, batch_items), batch_s = timed(batch, pages)
+
+    assert batch_orders == legacy_orders, "batch orders differ from per-record output"
+    assert batch_items == legacy_items, "batch line items differ from per-record output"
+
+    print(f"per-record: {legacy_s:6.2f}s  ({num_orders / legacy_s:,.0f} orders/s)")
+    print(f"batch:      {batch_s:6.2f}s  ({num_orders / batch_s:,.0f} orders/s)")
+    print(f"speedup:    {legacy_s / batch_s:6.2f}x  (identical output: {len(batch_orders):,} orders, {len(batch_items):,} line items)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
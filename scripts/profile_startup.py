@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Startup-time profile for the agent entry points.
+
+Each step runs in a fresh interpreter (so nothing is already imported) and reports wall time, the slowest
+imports (from `python -X importtime`) and any subprocesses started.  Exits non-zero if `import agents`
+is over budget or starts a subprocess.  Run from the repo root with the app's environment
+(OPENAI_API_KEY must be set).
+
+Usage:
+    python scripts/profile_startup.py [--budget-ms 500] [--top 15] [--build]
+
+    --build also profiles building the agents (`from agents import manager_agent`), which is what
+    main.py / streamlit_app.py / oauth_slack.py pay on their first request.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Runs in the child interpreter: count subprocesses, time the statement, print the result as JSON
+CHILD = """
+import json, subprocess, sys, time
+spawned = []
+_popen_init = subprocess.Popen.__init__
+def _record(self, args, *a, **kw):
+    spawned.append(args if isinstance(args, str) else " ".join(map(str, args)))
+    _popen_init(self, args, *a, **kw)
+subprocess.Popen.__init__ = _record
+start = time.perf_counter()
+exec({statement!r})
+elapsed_ms = (time.perf_counter() - start) * 1000
+print("__PROFILE__" + json.dumps({{"ms": elapsed_ms, "subprocesses": spawned}}), file=sys.stderr)
+"""
+
+
+def profile(statement: str, top: int) -> dict:
+    """Run `statement` in a fresh interpreter with -X importtime and summarize where the time went."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(statement=statement)],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    result, imports = None, []
+    for line in proc.stderr.splitlines():
+        if line.startswith("__PROFILE__"):
+            result = json.loads(line[len("__PROFILE__"):])
+        elif line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+            imports.append((int(cumulative_us), int(self_us), module.rstrip()))
+
+    if result is None:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"`{statement}` failed:\n" + "\n".join(errors[-15:]))
+
+    # Top-level imports only (deeper indentation in the module column marks nested imports)
+    roots = [entry for entry in imports if not entry[2].startswith("  ")]
+    result["slowest"] = sorted(roots, reverse=True)[:top]
+    return result
+
+
+def report(label: str, result: dict) -> None:
+    print(f"\n⏱️  {label}: {result['ms']:.0f} ms, {len(result['subprocesses'])} subprocesses")
+    for command in result["subprocesses"]:
+        print(f"   ⚠️ spawned: {command}")
+    for cumulative_us, _, module in result["slowest"]:
+        print(f"   {cumulative_us / 1000:8.1f} ms  {module.strip()}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=500, help="Budget for `import agents` (ms)")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to show")
+    parser.add_argument("--build", action="store_true", help="Also profile building the agents")
+    args = parser.parse_args()
+
+    result = profile("import agents", args.top)
+    report("import agents", result)
+
+    if args.build:
+        report("from agents import manager_agent", profile("from agents import manager_agent", args.top))
+
+    ok = result["ms"] <= args.budget_ms and not result["subprocesses"]
+    print(f"\n{'✅' if ok else '❌'} import agents: {result['ms']:.0f} ms (budget {args.budget_ms:.0f} ms), "
+          f"{len(result['subprocesses'])} subprocesses")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
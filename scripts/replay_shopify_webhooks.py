@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Replay sample Shopify order webhooks against the local webhook receiver (oauth_slack.py, /shopify/webhooks).
+
+Each JSON payload in the sample directory (scripts/sample_webhooks by default, replayed in file name order) is
+signed with SHOPIFY_WEBHOOK_SECRET exactly like Shopify does and POSTed with the X-Shopify-* headers - the
+topic is taken from the file name (orders_create_*.json / orders_updated_*.json).  With --direct the
+payloads are queued on the ingestor in this process instead, so no server is needed.  --today moves the
+sample orders to today's (UTC) date, to try questions about today.
+
+Usage:
+    python scripts/replay_shopify_webhooks.py [--url http://localhost:5000/shopify/webhooks] [--direct] [--today]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_webhooks")
+TOPICS = {"orders_create": "orders/create", "orders_updated": "orders/updated"}
+
+
+def load_samples(directory: str, today: bool = False):
+    """Yield (topic, payload) for every sample file, in file name order."""
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        prefix = os.path.basename(path).rsplit("_", 1)[0]
+        if prefix not in TOPICS:
+            print(f"⚠️ Skipping {path}: expected orders_create_*.json or orders_updated_*.json")
+            continue
+        with open(path, "r") as f:
+            payload = json.load(f)
+        if today:
+            for field in ("created_at", "updated_at"):
+                if payload.get(field):
+                    payload[field] = datetime.now(timezone.utc).date().isoformat() + payload[field][10:]
+        yield TOPICS[prefix], payload
+
+
+def replay_http(url: str, samples, secret: str) -> int:
+    import requests
+    from shopify_webhooks import sign_webhook
+
+    failures = 0
+    for topic, payload in samples:
+        body = json.dumps(payload).encode("utf-8")
+        response = requests.post(url, data=body, timeout=10, headers={
+            "Content-Type": "application/json",
+            "X-Shopify-Topic": topic,
+            "X-Shopify-Hmac-Sha256": sign_webhook(body, secret),
+            "X-Shopify-Webhook-Id": str(uuid.uuid4()),
+            "X-Shopify-Shop-Domain": os.getenv("SHOPIFY_STORE_URL", "example.myshopify.com"),
+        })
+        ok = response.status_code == 200
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {topic} {payload.get('name')}: HTTP {response.status_code} {response.text[:200]}")
+    return failures
+
+
+def replay_direct(samples) -> int:
+    from shopify_webhooks import get_webhook_ingestor
+
+    ingestor = get_webhook_ingestor()
+    for topic, payload in samples:
+        ingestor.enqueue(topic, payload, str(uuid.uuid4()))
+        print(f"📥 Queued {topic} {payload.get('name')}")
+    ingestor.drain()
+    print(f"✅ Ingested {ingestor.ingested} orders ({ingestor.failed} failed)")
+    return 1 if ingestor.failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000/shopify/webhooks", help="Webhook endpoint")
+    parser.add_argument("--samples", default=SAMPLE_DIR, help="Directory of sample payloads")
+    parser.add_argument("--direct", action="store_true", help="Ingest in this process instead of POSTing")
+    parser.add_argument("--today", action="store_true", help="Move the sample orders to today's date")
+    args = parser.parse_args()
+
+    samples = list(load_samples(args.samples, args.today))
+    if args.direct:
+        return replay_direct(samples)
+
+    secret = os.getenv("SHOPIFY_WEBHOOK_SECRET")
+    if not secret:
+        print("❌ SHOPIFY_WEBHOOK_SECRET must be set (the same secret the server verifies with)")
+        return 1
+    return 1 if replay_http(args.url, samples, secret) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
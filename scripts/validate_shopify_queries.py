@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Check the GraphQL query templates in tools/shopify_queries.py against a live store.
+
+Runs every template for one small page, reports GraphQL errors, and compares Shopify's requested query cost
+with the template's estimate at its full page size (the estimate should not be lower, or pages could exceed
+MAX_QUERY_COST).  Run from the repo root with SHOPIFY_STORE_URL / SHOPIFY_TOKEN set after changing a
+template or moving to a new API version.
+
+Usage:
+    python scripts/validate_shopify_queries.py [page_size]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tools.shopify_queries import TEMPLATES
+from tools.shopify_throttle import API_VERSION, post_graphql
+
+
+def main(page_size: int = 5) -> int:
+    failures = 0
+    print(f"Validating {len(TEMPLATES)} templates against API version {API_VERSION} ({page_size} nodes per query)")
+    for name, template in TEMPLATES.items():
+        result = post_graphql(template.query, {"first": page_size, "cursor": None, "query": None},
+                              cost=template.estimate_cost(page_size))
+        if "errors" in result:
+            failures += 1
+            print(f"❌ {name}: {result['errors']}")
+            continue
+
+        requested = (result.get("extensions") or {}).get("cost", {}).get("requestedQueryCost")
+        estimate = template.estimate_cost(page_size)
+        nodes = len(result["data"][template.connection]["nodes"])
+        full_page = template.page_size(10 ** 9)
+        if requested is not None and requested > estimate:
+            failures += 1
+            print(f"❌ {name}: requested cost {requested} > estimate {estimate} - raise node_cost "
+                  f"(page size {full_page} would cost ~{2 + full_page * (requested - 2) / page_size:.0f})")
+        else:
+            print(f"✅ {name}: {nodes} nodes, requested cost {requested}, estimate {estimate}, page size {full_page}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
@@ -99,9 +99,13 @@ CREATE TABLE IF NOT EXISTS agent_steps (
     tool_calls JSONB,
     observations JSONB,
     error TEXT,
+    summary TEXT,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- One-line LLM summary of each step, filled in the background by step_summarizer.py
+ALTER TABLE agent_steps ADD COLUMN IF NOT EXISTS summary TEXT;
+
 -- Create indexes for agent step tracking
 CREATE INDEX IF NOT EXISTS idx_agent_steps_session_created 
 ON agent_steps(session_id, created_at);
@@ -109,6 +113,73 @@ ON agent_steps(session_id, created_at);
 CREATE INDEX IF NOT EXISTS idx_agent_steps_agent_stepnum
 ON agent_steps(agent_name, step_number);
 
+-- Create daily metric rollup tables (populated by each order sync)
+CREATE TABLE IF NOT EXISTS daily_order_metrics (
+    order_date DATE PRIMARY KEY,
+    orders INT NOT NULL,
+    revenue NUMERIC(14, 2) NOT NULL,
+    units INT NOT NULL,
+    customers INT NOT NULL,
+    new_customers INT NOT NULL,
+    returning_customers INT NOT NULL,
+    aov NUMERIC(14, 2),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS daily_sku_metrics (
+    order_date DATE NOT NULL,
+    sku TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    units INT NOT NULL,
+    revenue NUMERIC(14, 2) NOT NULL,
+    PRIMARY KEY (order_date, sku, product_name)
+);
+
+CREATE TABLE IF NOT EXISTS daily_customer_orders (
+    order_date DATE NOT NULL,
+    customer_email TEXT NOT NULL,
+    orders INT NOT NULL,
+    revenue NUMERIC(14, 2) NOT NULL,
+    PRIMARY KEY (order_date, customer_email)
+);
+
+-- Create customer first-order index (keyed by customer_email and customer id)
+CREATE TABLE IF NOT EXISTS customer_index (
+    key_type TEXT NOT NULL,
+    key_value TEXT NOT NULL,
+    first_order_date DATE NOT NULL,
+    last_order_date DATE NOT NULL,
+    lifetime_orders INT NOT NULL,
+    PRIMARY KEY (key_type, key_value)
+);
+
+CREATE TABLE IF NOT EXISTS customer_index_orders (
+    order_id TEXT PRIMARY KEY,
+    created_at_date DATE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS customer_index_coverage (
+    id INT PRIMARY KEY CHECK (id = 1),
+    covered_from DATE NOT NULL,
+    covered_to DATE NOT NULL
+);
+
+-- Create query log for agent-issued SQL (execution time and guardrail outcome)
+CREATE TABLE IF NOT EXISTS agent_query_log (
+    id SERIAL PRIMARY KEY,
+    sql TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration_ms DOUBLE PRECISION,
+    rows BIGINT,
+    est_cost DOUBLE PRECISION,
+    est_rows DOUBLE PRECISION,
+    error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_agent_query_log_created
+ON agent_query_log(created_at);
+
 -- Verify table exists and is accessible
 INSERT INTO conversation_history (session_id, agent_name, role, message) 
 VALUES ('setup_test', 'system', 'system', 'Database setup verification') 
@@ -0,0 +1,366 @@
+"""
+Shopify order webhooks (`orders/create`, `orders/updated`) -> local order store (used by oauth_slack.py,
+intent_router.py and scripts/replay_shopify_webhooks.py).
+
+The Flask endpoint verifies each webhook's HMAC and only spools the payload to disk and queues it, so Shopify
+gets its 200 immediately (Shopify never redelivers after a 200, so a payload is only removed from the spool once
+it has been stored, and a restarted process picks up whatever is left).  A worker thread upserts queued orders
+in batches into the order store datasets (`shopify_order_store` / `shopify_line_item_store`, partitioned by
+created_at_date - only the days in a batch are rewritten) and the customer index.  Unlike the datasets written
+by get_orders, the store is never replaced by a sync.
+
+The store is complete only for the days after webhooks went live (LIVE_SINCE_KEY): `orders/updated` also fires
+for old orders, whose days the store holds only partially.  So only those days' rollups are recomputed from the
+store, and only they are answered locally (see store_covers) - questions about today need no API pagination.
+A batch that fails to ingest is retried with backoff, and moves LIVE_SINCE_KEY forward, as the store may be
+missing orders from then on.
+"""
+
+import base64
+import glob
+import hashlib
+import hmac
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+
+from tools.dataset_catalog import DATA_PATH, dataset_path, read_table, upsert_partitions
+from tools.get_orders import LINE_ITEM_ARROW_SCHEMA, ORDER_ARROW_SCHEMA, QUARANTINE_PATH, validate_order_page
+from tools.memory_setup import get_agent_memory
+from customer_index import get_customer_index
+from rollups import refresh_daily_rollups
+
+WEBHOOK_TOPICS = ("orders/create", "orders/updated")
+ORDER_STORE = "shopify_order_store"
+LINE_ITEM_STORE = "shopify_line_item_store"
+LIVE_SINCE_KEY = "shopify_webhooks_live_since"   # agent memory: last UTC date the store may be incomplete for
+SPOOL_PATH = os.path.join(DATA_PATH, "webhook_spool")
+BATCH_SIZE = 100
+BATCH_WAIT_SECONDS = 2.0
+SEEN_WEBHOOK_IDS = 10_000   # delivery ids remembered to drop Shopify's duplicate deliveries
+RETRY_BASE_SECONDS = 30.0    # a failed batch is retried after this, doubling per attempt ...
+RETRY_MAX_SECONDS = 900.0    # ... up to this
+
+
+def verify_webhook(body: bytes, hmac_header: Optional[str], secret: Optional[str] = None) -> bool:
+    """
+    Check the X-Shopify-Hmac-Sha256 header: base64 HMAC-SHA256 of the raw request body, keyed with the app's
+    client secret (SHOPIFY_WEBHOOK_SECRET).  Always False when either is missing.
+    """
+    secret = secret or os.getenv("SHOPIFY_WEBHOOK_SECRET")
+    if not secret or not hmac_header:
+        return False
+    digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode(), hmac_header)
+
+
+def sign_webhook(body: bytes, secret: str) -> str:
+    """The X-Shopify-Hmac-Sha256 header Shopify would send for body (used to replay sample payloads)."""
+    return base64.b64encode(hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest()).decode()
+
+
+def _utc(timestamp: str) -> str:
+    """Webhook timestamps carry the shop's offset; the GraphQL API (and the order datasets) use UTC."""
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).astimezone(timezone.utc) \
+        .strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def webhook_to_order_node(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a webhook's REST order payload to the GraphQL order node shape fetched by get_orders, so both go
+    through the same validation (utils.format_and_validate_shopify_orders).
+    """
+    customer = payload.get("customer") or {}
+    return {
+        "id": payload.get("admin_graphql_api_id") or f"gid://shopify/Order/{payload['id']}",
+        "name": payload.get("name"),
+        "createdAt": _utc(payload["created_at"]),
+        "updatedAt": _utc(payload.get("updated_at") or payload["created_at"]),
+        "email": payload.get("email"),
+        "customer": {
+            "id": customer.get("admin_graphql_api_id") or (f"gid://shopify/Customer/{customer['id']}"
+                                                           if customer.get("id") else None),
+            "email": customer.get("email"),
+        } if customer else None,
+        "currentTotalPriceSet": {"shopMoney": {"amount": payload.get("current_total_price") or 0}},
+        "originalTotalPriceSet": {"shopMoney": {"amount": payload.get("total_price") or 0}},
+        "lineItems": {"edges": [
+            {"node": {
+                "name": item.get("name"),
+                "quantity": item.get("quantity"),
+                "sku": item.get("sku") or None,
+                "originalTotalSet": {"shopMoney": {"amount": float(item.get("price") or 0) * (item.get("quantity") or 0)}},
+            }}
+            for item in payload.get("line_items") or []
+        ]},
+    }
+
+
+def _utc_today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _live_since() -> Optional[str]:
+    return get_agent_memory().recall(LIVE_SINCE_KEY)
+
+
+def mark_store_incomplete() -> None:
+    """Record that orders may be missing from today on, so only later days count as complete."""
+    today = _utc_today()
+    if (_live_since() or "") < today:
+        get_agent_memory().remember(LIVE_SINCE_KEY, today)
+
+
+def _quarantine(records: List[Dict[str, Any]]) -> None:
+    os.makedirs(QUARANTINE_PATH, exist_ok=True)
+    with open(os.path.join(QUARANTINE_PATH, "shopify_webhooks.jsonl"), "a") as quarantine_file:
+        for record in records:
+            quarantine_file.write(json.dumps(record) + "\n")
+    print(f"⚠️ {len(records)} webhook orders quarantined")
+
+
+def upsert_orders(raw_orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Validate a batch of order nodes and upsert them into the order store, the customer index and the daily
+    rollups.  Versions older than one already in the batch or the store (out-of-order deliveries) are skipped;
+    invalid orders are quarantined to memories/quarantine/shopify_webhooks.jsonl.  Rollups are only recomputed
+    for days after LIVE_SINCE_KEY: for earlier days the store holds just the orders webhooks happened to touch,
+    and replacing a complete day (written by sync_orders) with those would corrupt it.  A failed customer index
+    update moves LIVE_SINCE_KEY to today, so no rollups are recomputed against the stale index.
+
+    Returns:
+        Summary of the batch: orders upserted, skipped as stale, quarantined, the days rewritten and the days
+        whose rollups were recomputed.
+    """
+    # Latest version of each order in the batch (timestamps are UTC, so they compare as strings)
+    latest: Dict[str, Dict[str, Any]] = {}
+    for raw in raw_orders:
+        if raw["id"] not in latest or raw["updatedAt"] >= latest[raw["id"]]["updatedAt"]:
+            latest[raw["id"]] = raw
+    stale = len(raw_orders) - len(latest)
+
+    orders, line_items, quarantined = validate_order_page(list(latest.values()))
+    if quarantined:
+        _quarantine(quarantined)
+
+    # ... and against the store
+    current = {order["id"]: order for order in orders}
+    if current and dataset_path(ORDER_STORE):
+        stored = read_table(ORDER_STORE, columns=["id", "updated_at_ts"], filters=[
+            ("created_at_date", "in", sorted({order["created_at_date"] for order in orders})),
+            ("id", "in", list(current)),
+        ])
+        for order_id, updated_at in zip(stored["id"].to_pylist(), stored["updated_at_ts"].to_pylist()):
+            if order_id in current and updated_at and current[order_id]["updated_at_ts"] < updated_at:
+                del current[order_id]
+                stale += 1
+    if not current:
+        return {"orders": 0, "stale": stale, "quarantined": len(quarantined), "days": [], "rollup_days": []}
+
+    orders = list(current.values())
+    line_items = [li for li in line_items if li["order_id"] in current]
+    days: Dict[str, List[str]] = {}
+    for order in orders:
+        days.setdefault(order["created_at_date"], []).append(order["id"])
+
+    order_partitions = upsert_partitions(ORDER_STORE, pa.Table.from_pylist(orders, schema=ORDER_ARROW_SCHEMA), "id")
+    # Every stored line item of an updated order is replaced, so removed items drop out
+    line_item_partitions = upsert_partitions(
+        LINE_ITEM_STORE, pa.Table.from_pylist(line_items, schema=LINE_ITEM_ARROW_SCHEMA), "order_id",
+        replace_keys=days
+    )
+
+    # The index must know new customers before the rollups classify them as new vs returning - without it
+    # they'd be classified wrongly, so (like a failed batch) the days up to today no longer count as complete
+    try:
+        get_customer_index().update(orders)
+    except Exception as e:
+        print(f"⚠️ Failed to update customer index: {e}")
+        mark_store_incomplete()
+    live_since = _live_since()
+    complete_days = sorted(day for day in days if live_since and day > live_since)
+    if complete_days:
+        try:
+            # Whole days from the store, so a day's rollups cover every order received for it
+            refresh_daily_rollups(
+                [row for day in complete_days for row in order_partitions[day].to_pylist()],
+                [row for day in complete_days for row in line_item_partitions[day].to_pylist()],
+            )
+        except Exception as e:
+            print(f"⚠️ Failed to refresh daily rollups: {e}")
+
+    return {"orders": len(orders), "stale": stale, "quarantined": len(quarantined), "days": sorted(days),
+            "rollup_days": complete_days}
+
+
+def store_covers(start_date: str, end_date: str) -> bool:
+    """
+    Whether the order store holds every order created between start_date and end_date (inclusive): days after
+    the one webhooks started arriving on (or a batch last failed to ingest), up to today (UTC).
+    """
+    live_since = _live_since()
+    return bool(live_since) and live_since < start_date and end_date <= _utc_today() \
+        and dataset_path(ORDER_STORE) is not None
+
+
+class WebhookIngestor:
+    """
+    Spool and queue of webhook payloads, and the worker thread that upserts them.  `enqueue` only writes the
+    payload to the spool directory; the worker sends up to BATCH_SIZE orders (or whatever arrived within
+    BATCH_WAIT_SECONDS) per upsert and removes their spool files once stored.  A failed batch stays spooled and
+    is queued again after a backoff (RETRY_BASE_SECONDS, doubling up to RETRY_MAX_SECONDS); payloads left in the
+    spool by a previous process are queued again when an ingestor is created.
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE, batch_wait_seconds: float = BATCH_WAIT_SECONDS,
+                 spool_path: str = SPOOL_PATH):
+        self.batch_size = batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self.spool_path = spool_path
+        self._queue: "queue.Queue[str]" = queue.Queue()   # spool file paths
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._attempts: Dict[str, int] = {}   # spool path -> failed ingest attempts
+        self.received = 0
+        self.ingested = 0
+        self.failed = 0
+
+        os.makedirs(spool_path, exist_ok=True)
+        pending = sorted(glob.glob(os.path.join(spool_path, "*.json")))
+        if pending:
+            print(f"📥 Re-queuing {len(pending)} spooled order webhooks")
+            with self._lock:
+                for path in pending:
+                    self._queue.put(path)
+                self._start_worker()
+
+    def _start_worker(self) -> None:
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True, name="shopify_webhook_ingestor")
+            self._worker.start()
+
+    def enqueue(self, topic: str, payload: Dict[str, Any], webhook_id: Optional[str] = None) -> bool:
+        """
+        Spool and queue a verified webhook payload.
+
+        Args:
+            topic: X-Shopify-Topic header, e.g. 'orders/create'.
+            payload: The parsed order payload.
+            webhook_id: X-Shopify-Webhook-Id header, used to drop repeated deliveries of the same webhook.
+
+        Returns:
+            False if the topic isn't ingested or the webhook was already received, True once spooled.
+        """
+        if topic not in WEBHOOK_TOPICS:
+            return False
+        with self._lock:
+            if webhook_id:
+                if webhook_id in self._seen:
+                    return False
+                self._seen[webhook_id] = None
+                if len(self._seen) > SEEN_WEBHOOK_IDS:
+                    self._seen.popitem(last=False)
+
+        # Named by arrival time, so a restarted process replays the spool in order
+        path = os.path.join(self.spool_path, f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(payload, f)
+        os.replace(f"{path}.tmp", path)
+
+        with self._lock:
+            self.received += 1
+            self._queue.put(path)
+            self._start_worker()
+        return True
+
+    def drain(self) -> None:
+        """Wait until every queued payload has been upserted (or failed)."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                self._ingest(batch)
+                for path in batch:
+                    os.remove(path)
+                    self._attempts.pop(path, None)
+            except Exception as e:
+                # The payloads stay spooled and are retried, but until then the store is missing them - so days
+                # from today on no longer count as complete
+                self.failed += len(batch)
+                attempt = max(self._attempts.get(path, 0) for path in batch) + 1
+                for path in batch:
+                    self._attempts[path] = attempt
+                delay = min(RETRY_BASE_SECONDS * 2 ** (attempt - 1), RETRY_MAX_SECONDS)
+                print(f"❌ Failed to ingest {len(batch)} order webhooks (kept in {self.spool_path}, retrying in "
+                      f"{delay:.0f}s): {e}")
+                retry = threading.Timer(delay, self._requeue, args=(batch,))
+                retry.daemon = True
+                retry.start()
+                try:
+                    mark_store_incomplete()
+                except Exception as mark_error:
+                    print(f"⚠️ Failed to mark the order store incomplete: {mark_error}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _requeue(self, paths: List[str]) -> None:
+        for path in paths:
+            if os.path.exists(path):
+                self._queue.put(path)
+
+    def _ingest(self, paths: List[str]) -> None:
+        nodes, quarantined = [], []
+        for path in paths:
+            with open(path, "r") as f:
+                payload = json.load(f)
+            try:
+                nodes.append(webhook_to_order_node(payload))
+            except Exception as e:
+                quarantined.append({"reason": f"Webhook failed conversion: {e!r}", "record": payload})
+        if quarantined:
+            _quarantine(quarantined)
+
+        # The day webhooks go live is only partly covered, so it counts as incomplete
+        if not _live_since():
+            mark_store_incomplete()
+        summary = upsert_orders(nodes)
+        self.ingested += summary["orders"]
+        print(f"🛒 Ingested {summary['orders']} webhook orders for {', '.join(summary['days']) or 'no days'}"
+              f" ({summary['stale']} stale, {summary['quarantined'] + len(quarantined)} quarantined,"
+              f" rollups refreshed for {', '.join(summary['rollup_days']) or 'no days'})")
+
+
+# --- Singleton Interface ---
+_ingestor_instance = None
+_ingestor_lock = threading.Lock()
+
+
+def get_webhook_ingestor() -> WebhookIngestor:
+    global _ingestor_instance
+
+    with _ingestor_lock:
+        if _ingestor_instance is None:
+            _ingestor_instance = WebhookIngestor()
+    return _ingestor_instance
@@ -0,0 +1,157 @@
+"""
+Guardrails for agent-issued SQL (used by tools/execute_sql.py).
+
+Before a statement runs it is EXPLAINed, and plans whose estimated cost or row count exceed the limits in
+config.yaml (`sql:` section) are rejected with a request to rewrite the query.  Every session gets a
+statement_timeout and work_mem, reads go to a read-only connection (a replica / read-only role when the
+PG_READ_* env vars are set), and each query's execution time is logged to agent_query_log.
+"""
+
+import os
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+
+from memory_utils import get_db_connection, get_read_connection
+
+DEFAULT_SQL_CONFIG = {
+    "max_plan_cost": 1_000_000,
+    "max_plan_rows": 5_000_000,
+    "statement_timeout_ms": 30_000,
+    "work_mem": "64MB",
+}
+
+EXPLAINABLE = ("select", "with", "insert", "update", "delete", "values", "table")
+# EXPLAIN [ANALYZE] [VERBOSE] statement, or EXPLAIN (option [value], ...) statement
+EXPLAIN_STATEMENT = re.compile(
+    r"^\s*explain\s+(?:\((?P<options>[^)]*)\)\s*|(?P<keywords>(?:(?:analy[sz]e|verbose)\s+)*))(?P<statement>.*)$",
+    re.IGNORECASE | re.DOTALL
+)
+
+
+class QueryRejected(Exception):
+    """Raised when a query's estimated plan exceeds the configured limits."""
+
+    def __init__(self, message: str, cost: float, rows: float):
+        super().__init__(message)
+        self.cost = cost
+        self.rows = rows
+
+
+def load_sql_config() -> Dict[str, Any]:
+    """Return the `sql:` section of config.yaml, with defaults for anything unset."""
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
+    try:
+        with open(config_path, "r") as f:
+            config = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        config = {}
+    return {**DEFAULT_SQL_CONFIG, **(config.get("sql") or {})}
+
+
+def explained_statement(sql: str) -> Tuple[Optional[str], bool]:
+    """
+    Split an EXPLAIN into the statement it explains and whether ANALYZE is on (which executes that statement).
+
+    Returns:
+        (explained statement, analyze) - (None, False) when sql isn't an EXPLAIN.
+    """
+    match = EXPLAIN_STATEMENT.match(sql)
+    if not match:
+        return None, False
+    if match.group("options") is not None:
+        analyze = False
+        for option in match.group("options").split(","):
+            name, _, value = option.strip().lower().partition(" ")
+            if name in ("analyze", "analyse"):
+                analyze = value.strip() not in ("false", "off", "0")
+    else:
+        analyze = re.search(r"analy[sz]e", match.group("keywords"), re.IGNORECASE) is not None
+    return match.group("statement"), analyze
+
+
+def is_read_query(sql: str) -> bool:
+    """
+    True for statements that only read (SELECT / WITH without data-modifying clauses / EXPLAIN, unless it's an
+    EXPLAIN ANALYZE of a statement that writes).
+    """
+    statement, analyze = explained_statement(sql)
+    if statement is not None:
+        return not analyze or is_read_query(statement)
+    lower_sql = sql.strip().lower()
+    return (lower_sql.startswith("select") or lower_sql.startswith("with")) and \
+        not re.search(r"\b(insert|update|delete|merge|into)\b", lower_sql)
+
+
+@contextmanager
+def guarded_connection(read_only: bool, config: Optional[Dict[str, Any]] = None):
+    """
+    Open a connection with the session guards applied.
+
+    Args:
+        read_only: Route to the read-only connection (replica / reader role) and refuse writes.
+        config: SQL config (defaults to load_sql_config()).
+    """
+    config = config or load_sql_config()
+    conn = get_read_connection() if read_only else get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('statement_timeout', %s, false), set_config('work_mem', %s, false)",
+                        (str(config["statement_timeout_ms"]), str(config["work_mem"])))
+        conn.commit()  # keep the settings for the session even if a later statement fails
+        yield conn
+    finally:
+        conn.close()
+
+
+def check_plan(cursor, sql: str, config: Optional[Dict[str, Any]] = None) -> Tuple[Optional[float], Optional[float]]:
+    """
+    EXPLAIN a statement and reject it if its estimated cost or rows exceed the configured limits.  A plain EXPLAIN
+    doesn't run anything and is let through; EXPLAIN ANALYZE runs its statement, so that statement is checked.
+
+    Returns:
+        (estimated total cost, estimated rows), or (None, None) for statements that can't be explained.
+
+    Raises:
+        QueryRejected: if the plan is over the limits.
+    """
+    config = config or load_sql_config()
+    statement, analyze = explained_statement(sql)
+    if statement is not None:
+        return check_plan(cursor, statement, config) if analyze else (None, None)
+    if not sql.strip().lower().startswith(EXPLAINABLE):
+        return None, None
+
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = cursor.fetchone()[0][0]["Plan"]
+    cost, rows = plan["Total Cost"], plan["Plan Rows"]
+
+    if cost > config["max_plan_cost"] or rows > config["max_plan_rows"]:
+        raise QueryRejected(
+            f"estimated cost {cost:,.0f} (limit {config['max_plan_cost']:,}) and {rows:,} rows "
+            f"(limit {config['max_plan_rows']:,}). Rewrite the query: filter with WHERE, aggregate in SQL, "
+            f"avoid cross joins or add a LIMIT.",
+            cost, rows
+        )
+    return cost, rows
+
+
+def log_query(sql: str, status: str, duration_ms: Optional[float] = None, rows: Optional[int] = None,
+              est_cost: Optional[float] = None, est_rows: Optional[float] = None, error: Optional[str] = None) -> None:
+    """Record a query's execution time and outcome in agent_query_log (failures to log are ignored)."""
+    try:
+        conn = get_db_connection()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        INSERT INTO agent_query_log (sql, status, duration_ms, rows, est_cost, est_rows, error)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, (sql, status, duration_ms, rows, est_cost, est_rows, error))
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ Could not log query timing: {e}")
+
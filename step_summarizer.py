@@ -0,0 +1,238 @@
+"""
+Background summarization of agent steps and chat turns (used by utils.summarize_step, context_budget.py and
+the agents' log_step callback).
+
+The prompt template is loaded once and a single model client is reused.  Requests are queued and a worker
+thread sends up to BATCH_SIZE pending steps in one LLM request, so callers get a Future back immediately
+and the agent loop never waits on a summary.  Summaries are memoized by a hash of the step content (and
+persisted in agent memory), so the same step or turn is never summarized twice.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PROMPT_PATH = "prompts/summarizer_prompt.txt"
+SUMMARY_MODEL = "gpt-4.1-nano"
+SUMMARY_CACHE_KEY = "step_summary_cache"
+SUMMARY_CACHE_SIZE = 2_000
+BATCH_SIZE = 8
+BATCH_WAIT_SECONDS = 0.2
+
+# Field -> (label in the prompt, characters kept)
+STEP_FIELDS = {
+    "input_text": ("Input", 500),
+    "output_text": ("Output", 500),
+    "tool_calls": ("Tool calls", 300),
+    "observations": ("Observations", 300),
+    "error": ("Error", 200),
+}
+
+
+def fallback_summary(step_data: Dict[str, Any]) -> str:
+    """Simple summary used when the LLM is unavailable or returns something unusable."""
+    if step_data.get("tool_calls"):
+        return f"Executed tool: {step_data['tool_calls'][0]}"
+    elif step_data.get("error"):
+        return f"Encountered error: {str(step_data['error'])[:50]}..."
+    elif step_data.get("output_text"):
+        return "Generated agent response"
+    else:
+        return "Processing step"
+
+
+def step_hash(step_data: Dict[str, Any]) -> str:
+    """Hash of the parts of a step that go into its summary."""
+    content = {field: str(step_data.get(field) or "") for field in STEP_FIELDS}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def render_step(number: int, step_data: Dict[str, Any]) -> str:
+    lines = [f"### Step {number}"]
+    for field, (label, limit) in STEP_FIELDS.items():
+        value = step_data.get(field)
+        if field == "tool_calls" and value:
+            value = "; ".join(str(tc) for tc in value)
+        lines.append(f"{label}: {str(value)[:limit] if value else 'None'}")
+    return "\n".join(lines)
+
+
+class _Pending:
+    def __init__(self, key: str, step_data: Dict[str, Any]):
+        self.key = key
+        self.step_data = step_data
+        self.future: Future = Future()
+
+
+class StepSummarizer:
+    """
+    Queue-backed summarizer.  `submit` returns a Future immediately; `summarize` / `summarize_many` wait for
+    the result.  Identical steps submitted while one is in flight share its Future.
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE, batch_wait_seconds: float = BATCH_WAIT_SECONDS):
+        self.batch_size = batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self._template: Optional[str] = None
+        self._model = None
+        self._memo: Optional[Dict[str, str]] = None
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self.llm_requests = 0
+
+    # --- Lazily loaded resources ---
+
+    @property
+    def template(self) -> str:
+        if self._template is None:
+            with open(PROMPT_PATH, "r") as f:
+                self._template = f.read()
+        return self._template
+
+    @property
+    def model(self):
+        if self._model is None:
+            from smolagents import OpenAIServerModel
+            self._model = OpenAIServerModel(model_id=SUMMARY_MODEL, api_key=os.environ["OPENAI_API_KEY"])
+        return self._model
+
+    def _load_memo(self) -> Dict[str, str]:
+        if self._memo is None:
+            from tools.memory_setup import get_agent_memory
+            self._memo = dict(get_agent_memory().recall(SUMMARY_CACHE_KEY) or {})
+        return self._memo
+
+    def _save_memo(self, summaries: Dict[str, str]) -> None:
+        from tools.memory_setup import get_agent_memory
+
+        with self._lock:
+            memo = self._load_memo()
+            memo.update(summaries)
+            # Keep the most recent summaries only
+            for stale_key in list(memo)[:-SUMMARY_CACHE_SIZE]:
+                del memo[stale_key]
+            get_agent_memory().remember(SUMMARY_CACHE_KEY, dict(memo))
+
+    # --- Public interface ---
+
+    def submit(self, step_data: Dict[str, Any], callback: Optional[Callable[[str], None]] = None) -> Future:
+        """
+        Queue a step for summarization without waiting.
+
+        Args:
+            step_data: Step fields - input_text, output_text, tool_calls, observations, error.
+            callback: Called with the summary once it is ready (on the worker thread).
+
+        Returns:
+            Future resolving to the summary string.
+        """
+        key = step_hash(step_data)
+        with self._lock:
+            cached = self._load_memo().get(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+            elif key in self._in_flight:
+                future = self._in_flight[key]
+            else:
+                pending = _Pending(key, step_data)
+                future = self._in_flight[key] = pending.future
+                self._queue.put(pending)
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, daemon=True)
+                    self._worker.start()
+
+        if callback:
+            future.add_done_callback(lambda f: callback(f.result()))
+        return future
+
+    def summarize(self, step_data: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Summarize one step, waiting for the result."""
+        return self.submit(step_data).result(timeout)
+
+    def summarize_many(self, steps: List[Dict[str, Any]], timeout: Optional[float] = None) -> List[str]:
+        """
+        Summarize several steps (sent together in as few LLM requests as possible), waiting for all - at most
+        `timeout` seconds in total (raising concurrent.futures.TimeoutError).
+        """
+        futures = [self.submit(step_data) for step_data in steps]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        return [future.result(None if deadline is None else max(deadline - time.monotonic(), 0)) for future in futures]
+
+    # --- Worker ---
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            # Never let an exception kill the worker: every future gets a result, or failing that an exception
+            summaries: List[str] = []
+            try:
+                summaries, from_llm = self._summarize_batch([pending.step_data for pending in batch])
+                if from_llm:  # fallbacks are not memoized, so the step is summarized properly next time
+                    self._save_memo({pending.key: summary for pending, summary in zip(batch, summaries)})
+            except Exception as e:
+                print(f"⚠️ Step summarization batch failed: {e}")
+            finally:
+                for i, pending in enumerate(batch):
+                    with self._lock:
+                        self._in_flight.pop(pending.key, None)
+                    try:
+                        pending.future.set_result(summaries[i] if i < len(summaries)
+                                                  else fallback_summary(pending.step_data))
+                    except Exception as e:
+                        pending.future.set_exception(e)
+
+    def _summarize_batch(self, steps: List[Dict[str, Any]]) -> Tuple[List[str], bool]:
+        """
+        One LLM request for the whole batch.
+
+        Returns:
+            (summaries in step order, whether they came from the LLM rather than the fallback)
+        """
+        try:
+            prompt = self.template.format(
+                count=len(steps),
+                steps="\n\n".join(render_step(i + 1, step_data) for i, step_data in enumerate(steps))
+            )
+            self.llm_requests += 1
+            response = self.model([{"role": "user", "content": [{"type": "text", "text": prompt}]}])
+            content = response.content.strip()
+            content = content[content.find("["):content.rfind("]") + 1]
+            summaries = json.loads(content)
+            if not isinstance(summaries, list) or len(summaries) != len(steps):
+                raise ValueError(f"expected {len(steps)} summaries, got {content[:200]!r}")
+        except Exception as e:
+            print(f"⚠️ Step summarization failed, using fallback summaries: {e}")
+            return [fallback_summary(step_data) for step_data in steps], False
+
+        return [str(summary).strip() or fallback_summary(step_data)
+                for summary, step_data in zip(summaries, steps)], True
+
+
+# --- Singleton Interface ---
+_summarizer_instance = None
+
+
+def get_step_summarizer() -> StepSummarizer:
+    global _summarizer_instance
+
+    if _summarizer_instance is None:
+        _summarizer_instance = StepSummarizer()
+    return _summarizer_instance
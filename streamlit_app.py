@@ -40,6 +40,8 @@ fix_torch_streamlit_compatibility()
 
 from agents import manager_agent, analyst_agent, set_agents_session_id
 from memory_utils import store_message, get_recent_history
+from intent_router import answer_fast_path
+from context_budget import build_prompt, count_tokens
 
 st.set_page_config(
     page_title="AI Agent Chat",
@@ -211,14 +213,14 @@ if st.session_state.pending_user_message and st.session_state.processing_message
 
     try:
         st.write("🔍 Debug: Building prompt...")
-        # build prompt from last 10 messages
-        hist = get_recent_history(st.session_state.session_id, limit=10)
-        txt = "\n".join(f"{m['role']}: {m['content']}" for m in hist)
-        prompt = f"Recent history:\n{txt}\n\nUser: {st.session_state.pending_user_message}"
-        st.write(f"🔍 Debug: Prompt built, length: {len(prompt)} chars")
+        # build prompt from recent history, within the prompt token budget
+        prompt = build_prompt(st.session_state.session_id, st.session_state.pending_user_message)
+        st.write(f"🔍 Debug: Prompt built, length: {len(prompt)} chars ({count_tokens(prompt)} tokens)")
         
-        st.write("🤖 Debug: Calling manager_agent.run()...")
-        resp = manager_agent.run(prompt)
+        resp = answer_fast_path(st.session_state.pending_user_message)
+        if resp is None:
+            st.write("🤖 Debug: Calling manager_agent.run()...")
+            resp = manager_agent.run(prompt)
         st.write(f"✅ Debug: Agent response received, length: {len(resp)} chars")
 
         with answer_ct:
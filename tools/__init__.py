@@ -2,13 +2,20 @@ from .get_orders import get_orders
 from .group_by_and_agg_data import group_by_and_agg_data
 from .describe_model import describe_model
 from .list_models import list_models
-from .metrics import unique_count, total_count, sum_field, mean_field, top_values, group_sum, group_mean, group_count, average_order_value, percent_missing
+from .metrics import unique_count, total_count, sum_field, mean_field, top_values, group_sum, group_mean, group_count, average_order_value, percent_missing, new_vs_returning, compute_metrics
 from .store_dataset import store_dataset
 from .list_datasets import list_datasets
+from .preview_dataset import preview_dataset
+from .page_dataset import page_dataset
 from .load_dataset import load_dataset
 from .describe_tool import describe_tool
 from .generate_postgres_ddl import generate_postgres_ddl
 from .execute_sql import execute_sql
+from .query_datasets import query_datasets
 from .generate_sql import generate_sql
-# from .insert_df_to_postgres import insert_df_to_postgres
-from .shopify_graphql import run_shopify_query
+from .insert_df_to_postgres import insert_df_to_postgres
+from .shopify_graphql import run_shopify_query, paginate_shopify_query
+from .parallel_map import parallel_map
+from .shopify_queries import shopify_orders, shopify_products, shopify_customers, shopify_inventory, shopify_refunds
+from .reference_cache import lookup_products, lookup_skus, lookup_customers
+from .daily_metrics import get_daily_metrics, get_top_skus, get_returning_customer_rate
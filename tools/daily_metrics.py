@@ -0,0 +1,97 @@
+from smolagents import tool
+from typing import Dict, Any
+from rollups import query_rollup
+
+
+@tool
+def get_daily_metrics(start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    Read precomputed daily order metrics (orders, revenue, units, new vs returning customers, AOV) from the
+    daily rollup table.  Prefer this over fetching raw orders for date-level and month-level questions.
+    Rollups only exist for days covered by a full order sync or by the Shopify order webhook store - check
+    totals.days_with_rollups, and for missing days fetch the orders with shopify_orders instead.
+
+    Args:
+        start_date (str): start date in YYYY-MM-DD format (inclusive).
+        end_date (str): end date in YYYY-MM-DD format (inclusive).
+
+    Returns:
+        dict: One row per day plus totals for the whole period.
+    """
+    rows = query_rollup("""
+        SELECT order_date::text AS date, orders, revenue::float AS revenue, units, customers,
+               new_customers, returning_customers, aov::float AS aov
+        FROM daily_order_metrics
+        WHERE order_date BETWEEN %s AND %s
+        ORDER BY order_date
+    """, (start_date, end_date))
+
+    orders = sum(r["orders"] for r in rows)
+    revenue = sum(r["revenue"] for r in rows)
+    return {
+        "days": rows,
+        "totals": {
+            "days_with_rollups": len(rows),
+            "orders": orders,
+            "revenue": round(revenue, 2),
+            "units": sum(r["units"] for r in rows),
+            "aov": round(revenue / orders, 2) if orders else None,
+        }
+    }
+
+
+@tool
+def get_top_skus(start_date: str, end_date: str, top_n: int = 10) -> Dict[str, Any]:
+    """
+    Return the best-selling SKUs / products by units sold between two dates, read from the daily SKU rollup table.
+
+    Args:
+        start_date (str): start date in YYYY-MM-DD format (inclusive).
+        end_date (str): end date in YYYY-MM-DD format (inclusive).
+        top_n (int): Number of top products to return.
+
+    Returns:
+        dict: Products ordered by units sold, with revenue.
+    """
+    rows = query_rollup("""
+        SELECT NULLIF(sku, '') AS sku, product_name, SUM(units) AS units, SUM(revenue)::float AS revenue
+        FROM daily_sku_metrics
+        WHERE order_date BETWEEN %s AND %s
+        GROUP BY sku, product_name
+        ORDER BY units DESC
+        LIMIT %s
+    """, (start_date, end_date, top_n))
+    return {"start_date": start_date, "end_date": end_date, "top_skus": rows}
+
+
+@tool
+def get_returning_customer_rate(start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    Compute the returning customer rate for a period from the rollup tables: the share of customers ordering in
+    the period whose first order was before start_date.  Accurate only if prior history has been synced.
+
+    Args:
+        start_date (str): start date in YYYY-MM-DD format (inclusive).
+        end_date (str): end date in YYYY-MM-DD format (inclusive).
+
+    Returns:
+        dict: Customer counts and the returning customer rate as a percentage.
+    """
+    rows = query_rollup("""
+        SELECT COUNT(DISTINCT d.customer_email) AS customers,
+               COUNT(DISTINCT d.customer_email) FILTER (WHERE f.first_order_date < %s::date) AS returning_customers
+        FROM daily_customer_orders d
+        JOIN customer_index f ON f.key_type = 'email' AND f.key_value = d.customer_email
+        WHERE d.order_date BETWEEN %s AND %s
+    """, (start_date, start_date, end_date))
+
+    customers = rows[0]["customers"]
+    returning = rows[0]["returning_customers"]
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "customers": customers,
+        "returning_customers": returning,
+        "new_customers": customers - returning,
+        "returning_customer_rate": round(returning / customers * 100, 2) if customers else None,
+    }
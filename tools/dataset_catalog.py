@@ -0,0 +1,483 @@
+# dataset_catalog.py
+"""
+Catalog of the parquet datasets the agent stores under memories/.
+
+A dataset is either a single file (`memories/{name}.parquet`) or, when it has a `created_at_date` column,
+a hive-partitioned directory (`memories/{name}/created_at_date=YYYY-MM-DD/part-N.parquet`).  Every file keeps
+row-group statistics, so reads with filters skip whole partitions (directory pruning) and row groups
+(min/max statistics) instead of scanning the full history.  Path, schema and summary are registered in
+agent memory, keyed by dataset name.
+"""
+
+import glob
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from tools.memory_setup import get_agent_memory
+
+DATA_PATH = "memories"  # make sure this folder exists
+PARTITION_COLUMN = "created_at_date"
+SAMPLE_ROWS = 3
+HANDLE_VALUE_CHARS = 80  # sample values in dataset handles are cut to this length
+MAX_OPEN_PARTITION_FILES = 64
+MAX_BUFFERED_ROWS = 200_000  # rows a partitioned writer holds before flushing its largest partitions
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+os.makedirs(DATA_PATH, exist_ok=True)
+
+# One lock per dataset name, so in-process writers (a sync replacing a dataset, webhook upserts) don't interleave
+_dataset_locks: Dict[str, threading.RLock] = {}
+_dataset_locks_guard = threading.Lock()
+
+# Filters use pyarrow's DNF form, e.g. [("created_at_date", ">=", "2025-01-01"), ("sku", "in", ["A", "B"])]
+Filters = Optional[Sequence[Sequence[Any]]]
+
+
+def json_safe_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Make a record storable in agent memory (dates, decimals etc. become strings)."""
+    return {k: v if v is None or isinstance(v, (str, int, float, bool)) else str(v) for k, v in record.items()}
+
+
+def register_dataset(
+    name: str,
+    file_path: str,
+    schema: List[str],
+    num_rows: int,
+    dtypes: Optional[Dict[str, str]] = None,
+    sample: Optional[List[Dict[str, Any]]] = None,
+    partition_column: Optional[str] = None
+) -> str:
+    """
+    Register a dataset's path, schema and summary in agent memory, returning the summary.
+    Column types and a few sample rows are stored too, so tools can describe a dataset without loading it.
+    """
+    summary = f"'{name}' has {num_rows} rows and columns: {', '.join(schema)}"
+    if partition_column:
+        summary += f" (partitioned by {partition_column})"
+
+    memory = get_agent_memory()
+    memory.remember(f"{name}_path", file_path)
+    memory.remember(f"{name}_schema", schema)
+    memory.remember(f"{name}_rows", num_rows)
+    memory.remember(f"{name}_dtypes", dtypes or {})
+    memory.remember(f"{name}_sample", [json_safe_record(r) for r in (sample or [])[:SAMPLE_ROWS]])
+    memory.remember(f"{name}_partitioning", partition_column)
+    memory.remember(f"{name}_summary", summary)
+
+    return summary
+
+
+def dataset_lock(name: str) -> threading.RLock:
+    """Lock held while a dataset's files are being replaced."""
+    with _dataset_locks_guard:
+        return _dataset_locks.setdefault(name, threading.RLock())
+
+
+def _remove_path(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class DatasetWriter:
+    """
+    Incrementally writes batches of records to a parquet dataset, one row group per batch, so the caller
+    never holds more than a batch in memory.  The file is swapped into place and registered on `close`.
+    """
+
+    def __init__(self, name: str, schema: pa.Schema):
+        self.name = name
+        self.schema = schema
+        self.file_path = os.path.join(DATA_PATH, f"{name}.parquet")
+        self._tmp_path = f"{self.file_path}.tmp"
+        self._writer = pq.ParquetWriter(self._tmp_path, schema, write_statistics=True)
+        self.num_rows = 0
+        self.sample: List[Dict[str, Any]] = []
+
+    def write(self, records: Union[List[Dict[str, Any]], pa.Table]) -> None:
+        table = records if isinstance(records, pa.Table) else pa.Table.from_pylist(records, schema=self.schema)
+        if not table.num_rows:
+            return
+        self._writer.write_table(table)
+        self.num_rows += table.num_rows
+        if len(self.sample) < SAMPLE_ROWS:
+            self.sample.extend(table.slice(0, SAMPLE_ROWS - len(self.sample)).to_pylist())
+
+    def close(self) -> str:
+        """Finish the file, replace any previous version of the dataset and register it in memory."""
+        self._writer.close()
+        with dataset_lock(self.name):
+            _remove_path(os.path.join(DATA_PATH, self.name))  # a previous partitioned version
+            os.replace(self._tmp_path, self.file_path)
+        return register_dataset(self.name, self.file_path, self.schema.names, self.num_rows,
+                                _dtypes(self.schema), self.sample)
+
+    def abort(self) -> None:
+        """Discard a partially written dataset, leaving any previous version untouched."""
+        self._writer.close()
+        _remove_path(self._tmp_path)
+
+
+class PartitionedDatasetWriter:
+    """
+    Like DatasetWriter, but splits every batch by `partition_column` into hive-style directories
+    (`{name}/{partition_column}=value/part-N.parquet`).  The partition column is also kept inside the files.
+    Rows are buffered per partition and written on `close`, so out-of-order input still gives one file per
+    partition.  Once more than MAX_BUFFERED_ROWS are buffered, the largest partitions are flushed early (at most
+    MAX_OPEN_PARTITION_FILES files are open at once; a partition flushed again after its file was closed gets a
+    new part file, but only after accumulating another large buffer).
+    """
+
+    def __init__(self, name: str, schema: pa.Schema, partition_column: str = PARTITION_COLUMN):
+        if partition_column not in schema.names:
+            raise ValueError(f"Partition column '{partition_column}' is not in the schema of '{name}'.")
+        self.name = name
+        self.schema = schema
+        self.partition_column = partition_column
+        self.file_path = os.path.join(DATA_PATH, name)
+        self._tmp_path = f"{self.file_path}.tmp"
+        _remove_path(self._tmp_path)
+        os.makedirs(self._tmp_path)
+        self._writers: "OrderedDict[str, pq.ParquetWriter]" = OrderedDict()
+        self._parts: Dict[str, int] = {}
+        self._buffers: Dict[str, List[pa.Table]] = {}
+        self._buffered_rows: Dict[str, int] = {}
+        self._total_buffered = 0
+        self.num_rows = 0
+        self.sample: List[Dict[str, Any]] = []
+
+    def _writer_for(self, value: str) -> pq.ParquetWriter:
+        if value in self._writers:
+            self._writers.move_to_end(value)
+            return self._writers[value]
+
+        if len(self._writers) >= MAX_OPEN_PARTITION_FILES:
+            _, oldest = self._writers.popitem(last=False)
+            oldest.close()
+
+        part = self._parts.get(value, -1) + 1
+        self._parts[value] = part
+        directory = os.path.join(self._tmp_path, f"{self.partition_column}={value}")
+        os.makedirs(directory, exist_ok=True)
+        writer = pq.ParquetWriter(os.path.join(directory, f"part-{part}.parquet"), self.schema, write_statistics=True)
+        self._writers[value] = writer
+        return writer
+
+    def write(self, records: Union[List[Dict[str, Any]], pa.Table]) -> None:
+        table = records if isinstance(records, pa.Table) else pa.Table.from_pylist(records, schema=self.schema)
+        if not table.num_rows:
+            return
+
+        keys = table.column(self.partition_column)
+        for value in pc.unique(keys).to_pylist():
+            mask = pc.is_null(keys) if value is None else pc.equal(keys, value)
+            rows = table.filter(mask)
+            value = NULL_PARTITION if value is None else value
+            self._buffers.setdefault(value, []).append(rows)
+            self._buffered_rows[value] = self._buffered_rows.get(value, 0) + rows.num_rows
+        self._total_buffered += table.num_rows
+
+        self.num_rows += table.num_rows
+        if len(self.sample) < SAMPLE_ROWS:
+            self.sample.extend(table.slice(0, SAMPLE_ROWS - len(self.sample)).to_pylist())
+
+        if self._total_buffered > MAX_BUFFERED_ROWS:
+            # Largest first, down to half the limit, so early flushes write few, large row groups
+            for value in sorted(self._buffered_rows, key=self._buffered_rows.get, reverse=True):
+                if self._total_buffered <= MAX_BUFFERED_ROWS // 2:
+                    break
+                self._flush(value)
+
+    def _flush(self, value: str) -> None:
+        """Write a partition's buffered rows as one row group."""
+        tables = self._buffers.pop(value)
+        self._total_buffered -= self._buffered_rows.pop(value)
+        self._writer_for(value).write_table(pa.concat_tables(tables))
+
+    def _close_files(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def close(self) -> str:
+        """Finish all partition files, replace any previous version of the dataset and register it in memory."""
+        for value in sorted(self._buffers):
+            self._flush(value)
+        self._close_files()
+        with dataset_lock(self.name):
+            _remove_path(f"{self.file_path}.parquet")  # a previous unpartitioned version
+            _remove_path(self.file_path)
+            os.replace(self._tmp_path, self.file_path)
+        return register_dataset(self.name, self.file_path, self.schema.names, self.num_rows,
+                                _dtypes(self.schema), self.sample, self.partition_column)
+
+    def abort(self) -> None:
+        """Discard a partially written dataset, leaving any previous version untouched."""
+        self._buffers.clear()
+        self._buffered_rows.clear()
+        self._total_buffered = 0
+        self._close_files()
+        _remove_path(self._tmp_path)
+
+
+def upsert_partitions(
+    name: str,
+    table: pa.Table,
+    key_column: str,
+    replace_keys: Optional[Dict[str, List[str]]] = None,
+    partition_column: str = PARTITION_COLUMN
+) -> Dict[str, pa.Table]:
+    """
+    Insert or replace rows of a partitioned dataset by key, rewriting only the partitions involved (the dataset is
+    created if it doesn't exist yet).  Each partition is written to a temporary file that is then swapped in.
+
+    Args:
+        name: Dataset name.
+        table: New rows (must match the dataset's schema).
+        key_column: Column identifying a row, e.g. 'id'.  Stored rows with the same key are replaced.
+        replace_keys: Partition value -> keys whose stored rows are removed, when that differs from the keys in
+                      `table` (e.g. every line item of an updated order, including removed ones).
+        partition_column: Column the dataset is partitioned by.
+
+    Returns:
+        Partition value -> the partition's full contents after the upsert.
+    """
+    path = os.path.join(DATA_PATH, name)
+    if os.path.isfile(f"{path}.parquet"):
+        raise ValueError(f"Dataset '{name}' is not partitioned by {partition_column}.")
+
+    values = table.column(partition_column)
+    if replace_keys is None:
+        replace_keys = {}
+        for value in pc.unique(values).to_pylist():
+            mask = pc.is_null(values) if value is None else pc.equal(values, value)
+            replace_keys[value] = table.filter(mask).column(key_column).to_pylist()
+
+    partitions: Dict[str, pa.Table] = {}
+    with dataset_lock(name):
+        os.makedirs(path, exist_ok=True)
+        for value, keys in replace_keys.items():
+            mask = pc.is_null(values) if value is None else pc.equal(values, value)
+            rows = table.filter(mask)
+            directory = os.path.join(path, f"{partition_column}={NULL_PARTITION if value is None else value}")
+            existing = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+            if existing:
+                current = ds.dataset(existing, format="parquet", schema=table.schema).to_table()
+                current = current.filter(pc.invert(pc.is_in(current[key_column],
+                                                            value_set=pa.array(keys, current.schema.field(key_column).type))))
+                rows = pa.concat_tables([current, rows])
+
+            # Files starting with '_' are ignored by dataset scans until they are renamed
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = os.path.join(directory, "_upsert.tmp")
+            pq.write_table(rows, tmp_path, write_statistics=True)
+            os.replace(tmp_path, os.path.join(directory, "part-0.parquet"))
+            for file in existing:
+                if os.path.basename(file) != "part-0.parquet":
+                    os.remove(file)
+            partitions[value] = rows
+
+        memory = get_agent_memory()
+        sample = memory.recall(f"{name}_sample") or table.slice(0, SAMPLE_ROWS).to_pylist()
+        num_rows = ds.dataset(path, format="parquet", partitioning="hive").count_rows()
+        register_dataset(name, path, table.schema.names, num_rows, _dtypes(table.schema), sample, partition_column)
+    return partitions
+
+
+def dataset_writer(name: str, schema: pa.Schema) -> Union[DatasetWriter, PartitionedDatasetWriter]:
+    """Return a partitioned writer when the schema has a string PARTITION_COLUMN, otherwise a single-file writer."""
+    partition_type = schema.field(PARTITION_COLUMN).type if PARTITION_COLUMN in schema.names else None
+    if partition_type is not None and (pa.types.is_string(partition_type) or pa.types.is_large_string(partition_type)):
+        return PartitionedDatasetWriter(name, schema)
+    return DatasetWriter(name, schema)
+
+
+def _dtypes(schema: pa.Schema) -> Dict[str, str]:
+    return {field.name: str(field.type) for field in schema}
+
+
+def dataset_path(name: str) -> Optional[str]:
+    """Resolve a dataset name (or a direct path to a parquet file / dataset directory) to its path on disk."""
+    if name.endswith(".parquet") or os.path.isdir(name):
+        path = name
+    else:
+        path = get_agent_memory().recall(f"{name}_path")
+    return path if path and os.path.exists(path) else None
+
+
+def open_dataset(name: str) -> ds.Dataset:
+    """
+    Open a stored dataset lazily (nothing is read until it is scanned).  Files are memory-mapped and
+    partition directories are typed as strings so partition values compare like the column they came from.
+    """
+    path = dataset_path(name)
+    if not path:
+        raise FileNotFoundError(f"Dataset '{name}' not found in memory.")
+
+    partitioning = None
+    if os.path.isdir(path):
+        partitions = sorted(entry for entry in os.listdir(path) if "=" in entry)
+        if partitions:
+            # Type partition keys like the column stored in the files, so the two merge into one field
+            files = glob.glob(os.path.join(path, partitions[0], "*.parquet"))
+            file_schema = pq.read_schema(files[0]) if files else pa.schema([])
+            keys = sorted({entry.split("=", 1)[0] for entry in partitions})
+            partitioning = ds.partitioning(pa.schema([
+                (key, file_schema.field(key).type if key in file_schema.names else pa.string()) for key in keys
+            ]), flavor="hive")
+
+    return ds.dataset(path, format="parquet", partitioning=partitioning,
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+def _filter_expression(filters: Filters) -> Optional[ds.Expression]:
+    if not filters:
+        return None
+    return pq.filters_to_expression([tuple(f) for f in filters])
+
+
+def read_table(name: str, columns: Optional[List[str]] = None, filters: Filters = None) -> pa.Table:
+    """Read a dataset as an Arrow table, pushing column projection and filters down to the scan."""
+    return open_dataset(name).to_table(columns=columns, filter=_filter_expression(filters))
+
+
+def read_dataset(name: str, columns: Optional[List[str]] = None, filters: Filters = None) -> pd.DataFrame:
+    """Read a dataset as a DataFrame, pushing column projection and filters down to the scan."""
+    return read_table(name, columns, filters).to_pandas()
+
+
+def iter_batches(name: str, columns: Optional[List[str]] = None, filters: Filters = None,
+                 batch_size: int = 50000) -> Iterator[pa.RecordBatch]:
+    """
+    Stream a dataset in record batches of up to about batch_size rows, with column projection and filters
+    pushed down.  Small row groups (e.g. one per partition per sync page) are coalesced.
+    """
+    pending, pending_rows = [], 0
+    for batch in open_dataset(name).to_batches(columns=columns, filter=_filter_expression(filters),
+                                               batch_size=batch_size):
+        if not batch.num_rows:
+            continue
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= batch_size:
+            yield pa.Table.from_batches(pending).combine_chunks().to_batches()[0]
+            pending, pending_rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending).combine_chunks().to_batches()[0]
+
+
+def list_catalog() -> List[str]:
+    """Names of all datasets on disk under DATA_PATH (single files and partitioned directories)."""
+    names = []
+    for entry in sorted(os.listdir(DATA_PATH)):
+        path = os.path.join(DATA_PATH, entry)
+        if entry.endswith(".parquet") and os.path.isfile(path):
+            names.append(entry[:-len(".parquet")])
+        elif os.path.isdir(path) and not entry.endswith(".tmp") and \
+                glob.glob(os.path.join(path, "*", "*.parquet")):
+            names.append(entry)
+    return names
+
+
+def _is_date_column(field: pa.Field) -> bool:
+    return pa.types.is_date(field.type) or pa.types.is_timestamp(field.type) or \
+        field.name.endswith("_date") or field.name.endswith("_ts")
+
+
+def dataset_stats(name: str) -> Dict[str, Any]:
+    """
+    Describe a dataset from parquet footer metadata only (no data pages are read).
+
+    Returns:
+        Dict with row count, files, size on disk, column types, partition column and the
+        min / max of every date or timestamp column (from row-group statistics).
+    """
+    path = dataset_path(name)
+    if not path:
+        raise FileNotFoundError(f"Dataset '{name}' not found in memory.")
+
+    files = [path] if os.path.isfile(path) else sorted(glob.glob(os.path.join(path, "*", "*.parquet")))
+    schema = open_dataset(name).schema
+    date_columns = [field.name for field in schema if _is_date_column(field)]
+    ranges: Dict[str, List[Any]] = {}
+    num_rows = 0
+
+    for file in files:
+        metadata = pq.ParquetFile(file).metadata
+        num_rows += metadata.num_rows
+        column_index = {metadata.schema.column(i).name: i for i in range(metadata.num_columns)}
+        for row_group in range(metadata.num_row_groups):
+            for column in date_columns:
+                if column not in column_index:
+                    continue
+                statistics = metadata.row_group(row_group).column(column_index[column]).statistics
+                if statistics is None or not statistics.has_min_max:
+                    continue
+                low, high = ranges.setdefault(column, [statistics.min, statistics.max])
+                ranges[column] = [min(low, statistics.min), max(high, statistics.max)]
+
+    return {
+        "name": name,
+        "rows": num_rows,
+        "files": len(files),
+        "size_mb": round(sum(os.path.getsize(f) for f in files) / 1_000_000, 3),
+        "columns": _dtypes(schema),
+        "partitioned_by": get_agent_memory().recall(f"{name}_partitioning") if os.path.isdir(path) else None,
+        "date_ranges": {column: [str(low), str(high)] for column, (low, high) in ranges.items()},
+    }
+
+
+def preview_table(name: str, rows: int = 5) -> pa.Table:
+    """Return the first rows of a dataset, reading only the first row group(s) needed."""
+    return open_dataset(name).head(rows)
+
+
+def page_table(name: str, offset: int = 0, limit: int = 20, columns: Optional[List[str]] = None) -> pa.Table:
+    """Return rows [offset, offset + limit) of a dataset (in storage order), reading only the columns asked for."""
+    dataset = open_dataset(name)
+    stop = min(offset + limit, dataset.count_rows())
+    if offset >= stop:
+        return dataset.schema.empty_table() if columns is None else \
+            pa.schema([dataset.schema.field(c) for c in columns]).empty_table()
+    return dataset.take(pa.array(range(offset, stop)), columns=columns)
+
+
+def dataset_handle(name: str) -> Dict[str, Any]:
+    """
+    Compact description of a stored dataset for tool results - name, row count, column types and the sample
+    rows registered with it - read from agent memory, so large results can be referred to without being
+    copied into the agent's context.
+    """
+    memory = get_agent_memory()
+    return {
+        "dataset": name,
+        "rows": memory.recall(f"{name}_rows"),
+        "columns": memory.recall(f"{name}_dtypes") or {},
+        "sample": [
+            {k: v[:HANDLE_VALUE_CHARS] + "..." if isinstance(v, str) and len(v) > HANDLE_VALUE_CHARS else v
+             for k, v in record.items()}
+            for record in memory.recall(f"{name}_sample") or []
+        ],
+    }
+
+
+def dataset_version(name: str) -> str:
+    """Fingerprint of a dataset's files (path, size, mtime) - changes whenever the dataset is rewritten."""
+    path = dataset_path(name)
+    if not path:
+        raise FileNotFoundError(f"Dataset '{name}' not found in memory.")
+    files = [path] if os.path.isfile(path) else sorted(glob.glob(os.path.join(path, "*", "*.parquet")))
+    fingerprint = [(f, os.stat(f).st_size, os.stat(f).st_mtime_ns) for f in files]
+    return hashlib.sha256(repr((path, fingerprint)).encode()).hexdigest()
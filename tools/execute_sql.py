@@ -1,52 +1,163 @@
 from smolagents import tool
 import psycopg2
+import psycopg2.errors
 import os
-from memory_utils import get_db_connection
+import time
+import json
+import uuid
+import decimal
+import pandas as pd
+import pyarrow as pa
+from typing import Any, Callable, Dict, List, Tuple
 from tools.memory_setup import get_agent_memory
+from tools.dataset_catalog import DatasetWriter, json_safe_record
+from sql_guard import QueryRejected, load_sql_config, is_read_query, guarded_connection, check_plan, log_query
+
+RESULT_DATASET = "latest_sql_result"
+ITERSIZE = 2000                 # rows fetched from the server per round trip
+MAX_RESULT_ROWS = int(os.environ.get("SQL_MAX_RESULT_ROWS", 1_000_000))
+PREVIEW_ROWS = 10
+
+# Postgres type OID -> Arrow type, for the result columns (anything else is stored as text)
+PG_ARROW_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(), 21: pa.int64(), 23: pa.int64(), 26: pa.int64(),
+    700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),
+    1082: pa.date32(),
+    1114: pa.timestamp("us"),
+    1184: pa.timestamp("us", tz="UTC"),
+    25: pa.string(), 1043: pa.string(), 1042: pa.string(), 19: pa.string(),
+}
+
+
+def _to_text(value: Any) -> Any:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _to_float(value: Any) -> Any:
+    return float(value) if isinstance(value, decimal.Decimal) else value
+
+
+def _result_schema(description) -> Tuple[pa.Schema, List[Callable[[Any], Any]]]:
+    """Build the Arrow schema for a result set and a per-column value converter."""
+    fields, converters = [], []
+    for column in description:
+        arrow_type = PG_ARROW_TYPES.get(column.type_code, pa.string())
+        fields.append(pa.field(column.name, arrow_type))
+        if pa.types.is_string(arrow_type):
+            converters.append(_to_text)
+        elif pa.types.is_floating(arrow_type):
+            converters.append(_to_float)
+        else:
+            converters.append(lambda value: value)
+    return pa.schema(fields), converters
+
+
+def _store_result(cursor) -> Tuple[str, int]:
+    """Stream a result set into the 'latest_sql_result' dataset, returning the tool message and row count."""
+    rows = cursor.fetchmany(ITERSIZE)
+    schema, converters = _result_schema(cursor.description)
+    writer = DatasetWriter(RESULT_DATASET, schema)
+
+    preview, num_rows, truncated = [], 0, False
+    try:
+        while rows:
+            if num_rows + len(rows) > MAX_RESULT_ROWS:
+                rows, truncated = rows[:MAX_RESULT_ROWS - num_rows], True
+            records = [
+                {field.name: convert(value) for field, convert, value in zip(schema, converters, row)}
+                for row in rows
+            ]
+            writer.write(records)
+            if len(preview) < PREVIEW_ROWS:
+                preview.extend(json_safe_record(r) for r in records[:PREVIEW_ROWS - len(preview)])
+            num_rows += len(records)
+            if truncated:
+                break
+            rows = cursor.fetchmany(ITERSIZE)
+        summary = writer.close()
+    except Exception:
+        writer.abort()
+        raise
+
+    memory = get_agent_memory()
+    memory.forget(RESULT_DATASET)  # results used to be stored inline under this key
+    memory.remember(key=f"{RESULT_DATASET}_preview", value=preview)
+
+    message = f"✅ Query successful. Results stored as dataset {summary}. Load them with load_dataset('{RESULT_DATASET}')."
+    if truncated:
+        message += f"\n⚠️ Result truncated at {MAX_RESULT_ROWS} rows - aggregate or filter in SQL instead."
+    if preview:
+        message += f"\nPreview:\n{pd.DataFrame(preview).head(5).to_string(index=False, max_colwidth=60)}"
+    return message, num_rows
+
 
 @tool
 def execute_sql(sql: str) -> str:
     """
     Execute a SQL query on the agent's Postgres database.
-    For SELECT, EXPLAIN, WITH, or RETURNING queries, results are stored in memory as 'latest_sql_result'.
+    For SELECT, EXPLAIN, WITH, or RETURNING queries, results are streamed into the dataset 'latest_sql_result'
+    (load it with load_dataset('latest_sql_result')); only a summary and a short preview are kept in memory.
+    Queries whose estimated plan is too expensive are rejected and should be rewritten (filter, aggregate or LIMIT).
 
     Args:
         sql (str): A SQL query to execute.
 
     Returns:
-        str: Success message or error.
+        str: Success message with the row count and a preview, or error.
     """
+    config = load_sql_config()
+    read_only = is_read_query(sql)
+    est_cost = est_rows = None
+    num_rows = None
+    start = time.perf_counter()
+
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(sql)
+        with guarded_connection(read_only, config) as conn:
+            lower_sql = sql.strip().lower()
+            should_store_result = (
+                lower_sql.startswith("select") or
+                lower_sql.startswith("with") or
+                lower_sql.startswith("explain") or
+                " returning " in lower_sql
+            )
 
-        lower_sql = sql.strip().lower()
-        should_store_result = (
-            lower_sql.startswith("select") or
-            lower_sql.startswith("with") or
-            lower_sql.startswith("explain") or
-            " returning " in lower_sql
-        )
+            with conn.cursor() as plan_cursor:
+                est_cost, est_rows = check_plan(plan_cursor, sql, config)
 
-        if should_store_result:
-            rows = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            result = [dict(zip(columns, row)) for row in rows]
+            # Plain reads use a named (server-side) cursor so rows are streamed rather than loaded all at once.
+            # Postgres can't declare a cursor over EXPLAIN or data-modifying statements.
+            streamable = read_only and not lower_sql.startswith("explain")
+            cursor_name = f"execute_sql_{uuid.uuid4().hex}" if streamable else None
+            with conn.cursor(name=cursor_name) as cursor:
+                cursor.itersize = ITERSIZE
+                cursor.execute(sql)
 
-            memory = get_agent_memory()
-            memory.remember(key="latest_sql_result", value=result)
+                if not should_store_result:
+                    conn.commit()
+                    message = "✅ SQL executed successfully."
+                else:
+                    message, num_rows = _store_result(cursor)
+                    if not read_only:
+                        conn.commit()  # e.g. INSERT ... RETURNING
 
-            return f"✅ Query successful. {len(result)} rows stored in memory as 'latest_sql_result'."
+    except QueryRejected as e:
+        log_query(sql, "rejected", est_cost=e.cost, est_rows=e.rows, error=str(e))
+        return f"❌ Query rejected: {str(e)}"
 
-        conn.commit()
-        return "✅ SQL executed successfully."
+    except psycopg2.errors.QueryCanceled as e:
+        log_query(sql, "timeout", (time.perf_counter() - start) * 1000, est_cost=est_cost, est_rows=est_rows, error=str(e))
+        return (f"❌ Query cancelled after {config['statement_timeout_ms']} ms (statement_timeout). "
+                f"Rewrite it to scan less data: filter with WHERE, aggregate in SQL or add a LIMIT.")
 
     except Exception as e:
+        log_query(sql, "error", (time.perf_counter() - start) * 1000, est_cost=est_cost, est_rows=est_rows, error=str(e))
         return f"❌ Error executing SQL: {str(e)}"
 
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
+    log_query(sql, "ok", (time.perf_counter() - start) * 1000, num_rows, est_cost, est_rows)
+    return message
+
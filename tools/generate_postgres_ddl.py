@@ -1,43 +1,195 @@
 from smolagents import tool
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from memory_utils import get_dataframe_from_memory, get_db_connection
+import re
+import pyarrow as pa
+from typing import Any, Dict, List, Optional, Tuple, Union, get_args, get_origin
+from pydantic import BaseModel
+import models
+from tools.memory_setup import get_agent_memory
+from tools.dataset_catalog import dataset_path, dataset_version, open_dataset
+
+# Datasets whose schema is defined by a Pydantic model in models/
+DATASET_MODELS = {
+    "shopify_order_data": "ShopifyOrder",
+    "shopify_line_item_data": "ShopifyLineItem",
+}
+
+MONEY_COLUMN = re.compile(r"(amount|total|revenue|price|cost|aov)")
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+ISO_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?$")
+
+# (dataset, dataset_version, table, model) -> DDL, so repeated calls for an unchanged stored dataset skip loading
+# the sample and inferring its columns.  Rewriting the dataset changes its version; data held directly in agent
+# memory has no version and is always inferred
+_ddl_cache: Dict[Tuple[str, str, str, str], str] = {}
+
+
+def _quote(identifier: str) -> str:
+    if re.fullmatch(r"[a-z_][a-z0-9_]*", identifier):
+        return identifier
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _load_schema(memory_key: str) -> Tuple[pa.Schema, Optional[pa.Table]]:
+    """Return the Arrow schema of a dataset and a small sample (footers and the first rows only, no full read)."""
+    if dataset_path(memory_key):
+        dataset = open_dataset(memory_key)
+        return dataset.schema, dataset.head(1000)
+
+    data = get_agent_memory().recall(memory_key)
+    if not data:
+        raise ValueError(f"Memory key '{memory_key}' not found.")
+    table = pa.Table.from_pylist(data)
+    return table.schema, table.slice(0, 1000)
+
+
+def _arrow_to_postgres(data_type: pa.DataType) -> str:
+    if pa.types.is_dictionary(data_type):
+        return _arrow_to_postgres(data_type.value_type)
+    if pa.types.is_boolean(data_type):
+        return "BOOLEAN"
+    if pa.types.is_int8(data_type) or pa.types.is_int16(data_type) or pa.types.is_uint8(data_type):
+        return "SMALLINT"
+    if pa.types.is_int32(data_type) or pa.types.is_uint16(data_type):
+        return "INTEGER"
+    if pa.types.is_integer(data_type):
+        return "BIGINT"
+    if pa.types.is_float16(data_type) or pa.types.is_float32(data_type):
+        return "REAL"
+    if pa.types.is_floating(data_type):
+        return "DOUBLE PRECISION"
+    if pa.types.is_decimal(data_type):
+        return f"NUMERIC({data_type.precision},{data_type.scale})"
+    if pa.types.is_date(data_type):
+        return "DATE"
+    if pa.types.is_timestamp(data_type):
+        return "TIMESTAMPTZ" if data_type.tz else "TIMESTAMP"
+    if pa.types.is_binary(data_type) or pa.types.is_large_binary(data_type):
+        return "BYTEA"
+    if pa.types.is_nested(data_type):
+        return "JSONB"
+    return "TEXT"
+
+
+def _model_field_type(name: str, annotation: Any) -> Tuple[str, bool]:
+    """Map a Pydantic field annotation to (Postgres type, nullable)."""
+    nullable = False
+    if get_origin(annotation) is Union and type(None) in get_args(annotation):
+        nullable = True
+        annotation = next(a for a in get_args(annotation) if a is not type(None))
+
+    if get_origin(annotation) in (list, dict) or annotation in (list, dict) or \
+            (isinstance(annotation, type) and issubclass(annotation, BaseModel)):
+        return "JSONB", nullable
+    if annotation is bool:
+        return "BOOLEAN", nullable
+    if annotation is int:
+        return "BIGINT", nullable
+    if annotation is float:
+        return ("NUMERIC(14,2)" if MONEY_COLUMN.search(name) else "DOUBLE PRECISION"), nullable
+    if annotation is str:
+        # Model convention: *_date fields are YYYY-MM-DD, *_ts fields are ISO timestamps
+        if name.endswith("_date"):
+            return "DATE", nullable
+        if name.endswith("_ts"):
+            return "TIMESTAMPTZ", nullable
+    return "TEXT", nullable
+
+
+def _refine_string_type(name: str, sample: Optional[pa.Table]) -> str:
+    """Detect DATE / TIMESTAMPTZ columns stored as strings by checking a sample of their values."""
+    if sample is None or name not in sample.column_names:
+        return "TEXT"
+    values = [v for v in sample.column(name).to_pylist() if v]
+    if not values:
+        return "TEXT"
+    if all(ISO_DATE.match(v) for v in values):
+        return "DATE"
+    if all(ISO_TIMESTAMP.match(v) for v in values):
+        return "TIMESTAMPTZ"
+    return "TEXT"
+
+
+def infer_columns(schema: pa.Schema, sample: Optional[pa.Table] = None,
+                  model: Optional[type] = None) -> List[Tuple[str, str, bool]]:
+    """
+    Infer Postgres columns for a dataset.
+
+    Args:
+        schema: Arrow schema of the dataset.
+        sample: Optional sample of rows, used to detect dates / timestamps stored as strings.
+        model: Optional Pydantic model describing the dataset; its field types take precedence over the data.
+
+    Returns:
+        List of (column name, Postgres type, nullable) tuples, in dataset column order.
+    """
+    model_fields = model.model_fields if model else {}
+    columns = []
+    for field in schema:
+        if field.name in model_fields:
+            model_field = model_fields[field.name]
+            pg_type, nullable = _model_field_type(field.name, model_field.annotation)
+            nullable = nullable or not model_field.is_required()
+        else:
+            pg_type = _arrow_to_postgres(field.type)
+            if pg_type == "TEXT" and (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+                pg_type = _refine_string_type(field.name, sample)
+            nullable = field.nullable
+        columns.append((field.name, pg_type, nullable))
+    return columns
+
+
+def build_ddl(table_name: str, columns: List[Tuple[str, str, bool]]) -> str:
+    """Render a CREATE TABLE statement plus suggested indexes on id and date columns."""
+    names = [name for name, _, _ in columns]
+    primary_key = "id" if "id" in names else None
+
+    lines = []
+    for name, pg_type, nullable in columns:
+        constraint = " PRIMARY KEY" if name == primary_key else ("" if nullable else " NOT NULL")
+        lines.append(f"    {_quote(name)} {pg_type}{constraint}")
+    statements = [f"CREATE TABLE IF NOT EXISTS {_quote(table_name)} (\n" + ",\n".join(lines) + "\n);"]
+
+    # Suggested indexes: date / timestamp columns (range filters) and id columns (joins)
+    for name, pg_type, _ in columns:
+        if name == primary_key:
+            continue
+        if pg_type in ("DATE", "TIMESTAMP", "TIMESTAMPTZ") or name.endswith("_id"):
+            index_name = re.sub(r"[^a-z0-9_]", "_", f"{table_name}_{name}_idx".lower())[:63]
+            statements.append(f"CREATE INDEX IF NOT EXISTS {_quote(index_name)} ON {_quote(table_name)} ({_quote(name)});")
+
+    return "\n".join(statements)
 
-llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0)
 
 @tool
-def generate_postgres_ddl(memory_key: str, table_name: str = "temp_table") -> str:
+def generate_postgres_ddl(memory_key: str, table_name: str = "temp_table", model_name: str = "") -> str:
     """
-    Use this tool to enerate a Postgres-compatible DDL statement to create a table based on data stored in agent memory.  This DDL statement will need to be executed to create the table in the database.
+    Use this tool to generate a Postgres-compatible DDL statement to create a table based on data stored in agent memory.  This DDL statement will need to be executed to create the table in the database.
+    Column types are inferred from the dataset's types and, when available, its Pydantic model (nested columns such as line_items become JSONB).  Indexes are suggested on date and id columns.
 
     Args:
         memory_key: The key in agent memory where the DataFrame is stored.
         table_name: Desired name for the generated Postgres table.
+        model_name: Optional Pydantic model describing the dataset (e.g. 'ShopifyOrder'); inferred for known datasets.
 
     Returns:
         A string containing the CREATE TABLE statement.
     """
-    df = get_dataframe_from_memory(memory_key)
-    schema_sample = df.head(5).to_dict(orient="records")
-
-    prompt = PromptTemplate.from_template(
-        "Given this JSON sample data:\n\n{sample}\n\nGenerate a Postgres DDL statement to create a table named {table_name} (if it doesn't already exist).  Return only the DDL statement, nothing else.  Make sure the column names match the JSON keys exactly. Only output the raw SQL, no other text."
-    )
-    chain = prompt | llm | StrOutputParser()
-    ddl = chain.invoke({"sample": schema_sample, "table_name": table_name})
-
-    # try:
-    #     conn = get_db_connection()
-    #     cursor = conn.cursor()
-    #     cursor.execute(ddl)
-    #     conn.commit()
-    #     return f"Created table {table_name} successfully.  Schema: {ddl}"
-    # except Exception as e:
-    #     return f"❌ Error running DDL statement.  Error: {e}.  DDL: {ddl}"
-    # finally:
-    #     if 'cursor' in locals(): cursor.close()
-    #     if 'conn' in locals(): conn.close()
+    try:
+        model_name = model_name or DATASET_MODELS.get(memory_key)
+        model = getattr(models, model_name, None) if model_name else None
+        if model_name and not (isinstance(model, type) and issubclass(model, BaseModel)):
+            return f"❌ Error: no Pydantic model named '{model_name}'."
 
-    return f"DDL statement to execute: {ddl}"
+        key = (memory_key, dataset_version(memory_key), table_name, model_name or "") if dataset_path(memory_key) \
+            else None
+        ddl = _ddl_cache.get(key) if key else None
+        if ddl is None:
+            schema, sample = _load_schema(memory_key)
+            ddl = build_ddl(table_name, infer_columns(schema, sample, model))
+            if key:
+                _ddl_cache[key] = ddl
+
+    except Exception as e:
+        return f"❌ Error generating DDL: {str(e)}"
 
+    return f"DDL statement to execute: {ddl}"
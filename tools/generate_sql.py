@@ -1,8 +1,73 @@
 from smolagents import tool
-from langchain_openai import ChatOpenAI
+import re
+import time
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+from tools.memory_setup import get_agent_memory
+from tools.dataset_catalog import dataset_path, open_dataset, json_safe_record
 from memory_utils import get_dataframe_from_memory
+from sql_guard import guarded_connection
+
+_llm = None
+
+
+def get_llm():
+    """The SQL-writing LLM, created on first use (langchain_openai is slow to import)."""
+    global _llm
+    if _llm is None:
+        from langchain_openai import ChatOpenAI
+        _llm = ChatOpenAI(temperature=0, model="gpt-4.1-mini")  # Or use your preferred LLM
+    return _llm
+
+SQL_CACHE_KEY = "generated_sql_cache"
+SQL_CACHE_SIZE = 500
+CODE_FENCE = re.compile(r"```(?:[\w-]*\n)?(.*?)```", re.DOTALL)   # the first fenced block, with or without a language
+
+
+def _dataset_context(memory_key: str) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+    """Return a dataset's column types and sample rows from its stored metadata (no full load)."""
+    memory = get_agent_memory()
+    schema = memory.recall(f"{memory_key}_schema")
+    dtypes = memory.recall(f"{memory_key}_dtypes")
+    if schema and dtypes:
+        return {column: dtypes.get(column, "unknown") for column in schema}, memory.recall(f"{memory_key}_sample") or []
+
+    # Registered before types / samples were stored: read them from the parquet footer and first row group
+    if dataset_path(memory_key):
+        dataset = open_dataset(memory_key)
+        sample = [json_safe_record(r) for r in dataset.head(3).to_pylist()]
+        return {field.name: str(field.type) for field in dataset.schema}, sample
+
+    # Datasets kept as a plain list of records in memory
+    df = get_dataframe_from_memory(memory_key)
+    return {column: str(dtype) for column, dtype in df.dtypes.items()}, df.head(3).to_dict(orient="records")
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s%$.-]", " ", question.lower())).strip(" .")
+
+
+def _cache_key(table_name: str, columns: Dict[str, str], question: str) -> str:
+    schema_hash = hashlib.sha256(repr((table_name, sorted(columns.items()))).encode()).hexdigest()
+    return hashlib.sha256(f"{schema_hash}|{normalize_question(question)}".encode()).hexdigest()
+
+
+def strip_code_fences(text: str) -> str:
+    """The SQL from an LLM reply, without the ```sql ... ``` fence the model often wraps it in."""
+    match = CODE_FENCE.search(text)
+    return (match.group(1) if match else text).strip()
+
+
+def _validate_sql(sql: str) -> Optional[str]:
+    """Check a query still plans against the current database. Returns the error, or None if valid."""
+    try:
+        with guarded_connection(read_only=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"EXPLAIN {sql}")
+        return None
+    except Exception as e:
+        return str(e)
 
-llm = ChatOpenAI(temperature=0, model="gpt-4.1-mini")  # Or use your preferred LLM
 
 @tool
 def generate_sql(memory_key: str, table_name: str, user_question: str) -> str:
@@ -17,17 +82,28 @@ def generate_sql(memory_key: str, table_name: str, user_question: str) -> str:
     Returns:
         str: A SQL query string.
     """
-    df = get_dataframe_from_memory(memory_key)
-    if df is None:
+    try:
+        columns, sample = _dataset_context(memory_key)
+    except Exception:
         return "❌ Error: Could not find dataset in memory."
 
-    sample_schema = df.head(3).to_dict(orient="records")
+    # Identical questions over the same table schema reuse the SQL generated last time, if it still plans
+    memory = get_agent_memory()
+    cache = memory.recall(SQL_CACHE_KEY) or {}
+    key = _cache_key(table_name, columns, user_question)
+    cached = cache.get(key)
+    if cached and _validate_sql(cached["sql"]) is None:
+        print(f"♻️ Reusing cached SQL for: {user_question}")
+        return cached["sql"]
 
     prompt = f"""
 You are an assistant that writes SQL queries for Postgres. The user has stored their data in a table named "{table_name}".
 
+Columns and types:
+{columns}
+
 Here are example rows (sampled from memory):
-{sample_schema}
+{sample}
 
 The user asked: "{user_question}"
 
@@ -35,5 +111,15 @@ Write the appropriate SQL query that will return a result answering their questi
 Only return valid SQL. Do not explain.
     """
 
-    response = llm.invoke(prompt)
-    return response.content.strip()
+    response = get_llm().invoke(prompt)
+    sql = strip_code_fences(response.content)
+
+    if _validate_sql(sql) is None:
+        cache.pop(key, None)
+        cache[key] = {"sql": sql, "question": user_question, "table_name": table_name, "created_at": time.time()}
+        # Keep the most recently generated entries only
+        for stale_key in list(cache)[:-SQL_CACHE_SIZE]:
+            del cache[stale_key]
+        memory.remember(SQL_CACHE_KEY, cache)
+
+    return sql
@@ -4,16 +4,56 @@ import pandas as pd
 import os
 import json
 import sys
-from pydantic import fields
-import requests
+import pyarrow as pa
 from datetime import datetime, timedelta, timezone
 from smolagents import tool
 # from tools import shopify
 # from tools.shopify import ShopifyGraphQL
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from tools.memory_setup import get_agent_memory
-from models.shopify import ShopifyOrder, ShopifyLineItem  
-from utils import format_shopify_order
+from tools.dataset_catalog import DATA_PATH, dataset_writer
+from tools.shopify_graphql import iter_pages
+from utils import format_and_validate_shopify_orders
+from rollups import DailyRollupAccumulator
+from customer_index import get_customer_index
+
+QUARANTINE_PATH = os.path.join(DATA_PATH, "quarantine")
+
+# Arrow schemas for the order datasets (one row group is written per fetched page)
+LINE_ITEM_FIELDS = [
+    pa.field("name", pa.string()),
+    pa.field("quantity", pa.int64()),
+    pa.field("sku", pa.string()),
+    pa.field("amount", pa.float64()),
+]
+ORDER_ARROW_SCHEMA = pa.schema([
+    pa.field("id", pa.string()),
+    pa.field("name", pa.string()),
+    pa.field("created_at_ts", pa.string()),
+    pa.field("updated_at_ts", pa.string()),
+    pa.field("created_at_date", pa.string()),
+    pa.field("updated_at_date", pa.string()),
+    pa.field("email", pa.string()),
+    pa.field("customer_id", pa.string()),
+    pa.field("customer_email", pa.string()),
+    pa.field("original_total", pa.float64()),
+    pa.field("current_total", pa.float64()),
+    pa.field("line_items", pa.list_(pa.struct(LINE_ITEM_FIELDS))),
+])
+# Line items are the SKU-level fact table: one row per line item with the order's date, customer and total
+# denormalized onto it (partitioned by created_at_date like orders).  SKU and product name repeat on every row,
+# so they are dictionary-encoded in memory and in the parquet files.
+LINE_ITEM_ARROW_SCHEMA = pa.schema([
+    pa.field("order_id", pa.string()),
+    pa.field("order_name", pa.string()),
+    pa.field("created_at_date", pa.string()),
+    pa.field("customer_email", pa.string()),
+    pa.field("sku", pa.dictionary(pa.int32(), pa.string())),
+    pa.field("name", pa.dictionary(pa.int32(), pa.string())),
+    pa.field("quantity", pa.int64()),
+    pa.field("amount", pa.float64()),
+    pa.field("order_total", pa.float64()),
+])
 
 
 
@@ -25,166 +65,223 @@ def to_iso(d: str, offset: int) -> str:
     return f"{dt.isoformat()}T00:00:00Z"
 
 
+ORDERS_QUERY = """
+query Orders($cursor: String, $query: String) {
+  orders(first: 250, after: $cursor, query: $query) {
+    edges {
+      node {
+        id
+        name
+        createdAt
+        updatedAt
+        email
+        customer {
+            id
+            email
+        }
+        currentTotalPriceSet {
+          shopMoney {
+            amount
+          }
+        }
+        originalTotalPriceSet {
+          shopMoney {
+            amount
+          }
+        }
+        lineItems(first: 100) {
+          edges {
+            node {
+              name
+              quantity
+              sku
+              originalTotalSet {
+                shopMoney {
+                  amount
+                }
+              }
+              # originalUnitPriceSet
+              # totalDiscountSet
+            }
+          }
+        }
+      }
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+}
+"""
+
+
+def iter_order_pages(start_date: str, end_date: str) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield raw Shopify order nodes one page (up to 250 orders) at a time.  The next page is fetched while the
+    caller validates and writes the current one.
+
+    Args:
+        start_date (str): start date in YYYY-MM-DD format.
+        end_date (str): end date in YYYY-MM-DD format.
+    """
+    total = 0
+    variables = {"query": f"created_at:>={start_date} created_at:<={end_date}"}
+    for items in iter_pages(ORDERS_QUERY, "orders", variables=variables, api_version="2023-07"):
+        total += len(items)
+        print(f"Fetched {len(items)} orders. Total: {total}")
+        yield items
+
+
+def validate_order_page(
+    raw_orders: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Flatten and validate a page of raw orders against the ShopifyOrder / ShopifyLineItem schemas, in batch.
+
+    Orders that fail (including any of their line items) are quarantined with the reason, instead of
+    aborting the whole fetch.
+
+    Returns:
+        Tuple of (validated orders, validated line items, quarantined records)
+    """
+    return format_and_validate_shopify_orders(raw_orders)
+
+
+def sync_orders(
+    start_date: str,
+    end_date: str,
+    order_dataset: str = "shopify_order_data",
+    line_item_dataset: str = "shopify_line_item_data"
+) -> Dict[str, Any]:
+    """
+    Stream all Shopify orders created between start_date and end_date (inclusive) through
+    fetch page → flatten → validate → write batch, so memory stays bounded by the page size (plus the
+    partitioned writers' row buffer, MAX_BUFFERED_ROWS).
+
+    Each batch is written to the order / line item parquet datasets, added to the customer index and
+    accumulated into the daily rollups.  Invalid records are quarantined to a JSONL file with reasons; the
+    rollups are then left as they were, since they would be missing those orders.
+
+    Args:
+        start_date (str): start date in YYYY-MM-DD format.
+        end_date (str): end date in YYYY-MM-DD format.
+        order_dataset (str): Name of the dataset to store orders in.
+        line_item_dataset (str): Name of the dataset to store line items in.
+
+    Returns:
+        Summary of the sync: row counts, dataset summaries, example records and quarantine details.
+    """
+    order_writer = dataset_writer(order_dataset, ORDER_ARROW_SCHEMA)
+    line_item_writer = dataset_writer(line_item_dataset, LINE_ITEM_ARROW_SCHEMA)
+    os.makedirs(QUARANTINE_PATH, exist_ok=True)
+    quarantine_path = os.path.join(QUARANTINE_PATH, f"{order_dataset}.jsonl")
+
+    index = get_customer_index()
+    index_ok = True
+    rollups = DailyRollupAccumulator()
+    num_quarantined = 0
+    example_order = example_line_item = None
+
+    try:
+        with open(quarantine_path, "w") as quarantine_file:
+            for raw_orders in iter_order_pages(start_date, end_date):
+                orders, line_items, quarantined = validate_order_page(raw_orders)
+
+                order_writer.write(orders)
+                line_item_writer.write(line_items)
+                rollups.add(orders, line_items)
+
+                for record in quarantined:
+                    quarantine_file.write(json.dumps(record) + "\n")
+                num_quarantined += len(quarantined)
+
+                # Incrementally update the customer index (never fail the fetch over it)
+                if index_ok:
+                    try:
+                        index.update(orders)
+                    except Exception as e:
+                        index_ok = False
+                        print(f"⚠️ Failed to update customer index: {e}")
+
+                example_order = example_order or (orders[0] if orders else None)
+                example_line_item = example_line_item or (line_items[0] if line_items else None)
+    except Exception:
+        order_writer.abort()
+        line_item_writer.abort()
+        raise
+
+    order_summary = order_writer.close()
+    line_item_summary = line_item_writer.close()
+    if num_quarantined:
+        print(f"⚠️ {num_quarantined} records quarantined to {quarantine_path}")
+
+    # Quarantined orders are missing from the index and the rollups, and new vs returning customers are
+    # classified against the index - so coverage and rollups are only recorded for a complete, indexed range
+    rollups_written = False
+    if index_ok and not num_quarantined:
+        try:
+            index.record_coverage(start_date, end_date)
+        except Exception as e:
+            print(f"⚠️ Failed to record customer index coverage: {e}")
+        try:
+            rollups.write(start_date, end_date)
+            rollups_written = True
+        except Exception as e:
+            print(f"⚠️ Failed to refresh daily rollups: {e}")
+    else:
+        reason = f"{num_quarantined} records were quarantined" if num_quarantined else "the customer index update failed"
+        print(f"⚠️ Not refreshing daily rollups for {start_date} → {end_date}: {reason}")
+
+    return {
+        "orders": order_writer.num_rows,
+        "line_items": line_item_writer.num_rows,
+        "quarantined": num_quarantined,
+        "quarantine_path": quarantine_path,
+        "rollups_written": rollups_written,
+        "order_dataset": order_dataset,
+        "order_path": order_writer.file_path,
+        "order_summary": order_summary,
+        "line_item_dataset": line_item_dataset,
+        "line_item_path": line_item_writer.file_path,
+        "line_item_summary": line_item_summary,
+        "example_order": example_order,
+        "example_line_item": example_line_item,
+    }
+
+
 @tool
 def get_orders(
     start_date: str,
     end_date: str
-) -> List[Dict[str, Any]]:
+) -> dict:
     """
-    Query order data via Shopify GraphQL API and store in local memory as shopify_order_data (represented by the ShopifyOrder pydantic model.   Avoid redundant calls - if the data for this date range is already in memory then use that.
+    Query order data via Shopify GraphQL API and store it as the datasets shopify_order_data (represented by the ShopifyOrder pydantic model) and shopify_line_item_data (ShopifyLineItem - one row per line item with the order's created_at_date, customer_email and order_total, for SKU / product questions without joining to orders).  Read them with page_dataset, query_datasets or compute_metrics.   Avoid redundant calls - if the data for this date range is already stored then use that.
 
     Args:
         start_date (str): start date in YYYY-MM-DD format.  Pulls all data >= 00:00:00.0000 on this date.
         end_date (str): end date in YYYY-MM-DD format. Pulls all data <= 23:59:59.9999 on this date.
 
     Returns:
-        List of all resources as dictionaries
+        dict: {"message": ...} - where the orders and line items were stored (row counts and columns), and how many
+        invalid records were quarantined.  The records themselves are not returned.
     """
-    url = f"https://{os.environ['SHOPIFY_STORE_URL']}/admin/api/2023-07/graphql.json"
-    headers = {
-        "Content-Type": "application/json",
-        "X-Shopify-Access-Token": os.environ['SHOPIFY_TOKEN']
-    }
-
-    all_items: List[Dict[str, Any]] = []
-    has_next_page = True
-    cursor: Optional[str] = None
-
-    while has_next_page:
-        # Build cursor parameter
-        cursor_part = f', after: "{cursor}"' if cursor else ""
-
-        # Build query
-        filter_part = f', query: "created_at:>={start_date} created_at:<={end_date}"' if filter else ""
-
-        query = f"""
-        query {{
-          orders(first: 250{cursor_part}{filter_part}) {{
-            edges {{
-              node {{
-                id
-                name
-                createdAt
-                updatedAt
-                email
-                customer {{ 
-
-                    id
-                    email
-                }}
-                currentTotalPriceSet {{
-                  shopMoney {{    
-                    amount
-                  }}
-                }}
-                originalTotalPriceSet {{
-                  shopMoney {{    
-                    amount
-                  }}
-                }}
-                lineItems(first: 100) {{
-                  edges {{
-                    node {{
-                      name
-                      quantity
-                      sku
-                      originalTotalSet {{
-                        shopMoney {{
-                          amount
-                        }}
-                      }}
-                      # originalUnitPriceSet
-                      # totalDiscountSet
-
-                    }}
-                  }}
-                }}
-
-              }}
-            }}
-            pageInfo {{
-              hasNextPage
-              endCursor
-            }}
-          }}
-        }}
-
-
-        """
-
-
-        # Make request
-        response = requests.post(url, json={"query": query}, headers=headers)
-        data = response.json()
-
-        # Handle errors
-        if "errors" in data:
-            error_messages = "; ".join([e.get("message", "Unknown error") for e in data["errors"]])
-            raise Exception(f"GraphQL error: {error_messages}")
-
-        # Extract data
-        result = data.get("data", {}).get('orders', {})
-        edges = result.get("edges", [])
-        items = [edge["node"] for edge in edges]
-        all_items.extend(items)
-
-        # Update pagination
-        page_info = result.get("pageInfo", {})
-        has_next_page = page_info.get("hasNextPage", False)
-        cursor = page_info.get("endCursor")
-
-        print(f"Fetched {len(items)} orders. Total: {len(all_items)}")
-
-
-    # Validate data structure
-    # -----------------------------------------------------------------------
-
-    # Validate order-level records match ShopifyOrder schema
-    validated_orders = []
-    validated_line_items = []
-  
-    for raw in all_items:
-        try:
-            formatted_order = format_shopify_order(raw)
-  
-            # Extract lineItems and temporarily remove for ShopifyOrder validation
-            line_items = formatted_order.pop("line_items", [])
-  
-            # Validate the order without line_items
-            order = ShopifyOrder(**{**formatted_order, "line_items": []})
-            validated_orders.append({**formatted_order, "line_items": line_items})  # keep full order in memory
-  
-            for li in line_items:
-                try:
-                    # Validate line item before adding order_id/order_name
-                    clean_line_item = ShopifyLineItem(
-                        **{
-                            "sku": li.get("sku"),
-                            "name": li.get("name"),
-                            "quantity": li.get("quantity"),
-                            "amount": li.get("amount"),
-                            "order_id": order.id,
-                            "order_name": order.name
-                        }
-                    )
-                    validated_line_items.append(clean_line_item.model_dump())
-                except Exception as e:
-                    raise Exception(
-                        f"Line item failed validation: {li} | Order ID: {order.id} | Error: {e}"
-                    )
-  
-        except Exception as e:
-            raise Exception(
-                f"Order failed validation. Raw data: {raw} | Error: {e}"
-            )
-
-
+    result = sync_orders(start_date, end_date)
 
-    # Save structured tool output
+    # Orders now live in the dataset store - drop any stale in-memory copies
     memory = get_agent_memory()
-    memory.remember(key="shopify_order_data", value=validated_orders)
-    memory.remember(key="shopify_line_item_data", value=validated_line_items)
-    return {"message": f"{len(validated_orders)} Shopify order records stored in memory as 'shopify_order_data'. Example order: {validated_orders[0]}.  {len(validated_line_items)} Shopify line item records stored in memory as 'shopify_line_item_data'. Example line item: {validated_line_items[0]}"}
+    memory.forget(result["order_dataset"])
+    memory.forget(result["line_item_dataset"])
+
+    message = (
+        f"Shopify orders stored: {result['order_summary']}.  Line items stored: {result['line_item_summary']}.  "
+        f"Use page_dataset to see rows and query_datasets or compute_metrics to aggregate"
+    )
+    if result["quarantined"]:
+        message += f".  {result['quarantined']} invalid records were quarantined to {result['quarantine_path']}"
+    if not result["rollups_written"]:
+        message += ".  The daily rollups were not refreshed for this range, so aggregate the datasets instead of using get_daily_metrics"
+    return {"message": message}
 
 
 # # Usage example:
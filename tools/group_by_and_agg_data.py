@@ -4,7 +4,10 @@ from typing import List, Dict, Union, Optional
 from smolagents import tool
 from collections import defaultdict
 import statistics
+import os
+import pandas as pd
 from tools.memory_setup import get_agent_memory 
+from tools.dataset_catalog import read_dataset
 
 @tool
 def group_by_and_agg_data(
@@ -29,6 +32,11 @@ def group_by_and_agg_data(
 
     memory = get_agent_memory()
     data = memory.recall(dataset_name)
+    if not data:
+        # Fall back to a dataset stored on disk (e.g. by get_orders)
+        path = memory.recall(f"{dataset_name}_path")
+        if path and os.path.exists(path):
+            data = read_dataset(dataset_name, columns=[group_by, agg_field]).to_dict(orient="records")
     if not data:
         return {"error": f"No dataset found in memory with name '{dataset_name}'."}
 
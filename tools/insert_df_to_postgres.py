@@ -0,0 +1,152 @@
+from smolagents import tool
+import io
+import json
+import time
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from psycopg2 import sql
+from typing import Iterator, List
+from memory_utils import get_db_connection
+from tools.memory_setup import get_agent_memory
+from tools.dataset_catalog import dataset_path, iter_batches
+
+
+def _iter_batches(dataset_name: str, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Stream record batches from a parquet file path, a stored dataset, or a list of records in memory."""
+    if dataset_path(dataset_name):
+        yield from iter_batches(dataset_name, batch_size=batch_size)
+        return
+
+    data = get_agent_memory().recall(dataset_name)
+    if not data:
+        raise FileNotFoundError(f"Dataset '{dataset_name}' not found in memory or on disk.")
+    for start in range(0, len(data), batch_size):
+        yield pa.Table.from_pylist(data[start:start + batch_size]).to_batches()[0]
+
+
+def _to_csv(batch: pa.RecordBatch) -> io.BytesIO:
+    """Serialize a batch as CSV for COPY, encoding nested (list / struct) columns as JSON text."""
+    columns = []
+    for field, column in zip(batch.schema, batch.columns):
+        if pa.types.is_nested(field.type):
+            column = pa.array([None if v is None else json.dumps(v, default=str) for v in column.to_pylist()], type=pa.string())
+        columns.append(column)
+
+    buffer = io.BytesIO()
+    pacsv.write_csv(pa.RecordBatch.from_arrays(columns, names=batch.schema.names), buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def _table_identifier(table_name: str) -> sql.Identifier:
+    return sql.Identifier(*table_name.split("."))
+
+
+def _table_columns(cursor, table_name: str) -> List[str]:
+    cursor.execute("SELECT to_regclass(%s)", (table_name,))
+    if cursor.fetchone()[0] is None:
+        return []
+    cursor.execute(sql.SQL("SELECT * FROM {} LIMIT 0").format(_table_identifier(table_name)))
+    return [desc[0] for desc in cursor.description]
+
+
+@tool
+def insert_df_to_postgres(
+    dataset_name: str,
+    table_name: str,
+    mode: str = "append",
+    key_columns: str = "",
+    batch_size: int = 50000
+) -> str:
+    """
+    Bulk-load a dataset into an existing Postgres table using COPY (much faster than row-by-row INSERTs).
+    Create the table first with the DDL from generate_postgres_ddl.
+
+    Args:
+        dataset_name: Name of a stored dataset (e.g. 'shopify_line_item_data'), a memory key holding a list of records, or a path to a parquet file.
+        table_name: Name of the target table.
+        mode: 'append' (add rows), 'replace' (empty the table and load the dataset in one transaction - nothing changes if it fails, but the table is locked, so readers wait until it commits) or 'upsert' (insert or update rows matching key_columns).
+        key_columns: Comma-separated key columns for 'upsert' mode; they must have a unique constraint on the table.
+        batch_size: Number of rows streamed to Postgres per COPY batch.
+
+    Returns:
+        str: Success message with rows loaded and rows per second, or an error.
+    """
+    if mode not in ("append", "replace", "upsert"):
+        return f"❌ Error: unsupported mode '{mode}'. Use 'append', 'replace' or 'upsert'."
+    keys = [k.strip() for k in key_columns.split(",") if k.strip()]
+    if mode == "upsert" and not keys:
+        return "❌ Error: key_columns is required for 'upsert' mode."
+
+    start = time.perf_counter()
+    staging_name = f"{table_name.split('.')[-1]}__staging"
+    rows = 0
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        table_columns = _table_columns(cursor, table_name)
+        if not table_columns:
+            return f"❌ Error: table '{table_name}' does not exist. Create it first (see generate_postgres_ddl)."
+
+        target = _table_identifier(table_name)
+        staging = sql.Identifier(staging_name)
+        if mode == "replace":
+            # TRUNCATE keeps the table itself (schema, dependent views, owned sequences, grants) and is rolled
+            # back with the load if anything fails.  It takes an ACCESS EXCLUSIVE lock, so reads of the table
+            # block until the load commits
+            cursor.execute(sql.SQL("TRUNCATE TABLE {}").format(target))
+            load_into = target
+        elif mode == "upsert":
+            cursor.execute(sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(staging, target))
+            load_into = staging
+        else:
+            load_into = target
+
+        columns = None
+        for batch in _iter_batches(dataset_name, batch_size):
+            if columns is None:
+                columns = batch.schema.names
+                missing = [c for c in columns if c not in table_columns]
+                if missing:
+                    conn.rollback()
+                    return f"❌ Error: columns {missing} are not in table '{table_name}'. Table columns: {table_columns}"
+                copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, HEADER true)").format(
+                    load_into, sql.SQL(", ").join(map(sql.Identifier, columns))
+                )
+            cursor.copy_expert(copy_sql, _to_csv(batch))
+            rows += batch.num_rows
+
+        if columns is None:
+            conn.rollback()
+            return f"❌ Error: dataset '{dataset_name}' is empty."
+
+        if mode == "upsert":
+            column_list = sql.SQL(", ").join(map(sql.Identifier, columns))
+            key_list = sql.SQL(", ").join(map(sql.Identifier, keys))
+            updates = [c for c in columns if c not in keys]
+            on_conflict = sql.SQL("DO UPDATE SET {}").format(sql.SQL(", ").join(
+                sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c)) for c in updates
+            )) if updates else sql.SQL("DO NOTHING")
+            # DISTINCT ON keeps one row per key, so a key repeated in the dataset can't hit the same row twice
+            cursor.execute(sql.SQL(
+                "INSERT INTO {target} ({columns}) SELECT DISTINCT ON ({keys}) {columns} FROM {staging} "
+                "ON CONFLICT ({keys}) {on_conflict}"
+            ).format(target=target, columns=column_list, keys=key_list, staging=staging, on_conflict=on_conflict))
+
+        conn.commit()
+        elapsed = time.perf_counter() - start
+        return (f"✅ Loaded {rows} rows from '{dataset_name}' into '{table_name}' ({mode}) in {elapsed:.2f}s "
+                f"({rows / elapsed:,.0f} rows/s).")
+
+    except Exception as e:
+        if 'conn' in locals():
+            conn.rollback()
+        return f"❌ Error loading data into Postgres: {str(e)}"
+
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
@@ -1,22 +1,20 @@
 from smolagents import tool
-import pandas as pd
-import os
-from tools.memory_setup import get_agent_memory
-
-DATA_PATH = "memories" 
+from tools.dataset_catalog import list_catalog, dataset_stats
 
 
 @tool
 def list_datasets() -> list:
     """
-    List summaries of all datasets stored in memory.
+    List all stored datasets with their row counts, column types, size on disk and the min / max of
+    their date columns (read from file metadata, without loading any data).
 
     Returns:
-        A list of summary strings.
+        A list of dataset descriptions.
     """
-    memory = get_agent_memory()
-    return [
-        value for key, value in memory.store.items()
-        if key.endswith("_summary")
-    ]
-
+    datasets = []
+    for name in list_catalog():
+        try:
+            datasets.append(dataset_stats(name))
+        except Exception as e:
+            datasets.append({"name": name, "error": str(e)})
+    return datasets
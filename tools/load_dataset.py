@@ -1,26 +1,24 @@
 from smolagents import tool
 import pandas as pd
-import os
-from tools.memory_setup import get_agent_memory
-
-DATA_PATH = "memories" 
-
-os.makedirs(DATA_PATH, exist_ok=True)
+from typing import Any, List, Optional
+from tools.dataset_catalog import read_dataset
 
 
 @tool
-def load_dataset(name: str) -> pd.DataFrame:
+def load_dataset(name: str, columns: Optional[List[str]] = None, filters: Optional[List[List[Any]]] = None) -> pd.DataFrame:
     """
-    Load a dataset from disk by name.
+    Load a dataset from disk by name.  Only the requested columns and the rows matching the filters are read,
+    e.g. a week of orders only reads that week's partitions - always pass them when you don't need everything.
 
     Args:
         name: Identifier used when storing the dataset.
+        columns: Optional list of columns to load, e.g. ['id', 'created_at_date', 'current_total'].
+        filters: Optional list of [column, operator, value] conditions that must all hold, e.g. [['created_at_date', '>=', '2025-06-01'], ['created_at_date', '<=', '2025-06-07']].  Operators: =, ==, !=, <, <=, >, >=, in, not in.
 
     Returns:
         The dataset as a Pandas DataFrame.
-    """    
-    memory = get_agent_memory()
-    path = memory.recall(f"{name}_path")
-    if not path or not os.path.exists(path):
+    """
+    try:
+        return read_dataset(name, columns=columns, filters=filters)
+    except FileNotFoundError:
         raise FileNotFoundError(f"Dataset '{name}' not found in memory.")
-    return pd.read_parquet(path)
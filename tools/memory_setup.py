@@ -1,14 +1,16 @@
 # memory_setup.py
 
-from langchain.memory import ConversationBufferMemory
 import os
 import json
+import threading
 
 
 class AgentMemory:
   def __init__(self, filename="agent_memory.json"):
       self.filename = filename
       self.store = self._load()
+      # Tools and the step summarizer may write from several threads at once
+      self._lock = threading.RLock()
 
   def _load(self):
       if os.path.exists(self.filename):
@@ -20,20 +22,25 @@ class AgentMemory:
       return {}
 
   def _save(self):
-      with open(self.filename, "w") as f:
+      # Write to a temporary file first so a crash mid-write never leaves invalid JSON behind
+      tmp_filename = f"{self.filename}.tmp"
+      with open(tmp_filename, "w") as f:
           json.dump(self.store, f)
+      os.replace(tmp_filename, self.filename)
 
   def remember(self, key, value):
-      self.store[key] = value
-      self._save()
+      with self._lock:
+          self.store[key] = value
+          self._save()
 
   def recall(self, key):
       return self.store.get(key)
 
   def forget(self, key):
-      if key in self.store:
-          del self.store[key]
-          self._save()
+      with self._lock:
+          if key in self.store:
+              del self.store[key]
+              self._save()
 
 # --- Singleton Interface ---
 _memory_instance = None
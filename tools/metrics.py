@@ -1,5 +1,13 @@
 from smolagents import tool
+import json
+import hashlib
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, Any, List, Optional
+from customer_index import get_customer_index
+from tools.dataset_catalog import dataset_version, iter_batches
 
 class Metrics:
     def unique_count(self, df: pd.DataFrame, field: str) -> int:
@@ -33,8 +41,141 @@ class Metrics:
     def percent_missing(self, df: pd.DataFrame, field: str) -> float:
         return df[field].isnull().mean() * 100
 
+    def customer_type(self, df: pd.DataFrame, period_start: str = None) -> pd.Series:
+        """Label each order's customer 'new', 'returning' or 'unknown' via the customer first-order index."""
+        orders = df.to_dict(orient="records")
+        index = get_customer_index()
+        index.load(orders)
+        return pd.Series([index.classify(order, period_start) for order in orders], index=df.index)
+
+    def new_vs_returning(self, df: pd.DataFrame, period_start: str = None) -> Dict[str, Any]:
+        labelled = df.assign(customer_key=df["customer_email"].fillna(df["email"]),
+                             customer_type=self.customer_type(df, period_start))
+        per_customer = labelled.dropna(subset=["customer_key"]).groupby("customer_key")["customer_type"].first()
+        counts = per_customer.value_counts()
+        known = counts.get("new", 0) + counts.get("returning", 0)
+        return {
+            "customers": int(len(per_customer)),
+            "new_customers": int(counts.get("new", 0)),
+            "returning_customers": int(counts.get("returning", 0)),
+            "unknown_customers": int(counts.get("unknown", 0)),
+            "returning_customer_rate": round(counts.get("returning", 0) / known * 100, 2) if known else None,
+        }
+
+
+class _MetricAccumulator:
+    """Running state for one requested metric, updated batch by batch during a single dataset scan."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.metric = spec["metric"]
+        self.rows = 0
+        self.count = 0
+        self.total = 0
+        self.values = set()
+        self.counter = Counter()
+        self.groups = defaultdict(lambda: [0, 0])  # key -> [sum, count]
+
+    def columns(self) -> List[str]:
+        if self.metric in ("group_sum", "group_mean"):
+            return [self.spec["group_field"], self.spec["field"]]
+        if self.metric == "group_count":
+            return [self.spec["group_field"]]
+        if self.metric == "average_order_value":
+            return [self.spec["order_id_field"], self.spec["total_field"]]
+        return [self.spec["field"]]
+
+    def update(self, batch: pa.Table) -> None:
+        self.rows += batch.num_rows
+        if self.metric in ("total_count", "mean_field", "sum_field", "percent_missing"):
+            column = batch.column(self.spec["field"])
+            self.count += len(column) - column.null_count
+            if self.metric in ("sum_field", "mean_field"):
+                self.total += pc.sum(column).as_py() or 0
+        elif self.metric == "unique_count":
+            self.values.update(pc.unique(batch.column(self.spec["field"]).drop_null()).to_pylist())
+        elif self.metric in ("top_values", "group_count"):
+            field = self.spec.get("field") or self.spec["group_field"]
+            for entry in pc.value_counts(batch.column(field).drop_null()).to_pylist():
+                self.counter[entry["values"]] += entry["counts"]
+        else:
+            group_field, value_field = self.columns()
+            aggregated = batch.group_by(group_field).aggregate([(value_field, "sum"), (value_field, "count")])
+            for key, total, count in zip(*(aggregated.column(c).to_pylist() for c in
+                                           (group_field, f"{value_field}_sum", f"{value_field}_count"))):
+                self.groups[key][0] += total or 0
+                self.groups[key][1] += count
+
+    def result(self) -> Any:
+        if self.metric == "unique_count":
+            return len(self.values)
+        if self.metric == "total_count":
+            return self.count
+        if self.metric == "sum_field":
+            return self.total
+        if self.metric == "mean_field":
+            return self.total / self.count if self.count else None
+        if self.metric == "percent_missing":
+            return (self.rows - self.count) / self.rows * 100 if self.rows else None
+        if self.metric == "top_values":
+            return dict(self.counter.most_common(self.spec.get("top_n", 5)))
+        if self.metric == "group_count":
+            return dict(self.counter.most_common())
+        if self.metric == "group_sum":
+            return {key: total for key, (total, _) in self.groups.items()}
+        if self.metric == "group_mean":
+            return {key: total / count for key, (total, count) in self.groups.items() if count}
+        # average_order_value: sum per order, then average across orders
+        return sum(total for total, _ in self.groups.values()) / len(self.groups) if self.groups else None
+
+
+class MetricsEngine:
+    """
+    Computes a batch of metrics over a named dataset from the catalog in a single scan: the columns needed by
+    every requested metric are read once (with filters pushed down) and each batch updates all metrics.
+    Results are memoized per dataset version, so repeating a question over unchanged data is free.
+    """
+
+    METRICS = ("unique_count", "total_count", "sum_field", "mean_field", "top_values", "group_sum",
+               "group_mean", "group_count", "average_order_value", "percent_missing")
+
+    def __init__(self, cache_size: int = 256):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def compute(self, dataset_name: str, specs: List[Dict[str, Any]],
+                filters: Optional[List[List[Any]]] = None) -> Dict[str, Any]:
+        for spec in specs:
+            if spec.get("metric") not in self.METRICS:
+                raise ValueError(f"Unknown metric '{spec.get('metric')}'. Available: {', '.join(self.METRICS)}")
+
+        key = hashlib.sha256(json.dumps([dataset_name, dataset_version(dataset_name), specs, filters],
+                                        sort_keys=True, default=str).encode()).hexdigest()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        accumulators = [_MetricAccumulator(spec) for spec in specs]
+        columns = list(dict.fromkeys(c for acc in accumulators for c in acc.columns()))
+        for batch in iter_batches(dataset_name, columns=columns, filters=filters):
+            table = pa.Table.from_batches([batch])
+            for acc in accumulators:
+                acc.update(table)
+
+        results = {}
+        for acc in accumulators:
+            name = acc.spec.get("as") or ":".join([acc.metric] + acc.columns())
+            results[name] = acc.result()
+
+        self._cache[key] = results
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return results
+
+
 # Instantiate
 metrics = Metrics()
+metrics_engine = MetricsEngine()
 
 @tool
 def unique_count(df: pd.DataFrame, field: str) -> int:
@@ -169,3 +310,43 @@ def percent_missing(df: pd.DataFrame, field: str) -> float:
         The percentage of missing values.
     """
     return metrics.percent_missing(df, field)
+
+@tool
+def new_vs_returning(df: pd.DataFrame, period_start: str = None) -> dict:
+    """Classify the customers in an order dataset (e.g. shopify_order_data) as new or returning using the
+    customer first-order index, and compute the returning customer rate.
+
+    Args:
+        df: The dataframe containing order data (needs created_at_date, customer_email, email and optionally customer_id).
+        period_start: Optional YYYY-MM-DD date.  If given, a customer is returning if their first order was before
+            this date; otherwise if it was before the date of their order.
+
+    Returns:
+        Counts of new, returning and unknown (not yet indexed) customers, and the returning customer rate.
+    """
+    return metrics.new_vs_returning(df, period_start)
+
+
+@tool
+def compute_metrics(dataset_name: str, metric_specs: List[Dict[str, Any]], filters: Optional[List[List[Any]]] = None) -> dict:
+    """Compute several metrics over a stored dataset (e.g. shopify_order_data) in one pass, without loading it into a DataFrame.
+    Prefer this over loading a dataset and calling the individual metric tools.
+
+    Args:
+        dataset_name: Name of the stored dataset.
+        metric_specs: List of metrics to compute, each a dict with a 'metric' and its fields, plus an optional 'as' result name:
+            {'metric': 'unique_count' | 'total_count' | 'sum_field' | 'mean_field' | 'percent_missing', 'field': ...},
+            {'metric': 'top_values', 'field': ..., 'top_n': 5},
+            {'metric': 'group_sum' | 'group_mean', 'group_field': ..., 'field': ...},
+            {'metric': 'group_count', 'group_field': ...},
+            {'metric': 'average_order_value', 'total_field': ..., 'order_id_field': ...}.
+            e.g. [{'metric': 'unique_count', 'field': 'email'}, {'metric': 'sum_field', 'field': 'current_total', 'as': 'revenue'}]
+        filters: Optional list of [column, operator, value] conditions, e.g. [['created_at_date', '>=', '2025-06-01']].
+
+    Returns:
+        A dict of metric results, keyed by the 'as' name or 'metric:field'.
+    """
+    try:
+        return metrics_engine.compute(dataset_name, metric_specs, filters)
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,38 @@
+from smolagents import tool
+from typing import List, Optional
+from tools.dataset_catalog import open_dataset, page_table
+
+MAX_PAGE_ROWS = 100
+
+
+@tool
+def page_dataset(name: str, offset: int = 0, limit: int = 20, columns: Optional[List[str]] = None) -> str:
+    """
+    Read one page of rows from a stored dataset, e.g. the full result behind a run_shopify_query or query_datasets
+    handle.  Only the requested rows and columns are read.  Prefer query_datasets for aggregations and filters.
+
+    Args:
+        name: The name of the dataset.
+        offset: Index of the first row to return.
+        limit: Number of rows to return (at most 100).
+        columns: Optional list of columns to return.
+
+    Returns:
+        str: The rows, the range shown and the offset of the next page, or error.
+    """
+    try:
+        limit = max(1, min(limit, MAX_PAGE_ROWS))
+        page = page_table(name, offset, limit, columns)
+        total = open_dataset(name).count_rows()
+    except Exception as e:
+        return f"❌ Error reading dataset '{name}': {str(e)}"
+
+    if not page.num_rows:
+        return f"⚠️ '{name}' has {total} rows - nothing at offset {offset}."
+
+    end = offset + page.num_rows
+    message = f"✅ Rows {offset}-{end - 1} of {total} from '{name}':\n" \
+              f"{page.to_pandas().to_string(index=False, max_colwidth=60)}"
+    if end < total:
+        message += f"\nNext page: page_dataset('{name}', offset={end}, limit={limit})"
+    return message
@@ -0,0 +1,69 @@
+from smolagents import tool
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+MAX_WORKERS = 8
+MAX_CALLS = 50
+
+# Tools that only fetch data, so it's safe to run them side by side
+PARALLEL_TOOLS = ("run_shopify_query", "search_shopify_docs", "introspect_shopify_schema")
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="parallel_map")
+    return _executor
+
+
+def _resolve_tools() -> Dict[str, Any]:
+    from tools.shopify_graphql import run_shopify_query
+    from tools.shopify_mcp import search_shopify_docs, introspect_shopify_schema
+    return {
+        "run_shopify_query": run_shopify_query,
+        "search_shopify_docs": search_shopify_docs,
+        "introspect_shopify_schema": introspect_shopify_schema,
+    }
+
+
+@tool
+def parallel_map(calls: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Run several independent tool calls at the same time and return their results in the same order - use this
+    instead of calling tools one after another when the calls don't depend on each other, e.g. ordersCount for
+    several days, or a docs search plus a schema introspection.  Shopify queries share the store's rate limit
+    and are retried when throttled.  Large run_shopify_query responses are stored as datasets named
+    'latest_shopify_query_result_<index>' unless a result_name is given.
+
+    Supported tools: run_shopify_query, search_shopify_docs, introspect_shopify_schema.
+
+    Args:
+        calls: List of {"tool": <tool name>, "args": {<argument>: <value>}} dicts, e.g.
+               [{"tool": "run_shopify_query", "args": {"query": "query { ordersCount(query: \\"created_at:2025-06-01\\") { count } }"}},
+                {"tool": "search_shopify_docs", "args": {"prompt": "orders query filters", "top_n": 2}}]
+
+    Returns:
+        List with one entry per call, in order: the tool's result, or an error string starting with ❌ if that call failed.
+    """
+    if len(calls) > MAX_CALLS:
+        raise ValueError(f"At most {MAX_CALLS} calls per parallel_map - got {len(calls)}.")
+
+    available = _resolve_tools()
+    for i, call in enumerate(calls):
+        if not isinstance(call, dict) or call.get("tool") not in available:
+            raise ValueError(f"Call {i} must be {{'tool': <one of {', '.join(PARALLEL_TOOLS)}>, 'args': {{...}}}} - got {call!r}")
+
+    def run(i: int, call: Dict[str, Any]) -> Any:
+        args = dict(call.get("args") or {})
+        if call["tool"] == "run_shopify_query":
+            args.setdefault("result_name", f"latest_shopify_query_result_{i}")
+        try:
+            return available[call["tool"]](**args)
+        except Exception as e:
+            return f"❌ {call['tool']} failed: {str(e)}"
+
+    futures = [_get_executor().submit(run, i, call) for i, call in enumerate(calls)]
+    return [future.result() for future in futures]
@@ -1,21 +1,22 @@
 from smolagents import tool
-import pandas as pd
-import os
-from tools.memory_setup import get_agent_memory
-
-DATA_PATH = "memories" 
-
-os.makedirs(DATA_PATH, exist_ok=True)
+import json
+from tools.dataset_catalog import dataset_stats, preview_table
 
 
 @tool
-def preview_dataset(name: str) -> str:
-    """Return a summary of the first few rows + schema of a stored dataset.
-    
+def preview_dataset(name: str, rows: int = 5) -> str:
+    """Return the schema, row count, date ranges and first few rows of a stored dataset, without loading all of it.
+
     Args:
         name: The name of the dataset to preview.
-    
+        rows: Number of rows to show.
+
     """
-    df = load_dataset(name)
-    preview = df.head().to_markdown()
-    return f"Preview of {name}:\n{preview}"
+    stats = dataset_stats(name)
+    preview = preview_table(name, rows).to_pandas().to_string(index=False, max_colwidth=60)
+    return (
+        f"Preview of {name} ({stats['rows']} rows, {stats['size_mb']} MB):\n"
+        f"Columns: {json.dumps(stats['columns'])}\n"
+        f"Date ranges: {json.dumps(stats['date_ranges'])}\n"
+        f"{preview}"
+    )
@@ -0,0 +1,99 @@
+from smolagents import tool
+import re
+import duckdb
+import pandas as pd
+import pyarrow as pa
+from typing import Dict, Tuple
+import pyarrow.dataset as ds
+from tools.memory_setup import get_agent_memory
+from tools.dataset_catalog import DatasetWriter, dataset_version, json_safe_record, list_catalog, open_dataset
+
+RESULT_DATASET = "latest_query_result"
+BATCH_ROWS = 50000
+MAX_RESULT_ROWS = 1_000_000
+PREVIEW_ROWS = 10
+
+# dataset name -> (version, opened dataset), so file discovery only happens when a dataset changes
+_datasets: Dict[str, Tuple[str, ds.Dataset]] = {}
+
+
+def _catalog_dataset(name: str) -> ds.Dataset:
+    version = dataset_version(name)
+    cached = _datasets.get(name)
+    if cached is None or cached[0] != version:
+        cached = (version, open_dataset(name))
+        _datasets[name] = cached
+    return cached[1]
+
+
+def _connect(sql: str) -> duckdb.DuckDBPyConnection:
+    """
+    Open an in-memory DuckDB connection with every dataset the query mentions registered as a table: stored
+    parquet datasets (scanned lazily, with filters and columns pushed down) and lists of records in memory.
+    File system access from SQL is disabled, so queries can only see these tables.
+    """
+    con = duckdb.connect(config={"enable_external_access": False})
+    mentioned = set(re.findall(r"[a-z_][a-z0-9_]*", sql.lower()))
+
+    registered = set()
+    for name in list_catalog():
+        if name.lower() in mentioned:
+            con.register(name, _catalog_dataset(name))
+            registered.add(name)
+
+    memory = get_agent_memory()
+    for key, value in list(memory.store.items()):
+        if key.lower() in mentioned and key not in registered and isinstance(value, list) \
+                and value and isinstance(value[0], dict):
+            con.register(key, pa.Table.from_pylist(value))
+    return con
+
+
+@tool
+def query_datasets(sql: str) -> str:
+    """
+    Run an analytical SQL query (DuckDB dialect) directly over stored datasets - no table creation or loading needed.
+    Each dataset is a table named after it, e.g. SELECT created_at_date, SUM(current_total) FROM shopify_order_data GROUP BY 1.
+    Use this for aggregations over any stored dataset, e.g. the results of the shopify_* tools, run_shopify_query or paginate_shopify_query.
+    Results are stored as the dataset 'latest_query_result'; only a summary and preview are returned.
+
+    Args:
+        sql (str): A read-only SQL query referencing datasets by name.
+
+    Returns:
+        str: Success message with the row count and a preview, or error.
+    """
+    try:
+        con = _connect(sql)
+        try:
+            reader = con.execute(sql).fetch_record_batch(BATCH_ROWS)
+            writer = DatasetWriter(RESULT_DATASET, reader.schema)
+            num_rows, truncated, preview = 0, False, []
+            try:
+                for batch in reader:
+                    if num_rows + batch.num_rows > MAX_RESULT_ROWS:
+                        batch, truncated = batch.slice(0, MAX_RESULT_ROWS - num_rows), True
+                    writer.write(pa.Table.from_batches([batch]))
+                    if len(preview) < PREVIEW_ROWS:
+                        preview.extend(batch.slice(0, PREVIEW_ROWS - len(preview)).to_pylist())
+                    num_rows += batch.num_rows
+                    if truncated:
+                        break
+                summary = writer.close()
+            except Exception:
+                writer.abort()
+                raise
+        finally:
+            con.close()
+
+        get_agent_memory().remember(key=f"{RESULT_DATASET}_preview", value=[json_safe_record(r) for r in preview])
+
+        message = f"✅ Query successful. Results stored as dataset {summary}. Page through them with page_dataset('{RESULT_DATASET}')."
+        if truncated:
+            message += f"\n⚠️ Result truncated at {MAX_RESULT_ROWS} rows - aggregate or filter in SQL instead."
+        if preview:
+            message += f"\nPreview:\n{pd.DataFrame(preview).head(5).to_string(index=False, max_colwidth=60)}"
+        return message
+
+    except Exception as e:
+        return f"❌ Error running query: {str(e)}"
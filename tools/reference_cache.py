@@ -0,0 +1,292 @@
+# reference_cache.py
+"""
+Stale-while-revalidate cache of store reference data: products, variants (SKU -> product) and customers.
+
+Each kind is stored as a dataset (`reference_products`, `reference_variants`, `reference_customers`) and lookups
+are always served from it immediately.  Once a copy is older than `ttl_seconds` a background thread refreshes it
+with only the records whose `updatedAt` is newer than the latest one already stored, merged in by id; every
+`full_refresh_seconds` the whole connection is re-read instead, so deleted records drop out.  Only the very
+first lookup of a kind waits for Shopify.  Limits live in config.yaml (`reference_cache:`).
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import yaml
+from smolagents import tool
+
+from tools.dataset_catalog import DatasetWriter, dataset_path, dataset_version, read_table
+from tools.memory_setup import get_agent_memory
+from tools.shopify_graphql import records_table
+from tools.shopify_queries import CUSTOMERS, INVENTORY, PRODUCTS, QueryTemplate
+
+DEFAULT_REFERENCE_CONFIG = {
+    "ttl_seconds": 3600,             # refresh in the background once a copy is older than this
+    "full_refresh_seconds": 86_400,  # re-read everything (dropping deleted records) this often
+    "max_rows": 50_000,              # per kind
+}
+
+# kind -> query template the records are fetched with
+REFERENCE_TEMPLATES: Dict[str, QueryTemplate] = {
+    "products": PRODUCTS,
+    "variants": INVENTORY,
+    "customers": CUSTOMERS,
+}
+MAX_LOOKUP_ROWS = 50
+
+
+def load_reference_config() -> Dict[str, Any]:
+    """Return the `reference_cache:` section of config.yaml, with defaults for anything unset."""
+    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.yaml")
+    try:
+        with open(config_path, "r") as f:
+            config = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        config = {}
+    return {**DEFAULT_REFERENCE_CONFIG, **(config.get("reference_cache") or {})}
+
+
+def _merge(current: Optional[pa.Table], changed: pa.Table) -> pa.Table:
+    """Replace the rows of `current` that have an id in `changed`, and add the new ones."""
+    if current is None:
+        return changed
+    unchanged = current.filter(pc.invert(pc.is_in(current["id"], value_set=changed["id"])))
+    try:
+        return pa.concat_tables([unchanged, changed], promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # A column changed type between refreshes - rebuild from plain records
+        return records_table(unchanged.to_pylist() + changed.to_pylist())
+
+
+class ReferenceCache:
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or load_reference_config()
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+        # kind -> lock held while fetching it, so concurrent lookups / refreshes never fetch the same kind twice
+        self._kind_locks: Dict[str, threading.RLock] = {}
+        # kind -> (dataset version, table), so lookups only re-read a dataset after it was rewritten
+        self._tables: Dict[str, Any] = {}
+
+    @staticmethod
+    def dataset(kind: str) -> str:
+        return f"reference_{kind}"
+
+    def _kind_lock(self, kind: str) -> threading.RLock:
+        with self._lock:
+            return self._kind_locks.setdefault(kind, threading.RLock())
+
+    def _meta(self, kind: str) -> Dict[str, Any]:
+        return get_agent_memory().recall(f"{self.dataset(kind)}_refresh") or {}
+
+    def _local_table(self, kind: str) -> Optional[pa.Table]:
+        name = self.dataset(kind)
+        if not dataset_path(name):
+            return None
+        version = dataset_version(name)
+        cached = self._tables.get(kind)
+        if cached is None or cached[0] != version:
+            cached = (version, read_table(name))
+            self._tables[kind] = cached
+        return cached[1]
+
+    def refresh(self, kind: str, full: bool = False) -> int:
+        """
+        Fetch changed records (or all of them, for a full refresh or an empty cache) and store the merged copy.
+
+        Returns:
+            Number of records fetched.
+        """
+        with self._kind_lock(kind):
+            return self._refresh(kind, full)
+
+    def _refresh(self, kind: str, full: bool) -> int:
+        template = REFERENCE_TEMPLATES[kind]
+        meta = self._meta(kind)
+        current = self._local_table(kind)
+        now = time.time()
+        full = full or current is None or not meta.get("updated_since") or \
+            now - meta.get("full_refreshed_at", 0) > self.config["full_refresh_seconds"]
+
+        # >= so records updated in the same second as the newest stored one aren't missed (the merge dedupes them)
+        search = None if full else f"updated_at:>='{meta['updated_since']}'"
+        records = [node for nodes in template.pages(search, self.config["max_rows"]) for node in nodes]
+
+        if records or full:
+            table = _merge(None if full else current, records_table(records)) if records else \
+                pa.table({"id": pa.array([], pa.string())})
+            writer = DatasetWriter(self.dataset(kind), table.schema)
+            try:
+                writer.write(table)
+            except Exception:
+                writer.abort()
+                raise
+            writer.close()
+        else:
+            table = current
+
+        updated = [value for value in table.column("updatedAt").to_pylist() if value] \
+            if table is not None and "updatedAt" in table.schema.names else []
+        get_agent_memory().remember(f"{self.dataset(kind)}_refresh", {
+            "refreshed_at": now,
+            "full_refreshed_at": now if full else meta.get("full_refreshed_at", now),
+            "updated_since": max(updated) if updated else meta.get("updated_since"),
+            "rows": table.num_rows if table is not None else 0,
+            # A fetch stopped at max_rows, so records may be missing (until a full refresh that doesn't)
+            "capped": len(records) >= self.config["max_rows"] or (not full and meta.get("capped", False)),
+        })
+        print(f"🔄 Reference cache: {'full' if full else 'incremental'} refresh of {kind} fetched {len(records)} records")
+        return len(records)
+
+    def _refresh_in_background(self, kind: str) -> None:
+        with self._lock:
+            if kind in self._refreshing:
+                return
+            self._refreshing.add(kind)
+
+        def run():
+            try:
+                self.refresh(kind)
+            except Exception as e:
+                print(f"⚠️ Reference cache: background refresh of {kind} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(kind)
+
+        threading.Thread(target=run, daemon=True, name=f"reference_refresh_{kind}").start()
+
+    def table(self, kind: str) -> pa.Table:
+        """
+        The cached records of a kind, served immediately; a stale copy triggers a background refresh.
+        Only an empty cache waits for Shopify.
+        """
+        table = self._local_table(kind)
+        if table is None:
+            with self._kind_lock(kind):
+                # Another lookup may have fetched it while this one waited
+                table = self._local_table(kind)
+                if table is None:
+                    self.refresh(kind, full=True)
+                    table = self._local_table(kind)
+            return table
+
+        if time.time() - self._meta(kind).get("refreshed_at", 0) > self.config["ttl_seconds"]:
+            self._refresh_in_background(kind)
+        return table
+
+    def age_seconds(self, kind: str) -> Optional[float]:
+        refreshed_at = self._meta(kind).get("refreshed_at")
+        return time.time() - refreshed_at if refreshed_at else None
+
+    def capped(self, kind: str) -> bool:
+        return bool(self._meta(kind).get("capped"))
+
+
+def _matching(table: pa.Table, columns: List[str], search: str) -> pa.Table:
+    """Rows where any of the string columns contains `search` (case-insensitive)."""
+    mask = None
+    for column in columns:
+        if column not in table.schema.names or not pa.types.is_string(table.schema.field(column).type):
+            continue
+        matches = pc.fill_null(pc.match_substring(table[column], search, ignore_case=True), False)
+        mask = matches if mask is None else pc.or_(mask, matches)
+    return table.filter(mask) if mask is not None else table.slice(0, 0)
+
+
+def _rows(table: pa.Table, columns: List[str]) -> List[Dict[str, Any]]:
+    present = [column for column in columns if column in table.schema.names]
+    return table.select(present).slice(0, MAX_LOOKUP_ROWS).to_pylist()
+
+
+def _freshness(kind: str) -> str:
+    cache = get_reference_cache()
+    age = cache.age_seconds(kind)
+    freshness = f"cached {age / 60:.0f} min ago" if age is not None else "just fetched"
+    if cache.capped(kind):
+        freshness += (f" - incomplete: the last fetch stopped at max_rows ({cache.config['max_rows']}), so missing "
+                      f"{kind} may still exist in Shopify (search for them with the shopify_* tools)")
+    return freshness
+
+
+# --- Singleton Interface ---
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_reference_cache() -> ReferenceCache:
+    global _cache_instance
+
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = ReferenceCache()
+    return _cache_instance
+
+
+@tool
+def lookup_products(search: str) -> Dict[str, Any]:
+    """
+    Find products by title, handle, vendor, product type or tag (case-insensitive substring match) from the local
+    product cache - instant, no Shopify query needed.  The full cache is the dataset 'reference_products' for query_datasets.
+
+    Args:
+        search (str): Text to look for, e.g. 'cookie' or 'Prymal'.
+
+    Returns:
+        dict: Matching products (up to 50) with id, title, status, inventory and price, plus how fresh the cache is.
+    """
+    table = get_reference_cache().table("products")
+    matches = _matching(table, ["title", "handle", "vendor", "productType", "tags"], search)
+    return {
+        "matches": matches.num_rows,
+        "products": _rows(matches, ["id", "title", "handle", "vendor", "productType", "status", "totalInventory",
+                                    "priceRangeV2_minVariantPrice_amount"]),
+        "freshness": _freshness("products"),
+    }
+
+
+@tool
+def lookup_skus(skus: List[str]) -> Dict[str, Any]:
+    """
+    Map SKUs to their product and variant (title, price, inventory) from the local variant cache - instant, no
+    Shopify query needed.  The full cache is the dataset 'reference_variants' for query_datasets.
+
+    Args:
+        skus (list): SKUs to look up, e.g. ['KSC-L', 'ORC-S'].
+
+    Returns:
+        dict: SKU -> variant details (or None when the SKU isn't in the cache), plus how fresh and complete the cache is.
+    """
+    table = get_reference_cache().table("variants")
+    found: Dict[str, Any] = {sku: None for sku in skus}
+    if "sku" in table.schema.names:
+        matches = table.filter(pc.is_in(table["sku"], value_set=pa.array([str(sku) for sku in skus])))
+        for row in _rows(matches, ["sku", "id", "title", "price", "inventoryQuantity", "product_id", "product_title",
+                                   "product_status"]):
+            found[row["sku"]] = row
+    return {"skus": found, "freshness": _freshness("variants")}
+
+
+@tool
+def lookup_customers(search: str) -> Dict[str, Any]:
+    """
+    Find customers by email or name (case-insensitive substring match) from the local customer cache.  The first
+    lookup fetches all customers, later ones are instant.  The full cache is the dataset 'reference_customers'.
+
+    Args:
+        search (str): Email address or name (or part of one).
+
+    Returns:
+        dict: Matching customers (up to 50) with email, name, number of orders and amount spent, plus how fresh the cache is.
+    """
+    table = get_reference_cache().table("customers")
+    matches = _matching(table, ["email", "firstName", "lastName"], search)
+    return {
+        "matches": matches.num_rows,
+        "customers": _rows(matches, ["id", "email", "firstName", "lastName", "state", "createdAt", "numberOfOrders",
+                                     "amountSpent_amount"]),
+        "freshness": _freshness("customers"),
+    }
@@ -1,13 +1,181 @@
-import os
-import requests
+import json
+import pyarrow as pa
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from smolagents import tool
+from tools.dataset_catalog import DatasetWriter, dataset_handle
+from tools.shopify_throttle import API_VERSION, post_graphql
+
+RESULT_DATASET = "latest_shopify_query_result"
+PAGINATED_RESULT_DATASET = "latest_paginated_query_result"
+MAX_INLINE_CHARS = 4000  # responses up to this size (as JSON) are returned as is
+MAX_PAGE_SIZE = 250
+MAX_PAGINATED_ROWS = 50_000
+
+
+def _find_records(value: Any, path: str = "data") -> Tuple[str, List[Dict[str, Any]]]:
+    """Return the path and items of the largest list of objects in a response (edges are unwrapped to their nodes)."""
+    best: Tuple[str, List[Dict[str, Any]]] = ("", [])
+    if isinstance(value, dict):
+        for key, child in value.items():
+            candidate = _find_records(child, f"{path}.{key}")
+            if len(candidate[1]) > len(best[1]):
+                best = candidate
+    elif isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        if all(set(item) <= {"node", "cursor"} and "node" in item for item in value):
+            return f"{path}[].node", [item["node"] for item in value]
+        return f"{path}[]", value
+    return best
+
+
+def _flatten(record: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """Flatten nested objects into prefix_key columns; lists (e.g. nested connections) are kept as JSON strings."""
+    flat = {}
+    for key, value in record.items():
+        column = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{column}_"))
+        elif isinstance(value, list):
+            flat[column] = json.dumps(value)
+        else:
+            flat[column] = value
+    return flat
+
+
+def records_table(records: List[Dict[str, Any]]) -> pa.Table:
+    rows = [_flatten(record) for record in records]
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    data = {column: [row.get(column) for row in rows] for column in columns}
+    try:
+        return pa.table(data)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed types in a column - store values as strings
+        return pa.table({column: [None if v is None else str(v) for v in values] for column, values in data.items()})
+
+
+def _remove_path(value: Any, path: List[str], placeholder: str) -> Any:
+    """Copy of a response with the list at path (e.g. ['orders', 'edges']) replaced by placeholder."""
+    if not path:
+        return placeholder
+    return {**value, path[0]: _remove_path(value[path[0]], path[1:], placeholder)}
+
+
+def store_records(records: List[Dict[str, Any]], name: str) -> Dict[str, Any]:
+    """Store records (nested objects flattened) as the dataset `name`, returning its handle."""
+    table = records_table(records)
+    writer = DatasetWriter(name, table.schema)
+    try:
+        writer.write(table)
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+    return dataset_handle(name)
+
+
+def store_result(result: Dict[str, Any], name: str = RESULT_DATASET) -> Dict[str, Any]:
+    """
+    Store the records of a large response as the dataset `name` and return a compact handle: dataset name,
+    row count, column types, a few sample rows and the rest of the response (e.g. pageInfo, cost).
+    """
+    path, records = _find_records(result.get("data"))
+    if not records:
+        path, records = "data", [result.get("data") or {}]
+
+    handle = store_records(records, name)
+    keys = path.replace("[].node", "").replace("[]", "").split(".")
+    handle["records_path"] = path
+    handle["rest_of_response"] = _remove_path(result, keys, f"<{len(records)} records in dataset '{name}'>")
+    handle["note"] = (f"Response too large to return in full - its {len(records)} records are stored as dataset "
+                      f"'{name}'. Read them with page_dataset, or aggregate them with query_datasets or compute_metrics.")
+    return handle
+
+
+# ----------------------------------------
+# Pagination
+# ----------------------------------------
+
+def iter_pages(
+    query: str,
+    connection: str,
+    variables: Optional[Dict[str, Any]] = None,
+    page_size: Optional[int] = None,
+    limit: Optional[int] = None,
+    prefetch: bool = True,
+    api_version: str = API_VERSION,
+    cost: Optional[float] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield the nodes of a GraphQL connection one page at a time, following its cursor.
+
+    Args:
+        query: Query with a `$cursor: String` variable passed as `after: $cursor`, selecting the connection's
+               `nodes` (or `edges { node }`) and `pageInfo { hasNextPage endCursor }`.  A `$first: Int` variable
+               is set to page_size (smaller for the last page under a limit).
+        connection: Dot path of the connection under `data`, e.g. 'orders' or 'product.variants'.
+        variables: Any other query variables.
+        page_size: Nodes per page - requires a `$first` variable.
+        limit: Stop after this many nodes.
+        prefetch: Request the next page while the caller processes the current one.
+        api_version: Admin API version.
+        cost: Expected cost of one page, for the throttle.
+
+    Raises:
+        ValueError: If the query has no `$cursor` variable or doesn't select `endCursor`.
+        RuntimeError: On GraphQL errors.
+    """
+    if "$cursor" not in query or "endCursor" not in query:
+        raise ValueError("The query needs a `$cursor: String` variable (used as `after: $cursor`) and must select "
+                         "`pageInfo { hasNextPage endCursor }` on the connection.")
+    if page_size and "$first" not in query:
+        raise ValueError("page_size needs a `$first: Int` variable in the query (used as `first: $first`).")
+
+    def fetch(cursor: Optional[str], fetched: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        page_variables = {**(variables or {}), "cursor": cursor}
+        if page_size:
+            page_variables["first"] = min(page_size, limit - fetched) if limit else page_size
+        result = post_graphql(query, page_variables, api_version=api_version, cost=cost)
+        if "errors" in result:
+            raise RuntimeError(f"GraphQL error: {result['errors']} - try using the search_shopify_docs tool to find contextual help")
+
+        value = result.get("data")
+        for key in connection.split("."):
+            value = (value or {}).get(key)
+        if value is None:
+            raise RuntimeError(f"Connection '{connection}' not found in the response.")
+        nodes = value["nodes"] if "nodes" in value else [edge["node"] for edge in value.get("edges") or []]
+        page_info = value.get("pageInfo") or {}
+        return nodes, page_info.get("endCursor") if page_info.get("hasNextPage") else None
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shopify_prefetch") if prefetch else None
+    try:
+        fetched = 0
+        nodes, cursor = fetch(None, 0)
+        while True:
+            if limit is not None:
+                nodes = nodes[:limit - fetched]
+            fetched += len(nodes)
+            done = not nodes or cursor is None or (limit is not None and fetched >= limit)
+            next_page = executor.submit(fetch, cursor, fetched) if executor and not done else None
+
+            yield nodes
+
+            if done:
+                return
+            nodes, cursor = next_page.result() if next_page else fetch(cursor, fetched)
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def paginate(query: str, connection: str, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+    """Yield the nodes of a GraphQL connection one by one across all pages - see iter_pages for the arguments."""
+    for nodes in iter_pages(query, connection, **kwargs):
+        yield from nodes
 
-# Load from environment variables (e.g., via Replit Secrets or .env)
-SHOPIFY_STORE_URL = os.getenv("SHOPIFY_STORE_URL")  # e.g. https://yourstore.myshopify.com/admin/api/2024-04/graphql.json
-SHOPIFY_TOKEN = os.getenv("SHOPIFY_TOKEN")  # Private app or custom app token
 
 @tool
-def run_shopify_query(query: str) -> dict:
+def run_shopify_query(query: str, result_name: Optional[str] = None) -> dict:
     
     """
     Use this for running a raw GraphQL query against the Shopify Admin API, for answering user queries and performing analysis.
@@ -15,41 +183,67 @@ def run_shopify_query(query: str) -> dict:
     Args:
         query (str): The complete GraphQL query as a string. Must follow the syntax
                      supported by Shopify's Admin API (e.g. 'query { ordersCount { count } }').
+        result_name (str, optional): Dataset name to store a large response under (default 'latest_shopify_query_result').
 
     Returns:
-        dict: The parsed JSON response from Shopify as a Python dictionary. If the request fails,
-              a RuntimeError will be raised with the HTTP status and error message.
+        dict: The parsed JSON response from Shopify as a Python dictionary. Large responses are stored instead:
+              the largest list of records (e.g. an orders connection) becomes the dataset 'latest_shopify_query_result'
+              and a handle is returned with its row count, columns, sample rows and the rest of the response
+              (e.g. pageInfo).  If the request fails, a RuntimeError will be raised with the HTTP status and error message.
 
     Example:
         >>> run_shopify_query("query { ordersCount { count } }")
         {'data': {'ordersCount': 123}}
 
     Environment Variables:
-        - SHOPIFY_STORE_URL: Full Shopify GraphQL endpoint.
+        - SHOPIFY_STORE_URL: Shopify store domain, e.g. yourstore.myshopify.com.
         - SHOPIFY_TOKEN: Admin access token for authentication.
 
     Notes:
         - This tool allows your CodeAgent to dynamically query real store data from Shopify.
+        - Requests share the store's rate limit budget and throttled requests are retried (see shopify_throttle.py).
         - Avoid exposing sensitive data in responses; consider adding sanitization logic if needed.
     """
-    if not SHOPIFY_STORE_URL or not SHOPIFY_TOKEN:
-        raise EnvironmentError("Missing required Shopify credentials (SHOPIFY_STORE_URL or SHOPIFY_TOKEN).")
+    result = post_graphql(query)
+    if 'errors' in result:
+        raise RuntimeError(f"GraphQL error: {result['errors']} - try using the search_shopify_docs tool to find contextual help")
+
+    if len(json.dumps(result)) <= MAX_INLINE_CHARS:
+        return result
+    return store_result(result, result_name or RESULT_DATASET)
 
-    headers = {
-        "Content-Type": "application/json",
-        "X-Shopify-Access-Token": SHOPIFY_TOKEN
-    }
 
-    response = requests.post(
-        f'https://{SHOPIFY_STORE_URL}/admin/api/2025-07/graphql.json',
-        headers=headers,
-        json={"query": query}
-    )
+@tool
+def paginate_shopify_query(query: str, connection: str, limit: int = 5000, page_size: int = 250,
+                           variables: Optional[Dict[str, Any]] = None, result_name: Optional[str] = None) -> dict:
+    """
+    Run a GraphQL query against the Shopify Admin API and follow its cursor through every page - no pagination
+    loop needed.  All nodes are stored as a dataset (nested objects flattened into columns) and a compact handle is
+    returned.  The next page is requested while the current one is processed, and requests share the store's rate limit.
 
-    if not response.ok:
-        raise RuntimeError(f"Shopify API error {response.status_code}: {response.text}")
+    Args:
+        query (str): GraphQL query with `$first: Int!` and `$cursor: String` variables and pageInfo selected, e.g.
+                     'query($first: Int!, $cursor: String) { orders(first: $first, after: $cursor, query: "created_at:>=2025-06-01") { nodes { id name createdAt } pageInfo { hasNextPage endCursor } } }'
+        connection (str): Dot path of the paginated connection under `data`, e.g. 'orders' or 'product.variants'.
+        limit (int): Maximum number of nodes to fetch.
+        page_size (int): Nodes per request (at most 250; lower it for queries with nested connections to stay within the query cost limit).
+        variables (dict, optional): Any other variables the query declares.
+        result_name (str, optional): Dataset name to store the nodes under (default 'latest_paginated_query_result').
+
+    Returns:
+        dict: Dataset handle - name, row count, columns and sample rows.
+    """
+    if not 0 < limit <= MAX_PAGINATED_ROWS:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGINATED_ROWS}.")
+    name = result_name or PAGINATED_RESULT_DATASET
 
-    if 'errors' in response.json():
-        raise RuntimeError(f"GraphQL error: {response.json()['errors']} - try using the search_shopify_docs tool to find contextual help")
+    records = list(paginate(query, connection, variables=variables, page_size=max(1, min(page_size, MAX_PAGE_SIZE)),
+                            limit=limit))
+    if not records:
+        return {"dataset": None, "rows": 0, "note": "The query returned no nodes."}
 
-    return response.json()
+    handle = store_records(records, name)
+    handle["note"] = (f"{len(records)} nodes stored as dataset '{name}'"
+                      f"{f' (stopped at the limit of {limit})' if len(records) >= limit else ''}."
+                      f" Read them with page_dataset, or aggregate them with query_datasets or compute_metrics.")
+    return handle
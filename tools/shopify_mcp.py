@@ -1,7 +1,22 @@
+import threading
+
 from smolagents import tool
 from mcp.shopify_client import ShopifyMCPClient
 
-mcp = ShopifyMCPClient()
+# --- Singleton Interface ---
+# The Dev-MCP subprocess (npx) is only started the first time a docs / schema tool is called
+_mcp_instance = None
+_mcp_lock = threading.Lock()
+
+
+def get_mcp_client() -> ShopifyMCPClient:
+    global _mcp_instance
+
+    with _mcp_lock:
+        if _mcp_instance is None:
+            _mcp_instance = ShopifyMCPClient()
+    return _mcp_instance
+
 
 @tool
 def search_shopify_docs(prompt: str,top_n:int) -> str:
@@ -15,7 +30,7 @@ def search_shopify_docs(prompt: str,top_n:int) -> str:
     Returns:
         str: Relevant doc content snippets.
     """
-    result = mcp.call_tool("search_dev_docs", {"prompt": prompt})
+    result = get_mcp_client().call_tool("search_dev_docs", {"prompt": prompt})
 
     top_results = result["content"][:top_n]
 
@@ -43,7 +58,7 @@ def introspect_shopify_schema(query: str, top_n: int) -> str:
     Example: query = "order createdAt and lineItems"
     """
 
-    result = mcp.call_tool("introspect_admin_schema", {"query": query})
+    result = get_mcp_client().call_tool("introspect_admin_schema", {"query": query})
 
     # Filter to only return the top_n results
     top_results = result["content"][:top_n]
@@ -51,5 +66,8 @@ def introspect_shopify_schema(query: str, top_n: int) -> str:
     return "\n\n".join([r["text"] for r in top_results])
 
 
-result = search_shopify_docs("fetch all orders from 2025-01-01 to 2025-01-10", 1)
-print(result)
\ No newline at end of file
+
+# # Usage example:
+
+# result = search_shopify_docs("fetch all orders from 2025-01-01 to 2025-01-10", 1)
+# print(result)
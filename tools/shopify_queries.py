@@ -0,0 +1,300 @@
+# shopify_queries.py
+"""
+Library of parameterized Shopify Admin GraphQL query templates (API version 2025-07), exposed as tools with
+typed arguments so the Analyst doesn't have to write, introspect and debug raw GraphQL for common questions.
+
+Each template selects the connection with `nodes` and `pageInfo`, takes `$first`, `$cursor` and a search
+`$query` as variables (never string-formatted into the query), and declares its cost per node so the page size
+keeps every request within MAX_QUERY_COST.  Pages are fetched with shopify_graphql.iter_pages until the connection
+ends or the row limit is reached, and the rows are stored as a dataset - tools return a compact handle, not the records.
+Run scripts/validate_shopify_queries.py against a store to check the templates and their cost estimates.
+"""
+
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from smolagents import tool
+
+from tools.shopify_graphql import iter_pages, store_records
+
+MAX_QUERY_COST = 1000   # Shopify rejects single queries costing more than this
+MAX_PAGE_SIZE = 250
+DEFAULT_LIMIT = 5000
+MAX_LIMIT = 50_000
+
+
+class QueryTemplate:
+    """
+    A paginated query over one connection.
+
+    Args:
+        name: Template name (results are stored as the dataset 'shopify_<name>_result').
+        connection: Top-level connection field, e.g. 'orders'.
+        query: GraphQL query taking $first: Int!, $cursor: String and $query: String.
+        node_cost: Estimated cost of one node - 1 for the node plus every nested object (and list item) it selects.
+        rows: Turns one node into result rows (defaults to the node itself).
+    """
+
+    def __init__(self, name: str, connection: str, query: str, node_cost: int,
+                 rows: Optional[Callable[[Dict[str, Any]], List[Dict[str, Any]]]] = None):
+        self.name = name
+        self.connection = connection
+        self.query = query
+        self.node_cost = node_cost
+        self.rows = rows or (lambda node: [node])
+
+    @property
+    def dataset(self) -> str:
+        return f"shopify_{self.name}_result"
+
+    def page_size(self, limit: int) -> int:
+        """Largest page that keeps a request's estimated cost within MAX_QUERY_COST (and no bigger than needed)."""
+        return max(1, min(MAX_PAGE_SIZE, (MAX_QUERY_COST - 2) // self.node_cost, limit))
+
+    def estimate_cost(self, first: int) -> int:
+        """Shopify-style estimate: 2 for the connection plus the cost of every node requested."""
+        return 2 + first * self.node_cost
+
+    def pages(self, search: Optional[str], limit: int) -> Iterator[List[Dict[str, Any]]]:
+        """Yield pages of nodes until the connection is exhausted or `limit` nodes have been fetched."""
+        page_size = self.page_size(limit)
+        return iter_pages(self.query, self.connection, variables={"query": search}, page_size=page_size,
+                          limit=limit, cost=self.estimate_cost(page_size))
+
+    def run(self, search: Optional[str], limit: int,
+            rows: Optional[Callable[[Dict[str, Any]], List[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+        """Fetch up to `limit` nodes matching the search, store the rows and return a dataset handle."""
+        if not 0 < limit <= MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_LIMIT}.")
+
+        to_rows = rows or self.rows
+        results, num_nodes = [], 0
+        for nodes in self.pages(search, limit):
+            num_nodes += len(nodes)
+            results.extend(row for node in nodes for row in to_rows(node))
+
+        if not results:
+            return {"dataset": None, "rows": 0, "note": f"No {self.name} matched the search '{search or ''}'."}
+
+        # One table for all pages, so columns that are null on some pages still get a single type
+        handle = store_records(results, self.dataset)
+        handle["note"] = (f"{len(results)} rows stored as dataset '{self.dataset}'"
+                          f"{f' (stopped at the limit of {limit} {self.connection})' if num_nodes >= limit else ''}."
+                          f" Read them with page_dataset, or aggregate them with query_datasets or compute_metrics.")
+        return handle
+
+
+def _date(value: str, argument: str) -> str:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError(f"{argument} must be a date in YYYY-MM-DD format, got {value!r}.")
+
+
+def _search(*terms: Optional[str]) -> Optional[str]:
+    return " ".join(term for term in terms if term) or None
+
+
+def _refund_rows(order: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One row per refund, with the order it belongs to."""
+    return [
+        {**refund, "order": {"id": order["id"], "name": order["name"], "createdAt": order["createdAt"]}}
+        for refund in order.get("refunds") or []
+    ]
+
+
+ORDERS = QueryTemplate("orders", "orders", node_cost=8, query="""
+query Orders($first: Int!, $cursor: String, $query: String) {
+  orders(first: $first, after: $cursor, query: $query, sortKey: CREATED_AT) {
+    nodes {
+      id
+      name
+      createdAt
+      updatedAt
+      cancelledAt
+      displayFinancialStatus
+      displayFulfillmentStatus
+      email
+      customer { id }
+      subtotalPriceSet { shopMoney { amount currencyCode } }
+      totalDiscountsSet { shopMoney { amount } }
+      currentTotalPriceSet { shopMoney { amount } }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+""")
+
+PRODUCTS = QueryTemplate("products", "products", node_cost=3, query="""
+query Products($first: Int!, $cursor: String, $query: String) {
+  products(first: $first, after: $cursor, query: $query) {
+    nodes {
+      id
+      title
+      handle
+      vendor
+      productType
+      status
+      tags
+      createdAt
+      updatedAt
+      totalInventory
+      priceRangeV2 { minVariantPrice { amount currencyCode } }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+""")
+
+CUSTOMERS = QueryTemplate("customers", "customers", node_cost=2, query="""
+query Customers($first: Int!, $cursor: String, $query: String) {
+  customers(first: $first, after: $cursor, query: $query) {
+    nodes {
+      id
+      email
+      firstName
+      lastName
+      state
+      tags
+      createdAt
+      updatedAt
+      numberOfOrders
+      amountSpent { amount currencyCode }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+""")
+
+INVENTORY = QueryTemplate("inventory", "productVariants", node_cost=3, query="""
+query Inventory($first: Int!, $cursor: String, $query: String) {
+  productVariants(first: $first, after: $cursor, query: $query) {
+    nodes {
+      id
+      sku
+      title
+      price
+      inventoryQuantity
+      updatedAt
+      product { id title status }
+      inventoryItem { id tracked }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+""")
+
+REFUNDS = QueryTemplate("refunds", "orders", node_cost=32, rows=_refund_rows, query="""
+query Refunds($first: Int!, $cursor: String, $query: String) {
+  orders(first: $first, after: $cursor, query: $query, sortKey: UPDATED_AT) {
+    nodes {
+      id
+      name
+      createdAt
+      refunds(first: 10) {
+        id
+        createdAt
+        note
+        totalRefundedSet { shopMoney { amount currencyCode } }
+      }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+""")
+
+TEMPLATES = {template.name: template for template in (ORDERS, PRODUCTS, CUSTOMERS, INVENTORY, REFUNDS)}
+
+
+@tool
+def shopify_orders(start_date: str, end_date: str, financial_status: Optional[str] = None,
+                   limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+    """
+    Fetch order headers (name, dates, financial / fulfillment status, customer, subtotal, discounts, total) created
+    between two dates with a validated, auto-paginated query, and store them as the dataset 'shopify_orders_result'.
+    No GraphQL needed.  For SKU / product sales use get_top_skus, or paginate_shopify_query with a lineItems selection.
+
+    Args:
+        start_date (str): start date in YYYY-MM-DD format (inclusive).
+        end_date (str): end date in YYYY-MM-DD format (inclusive).
+        financial_status (str, optional): Only orders with this financial status, e.g. 'paid', 'refunded', 'partially_refunded', 'pending'.
+        limit (int): Maximum number of orders to fetch.
+
+    Returns:
+        dict: Dataset handle - name, row count, columns and sample rows.
+    """
+    search = _search(f"created_at:>={_date(start_date, 'start_date')}", f"created_at:<={_date(end_date, 'end_date')}",
+                     f"financial_status:{financial_status}" if financial_status else None)
+    return ORDERS.run(search, limit)
+
+
+@tool
+def shopify_products(search: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+    """
+    Fetch products (title, handle, vendor, type, status, tags, total inventory, minimum price) with a validated,
+    auto-paginated query, and store them as the dataset 'shopify_products_result'.  No GraphQL needed.
+
+    Args:
+        search (str, optional): Shopify product search syntax, e.g. 'status:active', 'vendor:Prymal', 'title:*cookie*'.  Omit for all products.
+        limit (int): Maximum number of products to fetch.
+
+    Returns:
+        dict: Dataset handle - name, row count, columns and sample rows.
+    """
+    return PRODUCTS.run(search, limit)
+
+
+@tool
+def shopify_customers(search: Optional[str] = None, created_after: Optional[str] = None,
+                      limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+    """
+    Fetch customers (email, name, state, tags, dates, number of orders, amount spent) with a validated,
+    auto-paginated query, and store them as the dataset 'shopify_customers_result'.  No GraphQL needed.
+
+    Args:
+        search (str, optional): Shopify customer search syntax, e.g. 'orders_count:>1', 'email:jane@example.com'.
+        created_after (str, optional): Only customers created on or after this date (YYYY-MM-DD).
+        limit (int): Maximum number of customers to fetch.
+
+    Returns:
+        dict: Dataset handle - name, row count, columns and sample rows.
+    """
+    return CUSTOMERS.run(_search(search, f"created_at:>={_date(created_after, 'created_after')}"
+                                 if created_after else None), limit)
+
+
+@tool
+def shopify_inventory(search: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+    """
+    Fetch product variants with their SKU, price, inventory quantity and product, with a validated, auto-paginated
+    query, and store them as the dataset 'shopify_inventory_result'.  Use it for stock levels and SKU -> product lookups.
+
+    Args:
+        search (str, optional): Shopify variant search syntax, e.g. 'sku:KSC-L', 'inventory_quantity:<10'.
+        limit (int): Maximum number of variants to fetch.
+
+    Returns:
+        dict: Dataset handle - name, row count, columns and sample rows.
+    """
+    return INVENTORY.run(search, limit)
+
+
+@tool
+def shopify_refunds(start_date: str, end_date: str, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+    """
+    Fetch refunds (date, amount, note and the order they belong to) issued between two dates with a validated,
+    auto-paginated query, and store them as the dataset 'shopify_refunds_result' - one row per refund.
+
+    Args:
+        start_date (str): start date in YYYY-MM-DD format (inclusive).
+        end_date (str): end date in YYYY-MM-DD format (inclusive).
+        limit (int): Maximum number of refunded orders to scan.
+
+    Returns:
+        dict: Dataset handle - name, row count, columns and sample rows.
+    """
+    start, end = _date(start_date, "start_date"), _date(end_date, "end_date")
+    # A refund updates its order, so orders updated in the range include every refund issued in it
+    search = f"updated_at:>={start} (financial_status:refunded OR financial_status:partially_refunded)"
+    return REFUNDS.run(search, limit, rows=lambda order: [row for row in _refund_rows(order)
+                                                          if start <= row["createdAt"][:10] <= end])
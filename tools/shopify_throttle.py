@@ -0,0 +1,156 @@
+# shopify_throttle.py
+"""
+Client-side view of the Shopify Admin GraphQL rate limit, shared by every thread that calls the API.
+
+Shopify meters queries with a leaky bucket of cost points (e.g. 1000 available, restored at 50 per second) and
+reports its state in `extensions.cost.throttleStatus` on every response.  Requests wait here until the bucket
+should hold enough points for their expected cost, at most MAX_CONCURRENT_REQUESTS run at once, and throttled
+requests are retried after the bucket has had time to refill - so concurrent tool calls share one budget
+instead of each running into THROTTLED errors.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+
+API_VERSION = "2025-07"
+MAX_CONCURRENT_REQUESTS = 4
+MAX_RETRIES = 5
+DEFAULT_QUERY_COST = 50          # expected cost of a query before Shopify has reported any
+DEFAULT_BUCKET_SIZE = 1000.0     # standard plan limits, until the first response says otherwise
+DEFAULT_RESTORE_RATE = 50.0      # points per second
+REQUEST_TIMEOUT_SECONDS = 60
+
+
+class ShopifyThrottle:
+    """Thread-safe leaky-bucket model of the Shopify GraphQL cost budget."""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_REQUESTS):
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self.maximum_available = DEFAULT_BUCKET_SIZE
+        self.restore_rate = DEFAULT_RESTORE_RATE
+        self._available = DEFAULT_BUCKET_SIZE
+        self._updated = time.monotonic()
+        self.last_query_cost = DEFAULT_QUERY_COST
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._available = min(self.maximum_available, self._available + (now - self._updated) * self.restore_rate)
+        self._updated = now
+
+    def acquire(self, cost: Optional[float] = None) -> None:
+        """Take a request slot and wait until the bucket should hold `cost` points (reserving them)."""
+        self._slots.acquire()
+        while True:
+            with self._lock:
+                self._refill()
+                needed = min(cost or self.last_query_cost, self.maximum_available)
+                if self._available >= needed:
+                    self._available -= needed
+                    return
+                wait = (needed - self._available) / self.restore_rate
+            time.sleep(wait)
+
+    def release(self, response: Optional[Dict[str, Any]] = None) -> None:
+        """Free the request slot, syncing the bucket with the cost Shopify reported (if any)."""
+        try:
+            cost = ((response or {}).get("extensions") or {}).get("cost") or {}
+            status = cost.get("throttleStatus") or {}
+            with self._lock:
+                if status:
+                    self.maximum_available = float(status.get("maximumAvailable", self.maximum_available))
+                    self.restore_rate = float(status.get("restoreRate", self.restore_rate))
+                    self._available = float(status.get("currentlyAvailable", self._available))
+                    self._updated = time.monotonic()
+                if cost.get("requestedQueryCost") is not None:
+                    self.last_query_cost = float(cost["requestedQueryCost"])
+        finally:
+            self._slots.release()
+
+    def backoff(self, cost: Optional[float] = None) -> float:
+        """Seconds to wait after a THROTTLED response before the bucket should hold `cost` points again."""
+        with self._lock:
+            self._refill()
+            needed = min(cost or self.last_query_cost, self.maximum_available)
+            return max((needed - self._available) / self.restore_rate, 1.0)
+
+
+def _is_throttled(response: requests.Response, result: Optional[Dict[str, Any]]) -> bool:
+    if response.status_code == 429:
+        return True
+    return any((error.get("extensions") or {}).get("code") == "THROTTLED"
+               for error in (result or {}).get("errors") or [] if isinstance(error, dict))
+
+
+def post_graphql(query: str, variables: Optional[Dict[str, Any]] = None,
+                 api_version: str = API_VERSION, cost: Optional[float] = None) -> Dict[str, Any]:
+    """
+    POST a query to the Shopify Admin GraphQL API within the shared throttle budget, retrying throttled requests.
+
+    Args:
+        query: The GraphQL query.
+        variables: Optional query variables.
+        api_version: Admin API version, e.g. '2025-07'.
+        cost: Expected query cost, if known (defaults to the cost Shopify reported for the last query).
+
+    Returns:
+        The parsed JSON response (which may contain GraphQL 'errors' other than throttling).
+
+    Raises:
+        EnvironmentError: If SHOPIFY_STORE_URL or SHOPIFY_TOKEN is not set.
+        RuntimeError: On HTTP errors, or if the request is still throttled after MAX_RETRIES retries.
+    """
+    store_url, token = os.getenv("SHOPIFY_STORE_URL"), os.getenv("SHOPIFY_TOKEN")
+    if not store_url or not token:
+        raise EnvironmentError("Missing required Shopify credentials (SHOPIFY_STORE_URL or SHOPIFY_TOKEN).")
+
+    headers = {
+        "Content-Type": "application/json",
+        "X-Shopify-Access-Token": token
+    }
+    payload: Dict[str, Any] = {"query": query}
+    if variables:
+        payload["variables"] = variables
+
+    throttle = get_shopify_throttle()
+    for attempt in range(MAX_RETRIES + 1):
+        throttle.acquire(cost)
+        result = None
+        try:
+            response = requests.post(f"https://{store_url}/admin/api/{api_version}/graphql.json",
+                                     headers=headers, json=payload, timeout=REQUEST_TIMEOUT_SECONDS)
+            if response.ok:
+                result = response.json()
+        finally:
+            throttle.release(result)
+
+        if _is_throttled(response, result):
+            if attempt == MAX_RETRIES:
+                break
+            wait = throttle.backoff(cost)
+            print(f"⏳ Shopify throttled the request, retrying in {wait:.1f}s")
+            time.sleep(wait)
+            continue
+        if not response.ok:
+            raise RuntimeError(f"Shopify API error {response.status_code}: {response.text}")
+        return result
+
+    raise RuntimeError(f"Shopify API still throttled after {MAX_RETRIES} retries")
+
+
+# --- Singleton Interface ---
+_throttle_instance = None
+_throttle_lock = threading.Lock()
+
+
+def get_shopify_throttle() -> ShopifyThrottle:
+    global _throttle_instance
+
+    with _throttle_lock:
+        if _throttle_instance is None:
+            _throttle_instance = ShopifyThrottle()
+    return _throttle_instance
@@ -1,11 +1,7 @@
 from smolagents import tool
 import pandas as pd
-import os
-from tools.memory_setup import get_agent_memory
-
-DATA_PATH = "memories"  # make sure this folder exists
-
-os.makedirs(DATA_PATH, exist_ok=True)
+import pyarrow as pa
+from tools.dataset_catalog import dataset_writer
 
 
 @tool
@@ -20,18 +16,14 @@ def store_dataset(name: str, df: pd.DataFrame) -> str:
     Returns:
         A confirmation string including summary information.
     """
-    # Save DataFrame to disk
-    file_path = os.path.join(DATA_PATH, f"{name}.parquet")
-    df.to_parquet(file_path, index=False)
-
-    # Generate metadata
-    schema = df.columns.tolist()
-    summary = f"'{name}' has {len(df)} rows and columns: {', '.join(schema)}"
+    # Save DataFrame to disk (partitioned by date when it has a created_at_date column)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    writer = dataset_writer(name, table.schema)
+    try:
+        writer.write(table)
+    except Exception:
+        writer.abort()
+        raise
 
     # Save metadata to AgentMemory
-    memory = get_agent_memory()
-    memory.remember(f"{name}_path", file_path)
-    memory.remember(f"{name}_schema", schema)
-    memory.remember(f"{name}_summary", summary)
-
-    return summary
+    return writer.close()
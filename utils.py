@@ -1,13 +1,18 @@
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import HumanMessage, AIMessage
 from datetime import datetime
 import psycopg2
 from memory_utils import get_db_connection
 from smolagents import ActionStep, MultiStepAgent
 from memory_utils import store_message
 import json
-import os
-from smolagents import OpenAIServerModel
+import pyarrow as pa
+import pyarrow.compute as pc
+from operator import itemgetter
+from pydantic import ValidationError
+from typing import TYPE_CHECKING, Any, Dict, List, Set, Tuple, Union, get_args, get_origin
+from models.shopify import ShopifyOrder, ShopifyLineItem, ShopifyOrderList, ShopifyLineItemList
+
+if TYPE_CHECKING:
+    from langchain.memory import ConversationBufferMemory
 
 
 def intercept_manager_final_answer(memory_step, agent=None):
@@ -40,6 +45,9 @@ def summarize_step(step_data: dict) -> str:
     """
     Generate a concise summary of an agent step using an LLM.
 
+    Summaries are memoized by step content and batched with any other pending steps
+    (see step_summarizer.py); use get_step_summarizer().submit() to avoid waiting.
+
     Args:
         step_data: Dictionary containing step information with keys:
                   - input_text, output_text, tool_calls, observations, error
@@ -47,59 +55,8 @@ def summarize_step(step_data: dict) -> str:
     Returns:
         A brief summary string of what happened in this step
     """
-    try:
-        # Load the prompt template
-        prompt_path = "prompts/summarizer_prompt.txt"
-        with open(prompt_path, "r") as f:
-            prompt_template = f.read()
-
-        # Extract step information
-        input_text = step_data.get("input_text", "")
-        output_text = step_data.get("output_text", "")
-        tool_calls = step_data.get("tool_calls", [])
-        observations = step_data.get("observations", "")
-        error = step_data.get("error", "")
-
-        # Format tool calls for readability
-        tool_calls_str = ""
-        if tool_calls:
-            tool_calls_str = "; ".join([str(tc) for tc in tool_calls])
-
-        # Create the prompt
-        prompt = prompt_template.format(
-            input_text=input_text[:500] if input_text else "None",  # Limit input length
-            output_text=output_text[:500] if output_text else "None",
-            tool_calls=tool_calls_str[:300] if tool_calls_str else "None",
-            observations=observations[:300] if observations else "None",
-            error=error[:200] if error else "None"
-        )
-
-        # Use OpenAI to generate summary
-        model = OpenAIServerModel(
-            model_id="gpt-4.1-nano",
-            api_key=os.environ["OPENAI_API_KEY"]
-        )
-
-        messages = [{"role": "user", "content": prompt}]
-        response = model(messages)
-
-        # Extract just the summary part
-        summary = response.content.strip()
-        if "Summary:" in summary:
-            summary = summary.split("Summary:")[-1].strip()
-
-        return summary
-
-    except Exception as e:
-        # Fallback to a simple summary if LLM fails
-        if step_data.get("tool_calls"):
-            return f"Executed tool: {step_data['tool_calls'][0]}"
-        elif step_data.get("error"):
-            return f"Encountered error: {str(step_data['error'])[:50]}..."
-        elif step_data.get("output_text"):
-            return "Generated agent response"
-        else:
-            return "Processing step"
+    from step_summarizer import get_step_summarizer
+    return get_step_summarizer().summarize(step_data)
 
 
 def analyst_callback(step: ActionStep, agent: MultiStepAgent):
@@ -142,7 +99,7 @@ You are a critical reviewer responsible for validating the trustworthiness of an
 Please answer the following checklist strictly. Use ✅ Yes / ❌ No / 🤔 Unclear for each, and include a short justification.
 
 1. Does the final answer include executable Python code used to perform the analysis or extract the data?
-2. If API calls were required, does the code include pagination logic (e.g., loops, cursors, or query limits)?
+2. If API calls were required, does the code include pagination logic (e.g., loops, cursors, query limits, or a paginating tool such as paginate_shopify_query, get_orders or the shopify_* query tools)?
 3. Does the answer mention what data source(s) were used and how they were accessed?
 4. Does the answer indicate that the result was computed or derived — rather than guessed or assumed?
 5. If data was unavailable or insufficient, does the answer clearly state this and explain why?
@@ -194,7 +151,7 @@ def analyst_validation(model):
     
     Questions: \n
     1. Does the final answer include executable Python code used to perform the analysis or extract the data? \n
-    2. If API calls were required, does the code include pagination logic (e.g., loops, cursors, or query limits)? \n
+    2. If API calls were required, does the code include pagination logic (e.g., loops, cursors, query limits, or a paginating tool such as paginate_shopify_query, get_orders or the shopify_* query tools)? \n
     3. Does the answer mention what data source(s) were used and how they were accessed? \n
     4. Does the answer indicate that the result was computed or derived — rather than guessed or assumed? \n
     5. If data was unavailable or insufficient, does the answer clearly state this and explain why? \n
@@ -218,6 +175,8 @@ def analyst_validation(model):
         
 
 def get_role(msg):
+    from langchain_core.messages import HumanMessage, AIMessage  # imported on use, langchain is slow to import
+
     if isinstance(msg, HumanMessage):
         return "User"
     elif isinstance(msg, AIMessage):
@@ -227,7 +186,7 @@ def get_role(msg):
 
 
 def build_prompt_with_memory(user_input: str,
-                             memory: ConversationBufferMemory) -> str:
+                             memory: "ConversationBufferMemory") -> str:
     history = memory.load_memory_variables({})["chat_history"]
     if isinstance(history, list):
         # If return_messages=True, convert messages to string
@@ -253,7 +212,8 @@ def format_shopify_order(raw_order: dict) -> dict:
             datetime.fromisoformat(raw_order["updatedAt"].replace("Z", "+00:00")).date()
         ),
         "email": raw_order.get("email"),
-        "customer_email": raw_order.get("customer", {}).get("email"),
+        "customer_id": (raw_order.get("customer") or {}).get("id"),
+        "customer_email": (raw_order.get("customer") or {}).get("email"),
         "original_total": float(
             raw_order.get("originalTotalPriceSet", {})
             .get("shopMoney", {})
@@ -277,6 +237,148 @@ def format_shopify_order(raw_order: dict) -> dict:
 
     return formatted_order
 
+
+def iso_dates(timestamps: List[str]) -> Tuple[List[str], List[bool]]:
+    """
+    Vectorized equivalent of `str(datetime.fromisoformat(ts.replace("Z", "+00:00")).date())` for a column of
+    ISO timestamps: the date is the first 10 characters, parsed once as a column to flag malformed values.
+
+    Returns:
+        Tuple of (YYYY-MM-DD strings, validity flags)
+    """
+    dates = pc.utf8_slice_codeunits(pa.array(timestamps, type=pa.string()), 0, 10)
+    parsed = pc.strptime(dates, format="%Y-%m-%d", unit="s", error_is_null=True)
+    return dates.to_pylist(), parsed.is_valid().to_pylist()
+
+
+def _failed_indices(error: ValidationError) -> Dict[int, str]:
+    """Map list index -> error message for a batch validation error."""
+    failed: Dict[int, str] = {}
+    for err in error.errors():
+        idx = err["loc"][0]
+        field = ".".join(str(part) for part in err["loc"][1:])
+        failed.setdefault(idx, f"{field}: {err['msg']}")
+    return failed
+
+
+def _exact_types(model: type) -> Dict[str, Set[type]]:
+    """Field name -> the Python types a value may already have to pass the model's validation unchanged."""
+    types = {}
+    for name, field in model.model_fields.items():
+        args = get_args(field.annotation) if get_origin(field.annotation) is Union else (field.annotation,)
+        types[name] = {get_origin(arg) or arg for arg in args}
+    return types
+
+
+ORDER_TYPES = _exact_types(ShopifyOrder)
+LINE_ITEM_TYPES = _exact_types(ShopifyLineItem)
+
+
+def _columns_valid(records: List[Dict[str, Any]], column_types: Dict[str, Set[type]]) -> bool:
+    """
+    Column-wise type check: True when every value already has exactly one of its field's types, so pydantic
+    validation would pass it through unchanged.  Anything else (coercible values too) needs the full validation.
+    """
+    return all(set(map(type, map(itemgetter(column), records))) <= types for column, types in column_types.items())
+
+
+def format_and_validate_shopify_orders(
+    raw_orders: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Batch version of `format_shopify_order` + ShopifyOrder / ShopifyLineItem validation for a page of raw orders.
+
+    Produces the same normalized records as formatting and validating each order individually, but derives dates
+    for the whole column at once and checks types column by column.  Only a page with a value of an unexpected
+    type is validated with pydantic (one TypeAdapter call for the orders and one for the line items), to find and
+    quarantine the failing orders with pydantic's reasons - Shopify pages almost never need it.
+
+    Returns:
+        Tuple of (validated orders, validated line items, quarantined records with reasons)
+    """
+    formatted: List[Dict[str, Any]] = []
+    sources: List[Dict[str, Any]] = []
+    quarantined: List[Dict[str, Any]] = []
+
+    # 1. Flatten (dates are filled in below, column-wise)
+    for raw in raw_orders:
+        try:
+            customer = raw.get("customer") or {}
+            formatted.append({
+                "id": raw["id"],
+                "name": raw["name"],
+                "created_at_ts": raw["createdAt"],
+                "updated_at_ts": raw["updatedAt"],
+                "created_at_date": None,
+                "updated_at_date": None,
+                "email": raw.get("email"),
+                "customer_id": customer.get("id"),
+                "customer_email": customer.get("email"),
+                "original_total": float(raw.get("originalTotalPriceSet", {}).get("shopMoney", {}).get("amount", 0)),
+                "current_total": float(raw.get("currentTotalPriceSet", {}).get("shopMoney", {}).get("amount", 0)),
+                "line_items": [
+                    {
+                        "name": li["node"]["name"],
+                        "quantity": li["node"]["quantity"],
+                        "sku": li["node"].get("sku"),
+                        "amount": float(li["node"]["originalTotalSet"]["shopMoney"]["amount"]),
+                    }
+                    for li in raw.get("lineItems", {}).get("edges", [])
+                ],
+            })
+            sources.append(raw)
+        except Exception as e:
+            quarantined.append({"reason": f"Order failed formatting: {e!r}", "record": raw})
+
+    # 2. Vectorized date derivation
+    created_dates, created_ok = iso_dates([o["created_at_ts"] for o in formatted])
+    updated_dates, updated_ok = iso_dates([o["updated_at_ts"] for o in formatted])
+    failed: Dict[int, str] = {}
+    for i, order in enumerate(formatted):
+        order["created_at_date"] = created_dates[i]
+        order["updated_at_date"] = updated_dates[i]
+        if not (created_ok[i] and updated_ok[i]):
+            failed[i] = f"Invalid timestamp: {order['created_at_ts']!r} / {order['updated_at_ts']!r}"
+
+    # 3. Validate all orders (without line items), falling back to pydantic only for unexpected types
+    if not _columns_valid(formatted, ORDER_TYPES):
+        try:
+            ShopifyOrderList.validate_python([{**o, "line_items": []} for o in formatted])
+        except ValidationError as e:
+            for idx, reason in _failed_indices(e).items():
+                failed.setdefault(idx, f"Order failed validation: {reason}")
+
+    # 4. Validate all line items in one call, re-validating only if something failed
+    def flatten(order_indices):
+        owners, items = [], []
+        for i in order_indices:
+            order = formatted[i]
+            for li in order["line_items"]:
+                owners.append(i)
+                items.append({**li, "order_id": order["id"], "order_name": order["name"],
+                              "created_at_date": order["created_at_date"],
+                              "customer_email": order["customer_email"] or order["email"],
+                              "order_total": order["current_total"]})
+        return owners, items
+
+    owners, items = flatten(i for i in range(len(formatted)) if i not in failed)
+    if not _columns_valid(items, LINE_ITEM_TYPES):
+        try:
+            validated_items = ShopifyLineItemList.validate_python(items)
+        except ValidationError as e:
+            for idx, reason in _failed_indices(e).items():
+                failed.setdefault(owners[idx], f"Line item failed validation: {items[idx]} | {reason}")
+            owners, items = flatten(i for i in range(len(formatted)) if i not in failed)
+            validated_items = ShopifyLineItemList.validate_python(items)
+        items = ShopifyLineItemList.dump_python(validated_items)
+
+    for idx, reason in sorted(failed.items()):
+        quarantined.append({"reason": reason, "record": sources[idx]})
+
+    orders = [order for i, order in enumerate(formatted) if i not in failed]
+    return orders, items, quarantined
+
+
 def describe_model(class_name: str):
     """
     Describe the schema of a Pydantic model class by name, which represents the schema of a dataset stored in memory.
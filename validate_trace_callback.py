@@ -41,7 +41,7 @@ You are a critical reviewer responsible for validating the trustworthiness of an
 Please answer the following checklist strictly. Use ✅ Yes / ❌ No / 🤔 Unclear for each, and include a short justification.
 
 1. Does the final answer include executable Python code used to perform the analysis or extract the data?
-2. If API calls were required, does the code include pagination logic (e.g., loops, cursors, or query limits)?
+2. If API calls were required, does the code include pagination logic (e.g., loops, cursors, query limits, or a paginating tool such as paginate_shopify_query, get_orders or the shopify_* query tools)?
 3. Does the answer mention what data source(s) were used and how they were accessed?
 4. Does the answer indicate that the result was computed or derived — rather than guessed or assumed?
 5. If data was unavailable or insufficient, does the answer clearly state this and explain why?